@@ -0,0 +1,65 @@
+"""Measures FuzzyNameIndex build time and lookup latency on synthetic author names.
+
+Names are two or three words built from random syllables. Queries take stored names and
+reorder, re-case or misspell them. Run from the project root:
+
+    python -m benchmarks.bench_author_matching [num_authors]
+"""
+import random
+import sys
+import time
+
+from library.adapters.indexes import FuzzyNameIndex
+
+SYLLABLES = [
+    consonant + vowel
+    for consonant in "bcdfghjklmnprstvwz"
+    for vowel in ["a", "e", "i", "o", "u", "ai", "ou"]
+]
+
+
+def make_name(rng):
+    words = [
+        "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4)))
+        for _ in range(rng.randint(2, 3))
+    ]
+    return " ".join(word.title() for word in words)
+
+
+def misspell(rng, name):
+    position = rng.randrange(1, len(name) - 1)
+    return name[:position] + name[position + 1:]
+
+
+def main(num_authors=300000, num_queries=200):
+    rng = random.Random(0)
+    names = [make_name(rng) for _ in range(num_authors)]
+    index = FuzzyNameIndex()
+    start = time.perf_counter()
+    index.extend(enumerate(names))
+    print("indexed %d names in %.1fs" % (num_authors, time.perf_counter() - start))
+
+    samples = rng.sample(names, num_queries)
+    variants = {
+        "exact": samples,
+        "upper case": [name.upper() for name in samples],
+        "reordered": [" ".join(reversed(name.split())) for name in samples],
+        "misspelled": [misspell(rng, name) for name in samples],
+    }
+    print("%-12s %10s %10s %10s" % ("query", "exact ms", "fuzzy ms", "found"))
+    for label, queries in variants.items():
+        start = time.perf_counter()
+        for query in queries:
+            index.exact(query)
+        exact = (time.perf_counter() - start) / num_queries * 1000
+        start = time.perf_counter()
+        found = 0
+        for query, name in zip(queries, samples):
+            keys = [key for key, _ in index.similar(query, 5)]
+            found += any(names[key] == name for key in keys)
+        fuzzy = (time.perf_counter() - start) / num_queries * 1000
+        print("%-12s %10.3f %10.2f %9d%%" % (label, exact, fuzzy, found * 100 // num_queries))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
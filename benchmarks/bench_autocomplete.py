@@ -0,0 +1,48 @@
+"""Measures PrefixIndex build time and completion latency on synthetic titles.
+
+Titles draw words from a Zipf-distributed vocabulary and carry random ratings counts, so short
+prefixes match large runs of names. Run from the project root:
+
+    python -m benchmarks.bench_autocomplete [num_titles]
+"""
+import itertools
+import random
+import sys
+import time
+
+from library.adapters.indexes import PrefixIndex
+
+VOCABULARY_SIZE = 50000
+
+
+def make_titles(num_titles, seed=0):
+    rng = random.Random(seed)
+    vocabulary = ["w%d" % rank for rank in range(VOCABULARY_SIZE)]
+    cumulative = list(itertools.accumulate(1 / (rank + 1) for rank in range(VOCABULARY_SIZE)))
+    for book_id in range(1, num_titles + 1):
+        title = " ".join(rng.choices(vocabulary, cum_weights=cumulative, k=rng.randint(2, 5)))
+        yield book_id, title, rng.randint(0, 100000)
+
+
+def main(num_titles=100000, repeats=20):
+    index = PrefixIndex()
+    start = time.perf_counter()
+    index.extend(make_titles(num_titles))
+    print("indexed %d titles in %.1fs" % (num_titles, time.perf_counter() - start))
+
+    # The first completion of a prefix scans its run; repeats are answered from the cache.
+    prefixes = ["w4000", "w400", "w40", "w4", "w"]
+    print("%-8s %10s %10s" % ("prefix", "cold ms", "cached ms"))
+    for prefix in prefixes:
+        start = time.perf_counter()
+        index.complete(prefix, 10)
+        cold = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        for _ in range(repeats):
+            index.complete(prefix, 10)
+        cached = (time.perf_counter() - start) / repeats * 1000
+        print("%-8s %10.2f %10.3f" % (prefix, cold, cached))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,54 @@
+"""Compares inserting books one at a time with add_book against the bulk load_books.
+
+Books are built in memory with random ids, so only the repository insert is timed. Pass
+--skip-add-book to time only the bulk load; one add_book at a time is quadratic and takes many
+minutes at 1M books.
+Run from the project root:
+
+    python -m benchmarks.bench_bulk_load [--skip-add-book] [num_books ...]
+"""
+import random
+import sys
+import time
+
+from library.adapters.memory_repository import MemoryRepository
+from library.domain.model import Book
+
+
+def make_books(num_books, seed=0):
+    book_ids = random.Random(seed).sample(range(1, num_books * 10), num_books)
+    return [Book(book_id, "Book %d" % book_id) for book_id in book_ids]
+
+
+def add_one_at_a_time(repo, books):
+    for book in books:
+        repo.add_book(book)
+
+
+def bulk_load(repo, books):
+    repo.load_books(books)
+
+
+def main(sizes=(100000, 1000000), skip_add_book=False):
+    print("%10s %10s %12s %10s" % ("books", "columnar", "method", "seconds"))
+    for num_books in sizes:
+        books = make_books(num_books)
+        for columnar in (False, True):
+            methods = [("load_books", bulk_load)]
+            if not skip_add_book:
+                methods.insert(0, ("add_book", add_one_at_a_time))
+            for name, insert in methods:
+                repo = MemoryRepository(columnar)
+                start = time.perf_counter()
+                insert(repo, books)
+                seconds = time.perf_counter() - start
+                book_ids = [book.book_id for book in repo.get_all_books()]
+                assert book_ids == sorted(book_ids)
+                print("%10d %10s %12s %10.3f" % (num_books, columnar, name, seconds))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    skip = "--skip-add-book" in args
+    sizes = [int(arg) for arg in args if arg != "--skip-add-book"] or (100000, 1000000)
+    main(sizes, skip)
@@ -0,0 +1,48 @@
+"""Measures browse queries against an SQLite catalogue with and without CachingRepository.
+
+Each line times a query read from the database and the same query answered from the cache.
+Run from the project root:
+
+    python -m benchmarks.bench_caching [num_books]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.bench_paging import make_books
+from library.adapters.caching_repository import CachingRepository
+from library.adapters.repository import BookQuery
+from library.adapters.sqlite_repository import SqliteRepository
+from library.domain.model import Publisher
+
+
+def timed(function, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main(num_books=200000, repeats=100):
+    with tempfile.TemporaryDirectory() as directory:
+        repo = SqliteRepository(Path(directory) / "catalogue.db")
+        repo.load_books(list(make_books(num_books)))
+        cached = CachingRepository(repo)
+        marvel = Publisher("Marvel")
+        queries = [
+            ("publisher page", lambda r: r.get_books_page(BookQuery(publisher=marvel), None, 5)),
+            ("year page", lambda r: r.get_books_page(BookQuery(start_year=2000, end_year=2000))),
+            ("publisher count", lambda r: r.get_number_of_books_by_publisher(marvel)),
+            ("release years", lambda r: r.get_all_release_years()),
+        ]
+        print("%-16s %10s %10s" % ("query", "sqlite ms", "cached ms"))
+        for name, query in queries:
+            uncached = timed(lambda: query(repo), repeats)
+            hit = timed(lambda: query(cached), repeats)
+            print("%-16s %10.3f %10.4f" % (name, uncached, hit))
+        print(cached.cache_info())
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,49 @@
+"""Compares memory per book and release-year scans for the object and columnar book stores,
+with descriptions held in memory or read lazily from the books file.
+
+Run from the project root:
+
+    python -m benchmarks.bench_columnar [num_books]
+"""
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.synthetic import write_dataset
+from library.adapters.jsondatareader import BooksJSONReader
+from library.adapters.memory_repository import MemoryRepository
+
+
+def load(columnar, lazy_descriptions, books_path, authors_path):
+    tracemalloc.start()
+    repo = MemoryRepository(columnar)
+    reader = BooksJSONReader(str(books_path), str(authors_path), lazy_descriptions)
+    repo.load_books(reader.iter_books())
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return repo, size
+
+
+def main(num_books=100000):
+    with tempfile.TemporaryDirectory() as directory:
+        books_path, authors_path = write_dataset(Path(directory), num_books)
+        print("%10s %6s %14s %16s" % ("store", "lazy", "bytes/book", "year scan (ms)"))
+        for name, columnar, lazy_descriptions in (
+            ("objects", False, False),
+            ("objects", False, True),
+            ("columnar", True, False),
+            ("columnar", True, True),
+        ):
+            repo, size = load(columnar, lazy_descriptions, books_path, authors_path)
+            start = time.perf_counter()
+            for year in range(2000, 2010):
+                repo.get_book_release_year(year)
+            scan_ms = (time.perf_counter() - start) * 1000 / 10
+            print("%10s %6s %14.0f %16.2f" % (name, lazy_descriptions, size / num_books, scan_ms))
+            del repo
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
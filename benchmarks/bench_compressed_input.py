@@ -0,0 +1,46 @@
+"""Compares reading the books file uncompressed and through gzip, bz2 and xz.
+
+Reports parse throughput in uncompressed MiB/s and the bytes that have to come off disk.
+Run from the project root:
+
+    python -m benchmarks.bench_compressed_input [num_books]
+"""
+import bz2
+import gzip
+import lzma
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import write_dataset
+from library.adapters.jsondatareader import BooksJSONReader
+
+CODECS = [("none", None), (".gz", gzip.open), (".bz2", bz2.open), (".xz", lzma.open)]
+
+
+def main(num_books=50000):
+    with tempfile.TemporaryDirectory() as directory:
+        books_path, authors_path = write_dataset(Path(directory), num_books)
+        raw_size = books_path.stat().st_size
+        print("%6s %12s %10s %10s" % ("codec", "disk MiB", "seconds", "MiB/s"))
+        for extension, opener in CODECS:
+            path = books_path
+            if opener is not None:
+                path = books_path.with_name(books_path.name + extension)
+                with open(books_path, "rb") as infile, opener(path, "wb") as outfile:
+                    shutil.copyfileobj(infile, outfile)
+
+            reader = BooksJSONReader(str(path), str(authors_path))
+            start = time.perf_counter()
+            count = sum(1 for _ in reader.iter_books())
+            seconds = time.perf_counter() - start
+            assert count == num_books
+            print("%6s %12.1f %10.3f %10.1f" % (
+                extension, path.stat().st_size / 2 ** 20, seconds, raw_size / 2 ** 20 / seconds
+            ))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
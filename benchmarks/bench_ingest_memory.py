@@ -0,0 +1,55 @@
+"""Compares peak traced memory of list-based and streaming book ingest.
+
+Run from the project root:
+
+    python -m benchmarks.bench_ingest_memory [num_books]
+"""
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.synthetic import write_dataset
+from library.adapters.jsondatareader import BooksJSONReader
+from library.adapters.memory_repository import MemoryRepository
+
+
+def list_ingest(books_path, authors_path):
+    # The pre-streaming path: every JSON entry, then every Book, then the repository copy.
+    repo = MemoryRepository()
+    reader = BooksJSONReader(str(books_path), str(authors_path))
+    authors_json = reader.read_authors_file()
+    authors_index = {int(entry["author_id"]): entry["name"] for entry in authors_json}
+    books_json = reader.read_books_file()
+    books = [reader.make_book(book_json, authors_index) for book_json in books_json]
+    repo.load_books(books)
+    return repo
+
+
+def streaming_ingest(books_path, authors_path):
+    repo = MemoryRepository()
+    reader = BooksJSONReader(str(books_path), str(authors_path))
+    repo.load_books(reader.iter_books())
+    return repo
+
+
+def measure(ingest, books_path, authors_path):
+    tracemalloc.start()
+    repo = ingest(books_path, authors_path)
+    final, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del repo
+    return final, peak
+
+
+def main(num_books=100000):
+    with tempfile.TemporaryDirectory() as directory:
+        books_path, authors_path = write_dataset(Path(directory), num_books)
+        print("%12s %12s %12s %8s" % ("mode", "final MiB", "peak MiB", "ratio"))
+        for name, ingest in (("list", list_ingest), ("streaming", streaming_ingest)):
+            final, peak = measure(ingest, books_path, authors_path)
+            print("%12s %12.1f %12.1f %8.2f" % (name, final / 2 ** 20, peak / 2 ** 20, peak / final))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
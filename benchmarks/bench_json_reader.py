@@ -0,0 +1,42 @@
+"""Times BooksJSONReader.read_json_files from the excerpt up to a million synthetic books.
+
+Run from the project root:
+
+    python -m benchmarks.bench_json_reader [max_books]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import write_dataset
+from library.adapters.jsondatareader import BooksJSONReader
+from utils import get_project_root
+
+SIZES = [1000, 10000, 100000, 1000000]
+
+
+def time_read(books_path, authors_path):
+    reader = BooksJSONReader(str(books_path), str(authors_path))
+    start = time.perf_counter()
+    reader.read_json_files()
+    return time.perf_counter() - start, len(reader.dataset_of_books)
+
+
+def main(max_books=1000000):
+    data_path = get_project_root() / "library" / "adapters" / "data"
+    seconds, count = time_read(
+        data_path / "comic_books_excerpt.json", data_path / "book_authors_excerpt.json"
+    )
+    print("%10s %10s %12s" % ("books", "seconds", "us/book"))
+    print("%10d %10.4f %12.2f" % (count, seconds, seconds / count * 1e6))
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in [size for size in SIZES if size <= max_books]:
+            books_path, authors_path = write_dataset(Path(directory), size)
+            seconds, count = time_read(books_path, authors_path)
+            print("%10d %10.4f %12.2f" % (count, seconds, seconds / count * 1e6))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
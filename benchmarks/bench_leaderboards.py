@@ -0,0 +1,68 @@
+"""Compares reading a leaderboard with ranking every book per request.
+
+Rated books are loaded into a MemoryRepository and a SqliteRepository in a temporary directory.
+Each line times the top ten books of a leaderboard through get_top_books, for the whole
+catalogue and for one publisher, once the board has been built, and the same list by sorting
+the books, as the home page would have to without the boards. A final line times a rating
+change, which keeps the boards up to date. Run from the project root:
+
+    python -m benchmarks.bench_leaderboards [num_books]
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.bench_paging import timed
+from benchmarks.bench_sorting import rated_books
+from library.adapters.memory_repository import MemoryRepository
+from library.adapters.repository import LEADERBOARDS
+from library.adapters.sqlite_repository import SqliteRepository
+from library.domain.model import Publisher
+
+MIN_RATINGS = 100
+
+
+def sort_top(books, board):
+    def key(book):
+        if board == "highest_rated":
+            return -book.average_rating, -book.ratings_count, book.book_id
+        if board == "most_rated":
+            return -(book.ratings_count or 0), book.book_id
+        return -len(book.reviews), book.book_id
+
+    if board == "highest_rated":
+        books = [book for book in books if (book.ratings_count or 0) >= MIN_RATINGS]
+    return sorted(books, key=key)[:10]
+
+
+def main(num_books=200000, repeats=20):
+    books = list(rated_books(num_books))
+    with tempfile.TemporaryDirectory() as directory:
+        repos = [
+            ("memory", MemoryRepository()),
+            ("sqlite", SqliteRepository(Path(directory) / "catalogue.db")),
+        ]
+        print("%-8s %-10s %-14s %10s %10s" % ("repo", "listing", "board", "top ms", "sort ms"))
+        for name, repo in repos:
+            repo.load_books(books)
+            marvel = Publisher("Marvel")
+            listings = [
+                ("all", None, repo.get_all_books),
+                ("publisher", marvel, lambda: repo.get_books_by_publisher(marvel)),
+            ]
+            for listing, publisher, list_books in listings:
+                for board in LEADERBOARDS:
+                    def top():
+                        return repo.get_top_books(board, 10, publisher, min_ratings=MIN_RATINGS)
+                    top()
+                    by_top = timed(top, repeats)
+                    by_sort = timed(lambda: sort_top(list_books(), board), 3)
+                    print("%-8s %-10s %-14s %10.3f %10.3f"
+                          % (name, listing, board, by_top, by_sort))
+            book = repo.get_book(1)
+            update = timed(lambda: book.update_average_rating(5), repeats)
+            print("%-8s %-10s %-14s %10.3f" % (name, "rating", "update", update))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,67 @@
+"""Compares the cost of the first and a deep page of books, by key and by offset.
+
+Books are loaded into a MemoryRepository and a SqliteRepository in a temporary directory. Each
+line times fetching five books at the start and near the end of a listing by keyset
+(get_books_page), and the deep page again by slicing, as the views did before: the whole list
+for all books and LIMIT/OFFSET for a publisher. Run from the project root:
+
+    python -m benchmarks.bench_paging [num_books]
+"""
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from library.adapters.memory_repository import MemoryRepository
+from library.adapters.repository import BookQuery
+from library.adapters.sqlite_repository import SqliteRepository
+from library.domain.model import Author, Book, Publisher
+
+PUBLISHERS = ["Marvel", "DC Comics", "Dargaud", "Image Comics", "Viz Media", "Dark Horse"]
+
+
+def make_books(num_books, seed=0):
+    rng = random.Random(seed)
+    for book_id in range(1, num_books + 1):
+        book = Book(book_id, "Book %d" % book_id)
+        book.publisher = Publisher(rng.choice(PUBLISHERS))
+        book.release_year = rng.randint(1950, 2017)
+        book.add_author(Author(rng.randint(1, 1000), "Author"))
+        yield book
+
+
+def timed(function, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main(num_books=200000, repeats=20):
+    books = list(make_books(num_books))
+    with tempfile.TemporaryDirectory() as directory:
+        repos = [
+            ("memory", MemoryRepository()),
+            ("sqlite", SqliteRepository(Path(directory) / "catalogue.db")),
+        ]
+        print("%-8s %-10s %10s %10s %10s" % ("repo", "listing", "first ms", "deep ms", "slice ms"))
+        for name, repo in repos:
+            repo.load_books(books)
+            marvel = Publisher("Marvel")
+            listings = [
+                ("all", BookQuery(), lambda start: repo.get_all_books()[start:start + 5]),
+                ("publisher", BookQuery(publisher=marvel),
+                 lambda start: repo.get_books_by_publisher(marvel, start, start + 5)),
+            ]
+            for listing, query, by_offset in listings:
+                total = repo.get_books_page(query, None, 5).total
+                last_key = repo.get_books_page(query, None, 5, reverse=True).books[0].book_id
+                first = timed(lambda: repo.get_books_page(query, None, 5), repeats)
+                deep = timed(lambda: repo.get_books_page(query, last_key - 1, 5), repeats)
+                offset = timed(lambda: by_offset(total - 5), repeats)
+                print("%-8s %-10s %10.3f %10.3f %10.3f" % (name, listing, first, deep, offset))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
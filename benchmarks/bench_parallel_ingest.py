@@ -0,0 +1,38 @@
+"""Compares BooksJSONReader parsing with 1, 2, 4 and 8 worker processes.
+
+Run from the project root:
+
+    python -m benchmarks.bench_parallel_ingest [num_books]
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import write_dataset
+from library.adapters.jsondatareader import BooksJSONReader
+from library.adapters.memory_repository import MemoryRepository
+
+WORKERS = [1, 2, 4, 8]
+
+
+def main(num_books=200000):
+    with tempfile.TemporaryDirectory() as directory:
+        books_path, authors_path = write_dataset(Path(directory), num_books)
+        print("%d books, %d CPUs" % (num_books, os.cpu_count()))
+        print("%8s %10s %8s" % ("workers", "seconds", "speedup"))
+        baseline = None
+        for workers in WORKERS:
+            repo = MemoryRepository()
+            reader = BooksJSONReader(str(books_path), str(authors_path))
+            start = time.perf_counter()
+            repo.load_books(reader.iter_books_parallel(workers))
+            seconds = time.perf_counter() - start
+            if baseline is None:
+                baseline = seconds
+            print("%8d %10.3f %8.2f" % (workers, seconds, baseline / seconds))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,30 @@
+"""Compares the time load_users spends on seeded passwords for each hashing mode.
+
+Run from the project root:
+
+    python -m benchmarks.bench_password_hashing [num_users] [workers]
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import write_users_file
+from library.adapters.memory_repository import MemoryRepository, load_users
+from library.authentication.passwords import EAGER_HASHING, LAZY_HASHING, PARALLEL_HASHING
+
+
+def main(num_users=200, workers=os.cpu_count()):
+    with tempfile.TemporaryDirectory() as directory:
+        write_users_file(Path(directory) / "users.csv", num_users)
+        print("%10s %8s %10s %12s" % ("mode", "workers", "seconds", "users/s"))
+        for mode in (EAGER_HASHING, PARALLEL_HASHING, LAZY_HASHING):
+            start = time.perf_counter()
+            load_users(Path(directory), MemoryRepository(), mode, workers)
+            seconds = time.perf_counter() - start
+            print("%10s %8d %10.3f %12.0f" % (mode, workers, seconds, num_users / seconds))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
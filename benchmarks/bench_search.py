@@ -0,0 +1,54 @@
+"""Measures SearchIndex build time and query latency on a synthetic catalogue.
+
+Titles and descriptions draw words from a Zipf-distributed vocabulary, so queries cover rare,
+mid-frequency and very common terms. Run from the project root:
+
+    python -m benchmarks.bench_search [num_books]
+"""
+import itertools
+import random
+import sys
+import time
+
+from library.adapters.search import SearchIndex
+from library.domain.model import Author, Book
+
+VOCABULARY_SIZE = 50000
+
+
+def make_books(num_books, seed=0):
+    rng = random.Random(seed)
+    vocabulary = ["w%d" % rank for rank in range(VOCABULARY_SIZE)]
+    cumulative = list(itertools.accumulate(1 / (rank + 1) for rank in range(VOCABULARY_SIZE)))
+    for book_id in range(1, num_books + 1):
+        book = Book(book_id, " ".join(rng.choices(vocabulary, cum_weights=cumulative, k=rng.randint(2, 5))))
+        book.description = " ".join(rng.choices(vocabulary, cum_weights=cumulative, k=rng.randint(20, 120)))
+        book.add_author(Author(rng.randint(1, 100000), "Author %d" % rng.randint(1, 100000)))
+        yield book
+
+
+def main(num_books=100000, repeats=20):
+    books = dict()
+    index = SearchIndex()
+    start = time.perf_counter()
+    for book in make_books(num_books):
+        index.add(book)
+        books[book.book_id] = book
+    print("indexed %d books in %.1fs" % (num_books, time.perf_counter() - start))
+
+    queries = ["w40000", "w5000", "w500 w5000", "w50", "w5", "w5 w50 w500", '"w1 w2"']
+    # The first run of a query ranks every match; later runs page through the cached ranking.
+    print("%-14s %10s %10s %10s" % ("query", "results", "cold ms", "cached ms"))
+    for query in queries:
+        start = time.perf_counter()
+        results, total = index.search(query, books.get, 0, 10)
+        cold = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        for page in range(repeats):
+            index.search(query, books.get, page * 10, page * 10 + 10)
+        cached = (time.perf_counter() - start) / repeats * 1000
+        print("%-14s %10d %10.2f %10.3f" % (query, total, cold, cached))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
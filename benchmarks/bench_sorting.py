@@ -0,0 +1,65 @@
+"""Compares a page of books sorted by each order with sorting every book per request.
+
+Books are loaded into a MemoryRepository and a SqliteRepository in a temporary directory. Each
+line times a deep page of five books in one of the browse orders through get_books_page, for
+the whole catalogue and for one publisher, and the same page by sorting the books and slicing,
+as a view would have to without the orders. Run from the project root:
+
+    python -m benchmarks.bench_sorting [num_books]
+"""
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.bench_paging import make_books, timed
+from library.adapters.memory_repository import MemoryRepository
+from library.adapters.repository import BOOK_ORDERS, BookQuery
+from library.adapters.sqlite_repository import SqliteRepository
+from library.domain.model import Publisher
+
+
+def rated_books(num_books, seed=0):
+    rng = random.Random(seed)
+    for book in make_books(num_books, seed):
+        book.initiliase_rating_and_count(round(rng.uniform(1, 5), 2), rng.randint(0, 100000))
+        yield book
+
+
+def sort_and_slice(books, order, start):
+    attribute, descending = BOOK_ORDERS[order]
+
+    def key(book):
+        value = getattr(book, attribute)
+        return ((0,) if value is None else (1, value)), book.book_id
+    return sorted(books, key=key, reverse=descending)[start:start + 5]
+
+
+def main(num_books=200000, repeats=20):
+    books = list(rated_books(num_books))
+    with tempfile.TemporaryDirectory() as directory:
+        repos = [
+            ("memory", MemoryRepository()),
+            ("sqlite", SqliteRepository(Path(directory) / "catalogue.db")),
+        ]
+        print("%-8s %-10s %-15s %10s %10s" % ("repo", "listing", "order", "page ms", "sort ms"))
+        for name, repo in repos:
+            repo.load_books(books)
+            marvel = Publisher("Marvel")
+            listings = [
+                ("all", BookQuery(), repo.get_all_books),
+                ("publisher", BookQuery(publisher=marvel),
+                 lambda: repo.get_books_by_publisher(marvel)),
+            ]
+            for listing, query, list_books in listings:
+                for order in BOOK_ORDERS:
+                    total = repo.get_books_page(query, None, 5, order=order).total
+                    deep_key = sort_and_slice(list_books(), order, total - 10)[-1].book_id
+                    page = timed(lambda: repo.get_books_page(query, deep_key, 5, order=order),
+                                 repeats)
+                    by_sort = timed(lambda: sort_and_slice(list_books(), order, total - 5), 3)
+                    print("%-8s %-10s %-15s %10.3f %10.3f" % (name, listing, order, page, by_sort))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
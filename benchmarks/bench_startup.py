@@ -0,0 +1,49 @@
+"""Compares populating the repository from the data files with loading a catalogue snapshot.
+
+Run from the project root:
+
+    python -m benchmarks.bench_startup [num_books] [num_users]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import write_dataset
+from library.adapters.memory_repository import MemoryRepository, populate
+from library.adapters.snapshot import populate_from_snapshot
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def full_populate(data_path):
+    repo = MemoryRepository()
+    populate(data_path, repo)
+    return repo
+
+
+def main(num_books=100000, num_users=50):
+    with tempfile.TemporaryDirectory() as directory:
+        data_path = Path(directory) / "data"
+        write_dataset(data_path, num_books, num_users=num_users, num_reviews=num_users * 10)
+        snapshot_path = Path(directory) / "catalogue.snapshot"
+
+        populate_seconds, _ = timed(full_populate, data_path)
+        cold_seconds, _ = timed(populate_from_snapshot, data_path, snapshot_path)
+        warm_seconds, repo = timed(populate_from_snapshot, data_path, snapshot_path)
+
+        print("%d books, %d users, snapshot %.1f MiB" % (
+            repo.get_number_of_book(), num_users, snapshot_path.stat().st_size / 2 ** 20
+        ))
+        print("%-28s %10.3f s" % ("populate()", populate_seconds))
+        print("%-28s %10.3f s" % ("first start (writes snapshot)", cold_seconds))
+        print("%-28s %10.3f s" % ("later start (reads snapshot)", warm_seconds))
+        print("%-28s %10.1f x" % ("speedup", populate_seconds / warm_seconds))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,97 @@
+"""Synthetic Goodreads-style data files for the benchmarks."""
+import csv
+import json
+import random
+from pathlib import Path
+
+PUBLISHERS = ["Marvel", "DC Comics", "Dargaud", "Image Comics", "Viz Media", "Dark Horse", ""]
+WORDS = [
+    "night", "city", "archives", "volume", "return", "shadow", "legend", "war", "stories",
+    "moon", "dragon", "empire", "secret", "knight", "star", "garden", "blood", "chains",
+]
+
+
+def write_authors_file(path: Path, num_authors: int, seed: int = 0):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="UTF-8") as authors_file:
+        for author_id in range(1, num_authors + 1):
+            entry = {
+                "average_rating": "%.2f" % rng.uniform(1, 5),
+                "author_id": str(author_id),
+                "text_reviews_count": str(rng.randint(0, 1000)),
+                "name": "%s %s" % (rng.choice(WORDS).title(), rng.choice(WORDS).title()),
+                "ratings_count": str(rng.randint(0, 100000)),
+            }
+            authors_file.write(json.dumps(entry) + "\n")
+
+
+def write_books_file(path: Path, num_books: int, num_authors: int, seed: int = 0):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="UTF-8") as books_file:
+        for book_id in range(1, num_books + 1):
+            authors = [
+                {"author_id": str(rng.randint(1, num_authors)), "role": ""}
+                for _ in range(rng.randint(1, 3))
+            ]
+            title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).title()
+            entry = {
+                "book_id": str(book_id),
+                "title": title,
+                "publisher": rng.choice(PUBLISHERS),
+                "publication_year": rng.choice(["", str(rng.randint(1950, 2017))]),
+                "is_ebook": rng.choice(["true", "false"]),
+                "description": " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 120))),
+                "num_pages": rng.choice(["", str(rng.randint(20, 600))]),
+                "url": "https://www.goodreads.com/book/show/%d" % book_id,
+                "image_url": "https://images.gr-assets.com/books/%d.jpg" % book_id,
+                "ratings_count": str(rng.randint(0, 5000)),
+                "average_rating": "%.2f" % rng.uniform(1, 5),
+                "authors": authors,
+            }
+            books_file.write(json.dumps(entry) + "\n")
+
+
+def write_users_file(path: Path, num_users: int):
+    with open(path, "w", encoding="utf-8", newline="") as users_file:
+        writer = csv.writer(users_file)
+        writer.writerow(["id", "username", "password"])
+        for user_id in range(1, num_users + 1):
+            writer.writerow([user_id, "reader%d" % user_id, "Password%d" % user_id])
+
+
+def write_reviews_file(path: Path, num_reviews: int, num_users: int, num_books: int, seed: int = 0):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8", newline="") as reviews_file:
+        writer = csv.writer(reviews_file)
+        writer.writerow(["id", "author-id", "book-id", "review-text", "timestamp"])
+        for review_id in range(1, num_reviews + 1):
+            writer.writerow([
+                review_id,
+                rng.randint(1, num_users),
+                rng.randint(1, num_books),
+                " ".join(rng.choice(WORDS) for _ in range(10)),
+                "2020-01-%02d 12:00:00" % rng.randint(1, 28),
+            ])
+
+
+def write_dataset(
+    directory: Path,
+    num_books: int,
+    num_authors: int = None,
+    num_users: int = 0,
+    num_reviews: int = 0,
+    seed: int = 0,
+):
+    """Writes the books and authors JSON files, plus users.csv and reviews.csv when num_users > 0."""
+    if num_authors is None:
+        num_authors = max(1, num_books // 4)
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    books_path = directory / "comic_books_excerpt.json"
+    authors_path = directory / "book_authors_excerpt.json"
+    write_authors_file(authors_path, num_authors, seed)
+    write_books_file(books_path, num_books, num_authors, seed)
+    if num_users > 0:
+        write_users_file(directory / "users.csv", num_users)
+        write_reviews_file(directory / "reviews.csv", num_reviews, num_users, num_books, seed)
+    return books_path, authors_path
@@ -10,3 +10,29 @@ class Config:
     FLASK_ENV = environ.get("FLASK_ENV")
     SECRET_KEY = environ.get("SECRET_KEY")
     TESTING = environ.get("TESTING")
+    # Where the catalogue is kept: 'memory' (loaded from the data files at every start) or
+    # 'sqlite' (the database file at SQLITE_DATABASE_PATH, loaded from the data files when empty).
+    REPOSITORY = environ.get("REPOSITORY", "memory")
+    SQLITE_DATABASE_PATH = environ.get("SQLITE_DATABASE_PATH", "instance/catalogue.db")
+    # Number of read query results kept in the repository's LRU cache; 0 disables the cache.
+    REPOSITORY_CACHE_SIZE = int(environ.get("REPOSITORY_CACHE_SIZE", 1024))
+    # Books in each leaderboard on the home page, and the ratings a book needs to be listed as
+    # highest rated.
+    LEADERBOARD_SIZE = int(environ.get("LEADERBOARD_SIZE", 5))
+    LEADERBOARD_MIN_RATINGS = int(environ.get("LEADERBOARD_MIN_RATINGS", 10))
+    # Number of processes used to parse the books file at startup.
+    INGEST_WORKERS = int(environ.get("INGEST_WORKERS", 1))
+    # Binary snapshot of the populated repository; leave unset to always load from the data files.
+    SNAPSHOT_PATH = environ.get("SNAPSHOT_PATH")
+    # Keep book fields in typed arrays instead of one Python object per book.
+    COLUMNAR_BOOK_STORE = environ.get("COLUMNAR_BOOK_STORE", "False").lower() == "true"
+    # Leave descriptions in the books file and read them on demand.
+    LAZY_DESCRIPTIONS = environ.get("LAZY_DESCRIPTIONS", "False").lower() == "true"
+    # Seconds between checks for lines appended to the data files; 0 disables the poller.
+    DELTA_POLL_INTERVAL = float(environ.get("DELTA_POLL_INTERVAL", 0))
+    # How plaintext passwords in users.csv are hashed: 'parallel' (in INGEST_WORKERS processes),
+    # 'eager' or 'lazy' (on first login). The SQLite repository and snapshots always store hashes.
+    PASSWORD_HASHING = environ.get("PASSWORD_HASHING", "parallel")
+    # Log the time, CPU and record count of each loading stage at startup; memory tracing is slower.
+    PROFILE_STARTUP = environ.get("PROFILE_STARTUP", "False").lower() == "true"
+    PROFILE_STARTUP_MEMORY = environ.get("PROFILE_STARTUP_MEMORY", "False").lower() == "true"
@@ -1,9 +1,19 @@
 """Initialize Flask app."""
+import json
+
+import click
 from flask import Flask
 from pathlib import Path
 
 import library.adapters.repository as repo
+from library.adapters.caching_repository import CachingRepository
 from library.adapters.memory_repository import MemoryRepository, populate
+from library.adapters.sqlite_repository import SqliteRepository
+from library.adapters.snapshot import populate_from_snapshot
+from library.adapters.datafiles import data_file_sizes
+from library.adapters.delta import DATA_FILE_NAMES, DeltaIngester, DeltaPoller
+from library.adapters.profiling import StartupProfiler
+from library.authentication.passwords import LAZY_HASHING, PARALLEL_HASHING
 
 
 def create_app(test_config=None):
@@ -19,8 +29,103 @@ def create_app(test_config=None):
         data_path = app.config["TEST_DATA_PATH"]
 
     # Instantiate MemoryRepository implementation & fill with books from JSON file
-    repo.repo_instance = MemoryRepository()
-    populate(data_path, repo.repo_instance)
+    workers = app.config.get("INGEST_WORKERS", 1)
+    columnar = app.config.get("COLUMNAR_BOOK_STORE", False)
+    lazy_descriptions = app.config.get("LAZY_DESCRIPTIONS", False)
+    password_hashing = app.config.get("PASSWORD_HASHING", PARALLEL_HASHING)
+    snapshot_path = app.config.get("SNAPSHOT_PATH")
+    profiler = None
+    if app.config.get("PROFILE_STARTUP", False):
+        profiler = StartupProfiler(app.config.get("PROFILE_STARTUP_MEMORY", False))
+    # The repository is loaded from the data files up to their current sizes, and the delta
+    # ingester below follows them from there, so lines appended during startup are not missed.
+    sizes = data_file_sizes(data_path, DATA_FILE_NAMES)
+    repository = app.config.get("REPOSITORY", "memory")
+    if repository == "sqlite":
+        # The database keeps the catalogue between starts; only an empty one is loaded.
+        database_path = Path(app.config.get("SQLITE_DATABASE_PATH", "instance/catalogue.db"))
+        database_path.parent.mkdir(parents=True, exist_ok=True)
+        repo.repo_instance = SqliteRepository(database_path)
+        if repo.repo_instance.get_number_of_books() == 0:
+            # The database only stores hashes, so lazy hashing is done up front in parallel.
+            populate(
+                data_path,
+                repo.repo_instance,
+                workers,
+                lazy_descriptions,
+                PARALLEL_HASHING if password_hashing == LAZY_HASHING else password_hashing,
+                profiler,
+                sizes,
+            )
+            repo.repo_instance.set_data_file_offsets(sizes)
+        else:
+            # Follow the data files from where the last run stopped, so lines appended while
+            # the app was stopped are loaded below. A database from before offsets were stored
+            # is taken to hold the files as they are now.
+            sizes.update(repo.repo_instance.get_data_file_offsets())
+            repo.repo_instance.set_data_file_offsets(sizes)
+    elif snapshot_path:
+        # Reuse the catalogue snapshot written by an earlier start when the data files are unchanged.
+        repo.repo_instance = populate_from_snapshot(
+            data_path,
+            Path(snapshot_path),
+            workers,
+            columnar,
+            lazy_descriptions,
+            password_hashing,
+            profiler,
+            sizes,
+        )
+    else:
+        repo.repo_instance = MemoryRepository(columnar)
+        populate(
+            data_path,
+            repo.repo_instance,
+            workers,
+            lazy_descriptions,
+            password_hashing,
+            profiler,
+            sizes,
+        )
+    if profiler is not None:
+        profiler.log(app.logger)
+
+    # Remember the results of read queries until the next write; the delta ingester below writes
+    # through the cache, so appended data invalidates it too.
+    cache_size = app.config.get("REPOSITORY_CACHE_SIZE", 0)
+    if cache_size > 0:
+        repo.repo_instance = CachingRepository(repo.repo_instance, cache_size)
+
+    # Follow lines appended to the data files after startup.
+    app.extensions["delta_ingester"] = DeltaIngester(
+        data_path, repo.repo_instance, lazy_descriptions, password_hashing, sizes
+    )
+    if repository == "sqlite" and app.extensions["delta_ingester"].pending():
+        app.extensions["delta_ingester"].apply()
+    poll_interval = app.config.get("DELTA_POLL_INTERVAL", 0)
+    if poll_interval > 0:
+        DeltaPoller(app.extensions["delta_ingester"], poll_interval).start()
+
+    @app.cli.command("profile-startup")
+    @click.option("--workers", type=int, default=workers, help="Processes used to parse the books file.")
+    @click.option("--memory/--no-memory", default=True, help="Trace peak memory of each stage (slower).")
+    @click.option("--json", "as_json", is_flag=True, help="Print the report as one line of JSON.")
+    def profile_startup(workers, memory, as_json):
+        """Load the data files into a new repository and report the cost of each stage."""
+        startup_profiler = StartupProfiler(memory)
+        populate(
+            data_path,
+            MemoryRepository(columnar),
+            workers,
+            lazy_descriptions,
+            password_hashing,
+            startup_profiler,
+        )
+        startup_profiler.log(app.logger)
+        if as_json:
+            click.echo(json.dumps(startup_profiler.as_dict(), sort_keys=True))
+        else:
+            click.echo(startup_profiler.format_table())
 
     with app.app_context():
         # Register blueprints
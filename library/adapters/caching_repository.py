@@ -0,0 +1,254 @@
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Dict, Iterable, List, Tuple
+
+from library.adapters.repository import (
+    AbstractRepository,
+    BookPage,
+    BookQuery,
+    BookQueryResult,
+)
+from library.domain.model import User, Book, Review, Publisher, Author
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "evictions", "size", "max_size", "version"])
+
+
+def cache_key(value):
+    # A hashable stand-in for a method argument. BookQuery has no value equality of its own, so
+    # queries with the same filters are keyed by their fields; lists and sets by their items.
+    if isinstance(value, BookQuery):
+        return BookQuery, tuple(sorted(vars(value).items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(cache_key(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(cache_key(item) for item in value)
+    return value
+
+
+class CachingRepository(AbstractRepository):
+    # Wraps another repository and remembers the results of its read methods in a size-bounded
+    # LRU cache keyed by method and arguments. Every write goes to the wrapped repository and
+    # bumps a version number; results are stored with the version they were read at, so a write
+    # makes every cached result stale at once without walking the cache. Books report changes to
+    # their rating to the wrapped repository rather than through the wrapper, so its count of
+    # rating changes is part of the version too. Random picks and users, whose objects are
+    # changed in place between requests, are always read through.
+    #
+    # Results are shared between callers, so they must be treated as read-only, as the lists a
+    # MemoryRepository returns already are.
+
+    def __init__(self, repository: AbstractRepository, max_size: int = 1024):
+        self.__repository = repository
+        self.__max_size = max_size
+        self.__cache = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__version = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+
+    @property
+    def repository(self) -> AbstractRepository:
+        return self.__repository
+
+    @property
+    def version(self) -> int:
+        return self.__version
+
+    @property
+    def rating_changes(self) -> int:
+        return self.__repository.rating_changes
+
+    def cache_info(self) -> CacheInfo:
+        with self.__lock:
+            return CacheInfo(
+                self.__hits,
+                self.__misses,
+                self.__evictions,
+                len(self.__cache),
+                self.__max_size,
+                self.__version,
+            )
+
+    def clear_cache(self):
+        with self.__lock:
+            self.__cache.clear()
+
+    def __getattr__(self, name):
+        # Methods particular to the wrapped repository, such as MemoryRepository.columnar.
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.__repository, name)
+
+    def __cached(self, method: str, *args):
+        try:
+            key = (method, cache_key(args))
+            hash(key)
+        except TypeError:
+            return getattr(self.__repository, method)(*args)
+        with self.__lock:
+            version = (self.__version, self.__repository.rating_changes)
+            entry = self.__cache.get(key)
+            if entry is not None and entry[0] == version:
+                self.__cache.move_to_end(key)
+                self.__hits += 1
+                return entry[1]
+            self.__misses += 1
+        # The wrapped repository is read outside the lock. A write made meanwhile bumps the
+        # version, so the result is stored as already stale.
+        result = getattr(self.__repository, method)(*args)
+        with self.__lock:
+            self.__cache[key] = (version, result)
+            self.__cache.move_to_end(key)
+            while len(self.__cache) > self.__max_size:
+                self.__cache.popitem(last=False)
+                self.__evictions += 1
+        return result
+
+    def __changed(self):
+        with self.__lock:
+            self.__version += 1
+
+    # ---- writes ----
+
+    def add_user(self, user: User):
+        self.__repository.add_user(user)
+        self.__changed()
+
+    def update_user(self, user: User):
+        self.__repository.update_user(user)
+        self.__changed()
+
+    def add_book(self, book: Book):
+        self.__repository.add_book(book)
+        self.__changed()
+
+    def load_books(self, list_of_books):
+        self.__repository.load_books(list_of_books)
+        self.__changed()
+
+    def add_publishers(self, set_of_publishers: set):
+        self.__repository.add_publishers(set_of_publishers)
+        self.__changed()
+
+    def load_authors(self):
+        self.__repository.load_authors()
+        self.__changed()
+
+    def add_authors(self, authors):
+        self.__repository.add_authors(authors)
+        self.__changed()
+
+    def add_review(self, review: Review):
+        # The review is attached to its book before the repository sees it, so cached results
+        # holding the book are stale even if the repository rejects it.
+        try:
+            self.__repository.add_review(review)
+        finally:
+            self.__changed()
+
+    # ---- reads passed straight through ----
+
+    def get_user(self, user_name) -> User:
+        return self.__repository.get_user(user_name)
+
+    def get_users(self, user_names: Iterable[str]) -> List[User]:
+        return self.__repository.get_users(user_names)
+
+    def get_books_random(self, num_books=5):
+        return self.__repository.get_books_random(num_books)
+
+    # ---- cached reads ----
+
+    def get_book(self, book_id: int):
+        return self.__cached("get_book", book_id)
+
+    def get_books(self, book_ids: Iterable[int]) -> List[Book]:
+        return self.__cached("get_books", list(book_ids))
+
+    def get_number_of_books(self) -> int:
+        return self.__cached("get_number_of_books")
+
+    def get_all_books(self):
+        return self.__cached("get_all_books")
+
+    def get_publishers(self):
+        return self.__cached("get_publishers")
+
+    def get_books_by_publisher(
+        self, publisher: Publisher, start: int = 0, stop: int = None
+    ) -> List[Book]:
+        return self.__cached("get_books_by_publisher", publisher, start, stop)
+
+    def get_number_of_books_by_publisher(self, publisher: Publisher) -> int:
+        return self.__cached("get_number_of_books_by_publisher", publisher)
+
+    def get_publisher_by_name(self, name: str) -> Publisher:
+        return self.__cached("get_publisher_by_name", name)
+
+    def get_book_release_year(self, year: int, start: int = 0, stop: int = None) -> List[Book]:
+        return self.__cached("get_book_release_year", year, start, stop)
+
+    def get_number_of_books_by_release_year(self, year: int) -> int:
+        return self.__cached("get_number_of_books_by_release_year", year)
+
+    def get_books_between_years(self, start_year: int = None, end_year: int = None) -> List[Book]:
+        return self.__cached("get_books_between_years", start_year, end_year)
+
+    def get_all_authors(self):
+        return self.__cached("get_all_authors")
+
+    def get_all_release_years(self):
+        return self.__cached("get_all_release_years")
+
+    def get_books_by_author(self, author: Author) -> List[Book]:
+        return self.__cached("get_books_by_author", author)
+
+    def query_books(self, query: BookQuery, start: int = 0, stop: int = None) -> BookQueryResult:
+        return self.__cached("query_books", query, start, stop)
+
+    def get_books_page(
+        self, query: BookQuery, after_key: int = None, limit: int = 5, reverse: bool = False,
+        order: str = None,
+    ) -> BookPage:
+        return self.__cached("get_books_page", query, after_key, limit, reverse, order)
+
+    def get_top_books(
+        self, board: str, limit: int = 10, publisher: Publisher = None, author: Author = None,
+        release_year: int = None, min_ratings: int = 0,
+    ) -> List[Book]:
+        return self.__cached(
+            "get_top_books", board, limit, publisher, author, release_year, min_ratings
+        )
+
+    def search_books(self, query: str, start: int = 0, stop: int = None) -> Tuple[List[Book], int]:
+        return self.__cached("search_books", query, start, stop)
+
+    def complete_titles(self, prefix: str, limit: int = 10) -> List[Book]:
+        return self.__cached("complete_titles", prefix, limit)
+
+    def complete_authors(self, prefix: str, limit: int = 10) -> List[Author]:
+        return self.__cached("complete_authors", prefix, limit)
+
+    def complete_publishers(self, prefix: str, limit: int = 10) -> List[Publisher]:
+        return self.__cached("complete_publishers", prefix, limit)
+
+    def find_authors_by_name(self, name: str) -> List[Author]:
+        return self.__cached("find_authors_by_name", name)
+
+    def match_authors(self, name: str, limit: int = 10) -> List[Author]:
+        return self.__cached("match_authors", name, limit)
+
+    def get_author_by_id(self, unique_id: int) -> Author:
+        return self.__cached("get_author_by_id", unique_id)
+
+    def get_authors(self, unique_ids: Iterable[int]) -> List[Author]:
+        return self.__cached("get_authors", list(unique_ids))
+
+    # ---- data file offsets, which no cached result depends on ----
+
+    def get_data_file_offsets(self) -> Dict[str, int]:
+        return self.__repository.get_data_file_offsets()
+
+    def set_data_file_offsets(self, offsets: Dict[str, int]):
+        self.__repository.set_data_file_offsets(offsets)
@@ -0,0 +1,538 @@
+from array import array
+from bisect import bisect_left
+from math import isnan
+from typing import List, Optional, Sequence
+
+from library.domain.model import Publisher, Author, Book, Review
+
+
+class StringTable:
+    # UTF-8 heap shared by every string column. A string is addressed by its (offset, length)
+    # pair, with a length of -1 standing for None. Low-cardinality values such as publisher and
+    # author names are interned once and referred to by id. A replaced string is overwritten in
+    # place when the new one fits; otherwise its bytes are counted as unused until compact().
+
+    def __init__(self):
+        self.__heap = bytearray()
+        self.__unused = 0
+        self.__interned_offsets = array("q")
+        self.__interned_lengths = array("i")
+        self.__interned_ids = dict()
+
+    def add(self, value: Optional[str]):
+        if value is None:
+            return 0, -1
+        encoded = value.encode("utf-8")
+        offset = len(self.__heap)
+        self.__heap += encoded
+        return offset, len(encoded)
+
+    def replace(self, offset: int, length: int, value: Optional[str]):
+        # Returns the (offset, length) of value, stored over the string at (offset, length).
+        if value is None:
+            self.__unused += max(length, 0)
+            return 0, -1
+        encoded = value.encode("utf-8")
+        if len(encoded) <= length:
+            self.__heap[offset:offset + len(encoded)] = encoded
+            self.__unused += length - len(encoded)
+            return offset, len(encoded)
+        self.__unused += max(length, 0)
+        return self.add(value)
+
+    @property
+    def unused(self) -> int:
+        return self.__unused
+
+    def compact(self, columns):
+        # Copies the strings still referred to into a new heap. columns holds the
+        # (offsets, lengths) arrays of every string column; their offsets are updated in place.
+        heap = bytearray()
+        for offsets, lengths in [(self.__interned_offsets, self.__interned_lengths)] + columns:
+            for i in range(len(offsets)):
+                if lengths[i] >= 0:
+                    start = offsets[i]
+                    offsets[i] = len(heap)
+                    heap += self.__heap[start:start + lengths[i]]
+        self.__heap = heap
+        self.__unused = 0
+
+    def get(self, offset: int, length: int) -> Optional[str]:
+        if length < 0:
+            return None
+        return self.__heap[offset:offset + length].decode("utf-8")
+
+    def intern(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        string_id = self.__interned_ids.get(value)
+        if string_id is None:
+            offset, length = self.add(value)
+            string_id = len(self.__interned_offsets)
+            self.__interned_offsets.append(offset)
+            self.__interned_lengths.append(length)
+            self.__interned_ids[value] = string_id
+        return string_id
+
+    def lookup(self, value: str) -> int:
+        # Returns the id of an interned string, or -1 if it was never interned.
+        return self.__interned_ids.get(value, -1)
+
+    def get_interned(self, string_id: int) -> Optional[str]:
+        if string_id < 0:
+            return None
+        return self.get(self.__interned_offsets[string_id], self.__interned_lengths[string_id])
+
+    def __len__(self):
+        return len(self.__heap)
+
+
+class ColumnarBookStore:
+    # Books stored column by column in typed arrays, with rows kept in book_id order. Missing
+    # numeric values are stored as -1 (NaN for the average rating). Book objects are not kept;
+    # BookView instances are created on demand and read and write through to the columns.
+
+    STRING_COLUMNS = ("title", "description", "hyperlink", "image_hyperlink")
+
+    def __init__(self):
+        self.__strings = StringTable()
+        self.__book_ids = array("q")
+        self.__release_years = array("i")
+        self.__num_pages = array("i")
+        self.__average_ratings = array("d")
+        self.__ratings_counts = array("q")
+        self.__ebooks = array("b")
+        self.__publishers = array("i")
+        self.__author_lists = array("i")
+        self.__offsets = {name: array("q") for name in self.STRING_COLUMNS}
+        self.__lengths = {name: array("i") for name in self.STRING_COLUMNS}
+
+        # Descriptions of lazily loaded books stay in the books file: only their line offset is
+        # kept here, and the text is read through the shared description source on access.
+        self.__description_offsets = array("q")
+        self.__description_source = None
+
+        # Books share author lists, so each distinct tuple of author ids is stored once.
+        self.__author_list_table = list()
+        self.__author_list_ids = dict()
+        self.__author_names = dict()
+        self.__reviews = dict()
+        self.__rating_observer = None
+
+    # ---- sequence protocol, in book_id order ----
+
+    def __len__(self):
+        return len(self.__book_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [BookView(self, book_id) for book_id in self.__book_ids[index]]
+        return BookView(self, self.__book_ids[index])
+
+    def __iter__(self):
+        for book_id in self.__book_ids:
+            yield BookView(self, book_id)
+
+    @property
+    def heap_size(self) -> int:
+        # Bytes held by the string heap, including unused space not yet compacted away.
+        return len(self.__strings)
+
+    # ---- row access ----
+
+    def row_of(self, book_id: int) -> int:
+        row = bisect_left(self.__book_ids, book_id)
+        if row < len(self.__book_ids) and self.__book_ids[row] == book_id:
+            return row
+        return -1
+
+    def __contains__(self, book_id):
+        return self.row_of(book_id) >= 0
+
+    def get(self, book_id: int) -> Optional["BookView"]:
+        if self.row_of(book_id) < 0:
+            return None
+        return BookView(self, book_id)
+
+    def add(self, book: Book):
+        row = bisect_left(self.__book_ids, book.book_id)
+        if row == len(self.__book_ids) or self.__book_ids[row] != book.book_id:
+            self.__insert_row(row, book.book_id)
+        self.__write_row(row, book)
+
+    def extend(self, books):
+        # Bulk load: rows are appended at the end and put back in book_id order with one sort,
+        # instead of shifting every column for each insert.
+        num_sorted = len(self.__book_ids)
+        new_rows = dict()
+        for book in books:
+            row = new_rows.get(book.book_id)
+            if row is None:
+                row = bisect_left(self.__book_ids, book.book_id, 0, num_sorted)
+                if row == num_sorted or self.__book_ids[row] != book.book_id:
+                    row = len(self.__book_ids)
+                    self.__insert_row(row, book.book_id)
+                    new_rows[book.book_id] = row
+            self.__write_row(row, book)
+        if new_rows:
+            self.__sort_rows()
+
+    def __sort_rows(self):
+        book_ids = self.__book_ids
+        if all(book_ids[i] < book_ids[i + 1] for i in range(len(book_ids) - 1)):
+            return
+        order = sorted(range(len(book_ids)), key=book_ids.__getitem__)
+        columns = [
+            self.__book_ids, self.__release_years, self.__num_pages, self.__average_ratings,
+            self.__ratings_counts, self.__ebooks, self.__publishers, self.__author_lists,
+            self.__description_offsets,
+        ]
+        for name in self.STRING_COLUMNS:
+            columns.extend((self.__offsets[name], self.__lengths[name]))
+        for column in columns:
+            column[:] = array(column.typecode, [column[row] for row in order])
+
+    def __insert_row(self, row: int, book_id: int):
+        self.__book_ids.insert(row, book_id)
+        for column in (self.__release_years, self.__num_pages, self.__ratings_counts,
+                       self.__publishers, self.__author_lists):
+            column.insert(row, -1)
+        self.__ebooks.insert(row, -1)
+        self.__description_offsets.insert(row, -1)
+        self.__average_ratings.insert(row, float("nan"))
+        for name in self.STRING_COLUMNS:
+            self.__offsets[name].insert(row, 0)
+            self.__lengths[name].insert(row, -1)
+
+    def __write_row(self, row: int, book: Book):
+        for name in ("title", "hyperlink", "image_hyperlink"):
+            self.__set_string(row, name, getattr(book, name))
+        if book.description_source is not None:
+            self.__description_source = book.description_source
+            self.__description_offsets[row] = book.description_offset
+            self.__set_string(row, "description", None)
+        else:
+            self.__set_description(row, book.description)
+        self.__release_years[row] = -1 if book.release_year is None else book.release_year
+        self.__num_pages[row] = -1 if book.num_pages is None else book.num_pages
+        self.__ebooks[row] = -1 if book.ebook is None else int(book.ebook)
+        self.__set_rating(row, book.average_rating, book.ratings_count)
+        self.__publishers[row] = (
+            -1 if book.publisher is None else self.__strings.intern(book.publisher.name)
+        )
+        self.__set_authors(row, book.authors)
+        if book.reviews:
+            self.__reviews[book.book_id] = list(book.reviews)
+
+    def __set_string(self, row: int, name: str, value: Optional[str]):
+        offset, length = self.__strings.replace(
+            self.__offsets[name][row], self.__lengths[name][row], value
+        )
+        self.__offsets[name][row] = offset
+        self.__lengths[name][row] = length
+        # Rewriting the heap once half of it is unused keeps the cost per write constant.
+        if self.__strings.unused > len(self.__strings) // 2:
+            self.__strings.compact(
+                [(self.__offsets[column], self.__lengths[column]) for column in self.STRING_COLUMNS]
+            )
+
+    # ---- field accessors used by BookView ----
+
+    def get_string(self, book_id: int, name: str) -> Optional[str]:
+        row = self.row_of(book_id)
+        return self.__strings.get(self.__offsets[name][row], self.__lengths[name][row])
+
+    def set_string(self, book_id: int, name: str, value: Optional[str]):
+        self.__set_string(self.row_of(book_id), name, value)
+
+    def get_description(self, book_id: int) -> Optional[str]:
+        row = self.row_of(book_id)
+        if self.__lengths["description"][row] < 0 and self.__description_offsets[row] >= 0:
+            return self.__description_source.read_description(self.__description_offsets[row])
+        return self.__strings.get(
+            self.__offsets["description"][row], self.__lengths["description"][row]
+        )
+
+    def set_description(self, book_id: int, description: Optional[str]):
+        self.__set_description(self.row_of(book_id), description)
+
+    def __set_description(self, row: int, description: Optional[str]):
+        self.__description_offsets[row] = -1
+        self.__set_string(row, "description", description)
+
+    def get_int(self, book_id: int, name: str) -> Optional[int]:
+        value = self.__int_column(name)[self.row_of(book_id)]
+        return None if value < 0 else value
+
+    def set_int(self, book_id: int, name: str, value: Optional[int]):
+        self.__int_column(name)[self.row_of(book_id)] = -1 if value is None else value
+
+    def __int_column(self, name: str) -> array:
+        return {
+            "release_year": self.__release_years,
+            "num_pages": self.__num_pages,
+        }[name]
+
+    def get_ebook(self, book_id: int) -> Optional[bool]:
+        value = self.__ebooks[self.row_of(book_id)]
+        return None if value < 0 else bool(value)
+
+    def set_ebook(self, book_id: int, value: bool):
+        self.__ebooks[self.row_of(book_id)] = int(value)
+
+    def get_rating(self, book_id: int):
+        row = self.row_of(book_id)
+        average_rating = self.__average_ratings[row]
+        ratings_count = self.__ratings_counts[row]
+        return (
+            None if isnan(average_rating) else average_rating,
+            None if ratings_count < 0 else ratings_count,
+        )
+
+    def set_rating(self, book_id: int, average_rating: Optional[float], ratings_count: Optional[int]):
+        old_average_rating, old_ratings_count = self.get_rating(book_id)
+        self.__set_rating(self.row_of(book_id), average_rating, ratings_count)
+        if self.__rating_observer is not None:
+            self.__rating_observer.rating_changed(
+                BookView(self, book_id), old_average_rating, old_ratings_count
+            )
+
+    def observe_rating(self, observer):
+        # As Book.observe_rating, for the ratings of every book in the store.
+        self.__rating_observer = observer
+
+    def __set_rating(self, row: int, average_rating: Optional[float], ratings_count: Optional[int]):
+        self.__average_ratings[row] = float("nan") if average_rating is None else average_rating
+        self.__ratings_counts[row] = -1 if ratings_count is None else ratings_count
+
+    def get_publisher(self, book_id: int) -> Optional[Publisher]:
+        string_id = self.__publishers[self.row_of(book_id)]
+        if string_id < 0:
+            return None
+        return Publisher(self.__strings.get_interned(string_id))
+
+    def set_publisher(self, book_id: int, publisher: Optional[Publisher]):
+        string_id = -1 if publisher is None else self.__strings.intern(publisher.name)
+        self.__publishers[self.row_of(book_id)] = string_id
+
+    def get_authors(self, book_id: int) -> List[Author]:
+        list_id = self.__author_lists[self.row_of(book_id)]
+        if list_id < 0:
+            return []
+        return [
+            Author(author_id, self.__strings.get_interned(self.__author_names[author_id]))
+            for author_id in self.__author_list_table[list_id]
+        ]
+
+    def set_authors(self, book_id: int, authors: List[Author]):
+        self.__set_authors(self.row_of(book_id), authors)
+
+    def __set_authors(self, row: int, authors: List[Author]):
+        author_ids = tuple(author.unique_id for author in authors)
+        for author in authors:
+            self.__author_names[author.unique_id] = self.__strings.intern(author.full_name)
+        list_id = self.__author_list_ids.get(author_ids)
+        if list_id is None:
+            list_id = len(self.__author_list_table)
+            self.__author_list_table.append(author_ids)
+            self.__author_list_ids[author_ids] = list_id
+        self.__author_lists[row] = list_id
+
+    def get_reviews(self, book_id: int) -> Sequence[Review]:
+        # Books without reviews share an empty tuple rather than each storing a list when read;
+        # add a review through add_review, which creates the book's list.
+        return self.__reviews.get(book_id, ())
+
+    def get_number_of_reviews(self, book_id: int) -> int:
+        return len(self.__reviews.get(book_id, ()))
+
+    def add_review(self, book_id: int, review: Review):
+        self.__reviews.setdefault(book_id, []).append(review)
+
+    # ---- column scans ----
+
+    def books_with_release_year(self, year: Optional[int]) -> List["BookView"]:
+        target = -1 if year is None else year
+        release_years = self.__release_years
+        book_ids = self.__book_ids
+        return [
+            BookView(self, book_ids[row])
+            for row in range(len(release_years))
+            if release_years[row] == target
+        ]
+
+    def books_with_publisher(self, publisher_name: str) -> List["BookView"]:
+        string_id = self.__strings.lookup(publisher_name)
+        if string_id < 0:
+            return []
+        publishers = self.__publishers
+        book_ids = self.__book_ids
+        return [
+            BookView(self, book_ids[row])
+            for row in range(len(publishers))
+            if publishers[row] == string_id
+        ]
+
+
+class BookView(Book):
+    # A Book backed by a row of a ColumnarBookStore. Reads and writes go straight to the
+    # store's columns, so a view holds nothing but the store and its book_id.
+
+    def __init__(self, store: ColumnarBookStore, book_id: int):
+        self.__store = store
+        self.__book_id = book_id
+
+    @property
+    def book_id(self) -> int:
+        return self.__book_id
+
+    @property
+    def title(self) -> str:
+        return self.__store.get_string(self.__book_id, "title")
+
+    @title.setter
+    def title(self, book_title: str):
+        if isinstance(book_title, str) and book_title.strip() != "":
+            self.__store.set_string(self.__book_id, "title", book_title.strip())
+        else:
+            raise ValueError
+
+    @property
+    def release_year(self) -> int:
+        return self.__store.get_int(self.__book_id, "release_year")
+
+    @release_year.setter
+    def release_year(self, release_year: int):
+        if isinstance(release_year, int) and release_year >= 0:
+            self.__store.set_int(self.__book_id, "release_year", release_year)
+        else:
+            raise ValueError
+
+    @property
+    def description(self) -> str:
+        return self.__store.get_description(self.__book_id)
+
+    @description.setter
+    def description(self, description: str):
+        if isinstance(description, str):
+            self.__store.set_description(self.__book_id, description.strip())
+
+    @property
+    def description_source(self):
+        return None
+
+    @property
+    def description_offset(self) -> int:
+        return None
+
+    @property
+    def publisher(self) -> Publisher:
+        return self.__store.get_publisher(self.__book_id)
+
+    @publisher.setter
+    def publisher(self, publisher: Publisher):
+        self.__store.set_publisher(
+            self.__book_id, publisher if isinstance(publisher, Publisher) else None
+        )
+
+    @property
+    def authors(self) -> List[Author]:
+        return self.__store.get_authors(self.__book_id)
+
+    def add_author(self, author: Author):
+        authors = self.authors
+        if isinstance(author, Author) and author not in authors:
+            self.__store.set_authors(self.__book_id, authors + [author])
+
+    def remove_author(self, author: Author):
+        authors = self.authors
+        if isinstance(author, Author) and author in authors:
+            authors.remove(author)
+            self.__store.set_authors(self.__book_id, authors)
+
+    @property
+    def ebook(self) -> bool:
+        return self.__store.get_ebook(self.__book_id)
+
+    @ebook.setter
+    def ebook(self, is_ebook: bool):
+        if isinstance(is_ebook, bool):
+            self.__store.set_ebook(self.__book_id, is_ebook)
+
+    @property
+    def num_pages(self) -> int:
+        return self.__store.get_int(self.__book_id, "num_pages")
+
+    @num_pages.setter
+    def num_pages(self, num_pages: int):
+        if isinstance(num_pages, int) and num_pages >= 0:
+            self.__store.set_int(self.__book_id, "num_pages", num_pages)
+
+    @property
+    def image_hyperlink(self) -> str:
+        return self.__store.get_string(self.__book_id, "image_hyperlink")
+
+    @image_hyperlink.setter
+    def image_hyperlink(self, hyperlink: str):
+        if isinstance(hyperlink, str):
+            self.__store.set_string(self.__book_id, "image_hyperlink", hyperlink.strip())
+
+    @property
+    def hyperlink(self) -> str:
+        return self.__store.get_string(self.__book_id, "hyperlink")
+
+    @hyperlink.setter
+    def hyperlink(self, hyperlink: str):
+        if isinstance(hyperlink, str):
+            self.__store.set_string(self.__book_id, "hyperlink", hyperlink.strip())
+
+    def update_average_rating(self, rating: int):
+        if isinstance(rating, int):
+            average_rating, ratings_count = self.__store.get_rating(self.__book_id)
+            if ratings_count is None:
+                average_rating, ratings_count = 0.0, 0
+            average_rating = (ratings_count * average_rating + rating) / (ratings_count + 1)
+            self.__store.set_rating(self.__book_id, average_rating, ratings_count + 1)
+        else:
+            raise ValueError("Requires integer value to update average rating")
+
+    def initiliase_rating_and_count(self, avgerage_rating: float, rate: int):
+        if isinstance(rate, int) and isinstance(avgerage_rating, float):
+            self.__store.set_rating(self.__book_id, avgerage_rating, rate)
+        else:
+            raise ValueError
+
+    def observe_rating(self, observer):
+        # The rating is kept by the store, which has a single observer for all of its books.
+        self.__store.observe_rating(observer)
+
+    @property
+    def average_rating(self):
+        return self.__store.get_rating(self.__book_id)[0]
+
+    @property
+    def ratings_count(self):
+        return self.__store.get_rating(self.__book_id)[1]
+
+    @property
+    def reviews(self):
+        return self.__store.get_reviews(self.__book_id)
+
+    @property
+    def number_of_reviews(self) -> int:
+        return self.__store.get_number_of_reviews(self.__book_id)
+
+    def add_review(self, review):
+        if isinstance(review, Review):
+            self.__store.add_review(self.__book_id, review)
+        else:
+            raise ValueError("Object to add review")
+
+    def __eq__(self, other):
+        # Views compare equal to plain Books with the same id, in either direction.
+        if not isinstance(other, Book):
+            return False
+        return self.book_id == other.book_id
+
+    def __hash__(self):
+        return hash(self.book_id)
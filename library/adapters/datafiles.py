@@ -0,0 +1,86 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+from pathlib import Path
+from typing import Dict, Iterable
+
+# Compressed data files are recognised by extension and decompressed while they are read.
+COMPRESSED_OPENERS = {
+    ".gz": gzip.open,
+    ".bz2": bz2.open,
+    ".xz": lzma.open,
+}
+
+
+def is_compressed(file_name) -> bool:
+    return Path(file_name).suffix.lower() in COMPRESSED_OPENERS
+
+
+class LimitedReader(io.RawIOBase):
+    # Raw binary reader that stops after the first `size` bytes of the underlying file, so that
+    # data appended after the size was taken is left for the delta ingester.
+
+    def __init__(self, raw, size: int):
+        self.__raw = raw
+        self.__remaining = size
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self.__remaining)
+        if size <= 0:
+            return 0
+        read = self.__raw.readinto(memoryview(buffer)[:size])
+        self.__remaining -= read
+        return read
+
+    def close(self):
+        self.__raw.close()
+        super().close()
+
+
+def open_data_file(
+    file_name, mode: str = "r", encoding: str = None, newline: str = None, size: int = None
+):
+    # With a size, only that many bytes of an uncompressed file are read. The size of a
+    # compressed file does not bound its decompressed content, so those are read to the end.
+    opener = COMPRESSED_OPENERS.get(Path(file_name).suffix.lower())
+    if opener is None:
+        if size is None:
+            return open(file_name, mode, encoding=encoding, newline=newline)
+        limited_file = io.BufferedReader(LimitedReader(open(file_name, "rb", buffering=0), size))
+        if "b" in mode:
+            return limited_file
+        return io.TextIOWrapper(limited_file, encoding=encoding, newline=newline)
+    if "b" in mode:
+        return opener(file_name, mode)
+    # The codec modules default to binary, so text mode has to be asked for explicitly.
+    return opener(file_name, mode.replace("t", "") + "t", encoding=encoding, newline=newline)
+
+
+def find_data_file(data_path, file_name: str) -> Path:
+    # Returns data_path / file_name, or its compressed variant when only that one exists.
+    path = Path(data_path) / file_name
+    if path.exists():
+        return path
+    for extension in COMPRESSED_OPENERS:
+        compressed_path = path.with_name(path.name + extension)
+        if compressed_path.exists():
+            return compressed_path
+    return path
+
+
+def file_size(path) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def data_file_sizes(data_path, file_names: Iterable[str]) -> Dict[str, int]:
+    # Current size of each data file, keyed by its uncompressed name. Loading the files up to
+    # these sizes and following them from the same offsets neither misses nor repeats a line.
+    return {name: file_size(find_data_file(data_path, name)) for name in file_names}
@@ -0,0 +1,258 @@
+import csv
+import json
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from library.adapters.datafiles import data_file_sizes, file_size, find_data_file, is_compressed
+from library.adapters.jsondatareader import BooksJSONReader
+from library.adapters.repository import RepositoryException
+from library.adapters.memory_repository import (
+    MemoryRepository,
+    make_user,
+    normalize_user_name,
+    read_csv_file,
+)
+from library.authentication.passwords import LAZY_HASHING
+from library.domain.model import make_review
+
+AUTHORS_FILE_NAME = "book_authors_excerpt.json"
+BOOKS_FILE_NAME = "comic_books_excerpt.json"
+USERS_FILE_NAME = "users.csv"
+REVIEWS_FILE_NAME = "reviews.csv"
+
+# Appended lines are applied in this order, so new books can name new authors and new reviews
+# can refer to new books and users.
+DATA_FILE_NAMES = [AUTHORS_FILE_NAME, BOOKS_FILE_NAME, USERS_FILE_NAME, REVIEWS_FILE_NAME]
+
+
+def read_appended_lines(file_name: Path, offset: int) -> Tuple[List[Tuple[int, bytes]], int]:
+    # Returns the complete lines written after offset, each with its own offset, and the offset
+    # to continue from. A trailing line without a newline may still be being written, so it is
+    # left for the next call.
+    with open(file_name, "rb") as infile:
+        infile.seek(offset)
+        appended = infile.read()
+    end = appended.rfind(b"\n") + 1
+    lines = []
+    for line in appended[:end].splitlines(keepends=True):
+        if line.strip():
+            lines.append((offset, line))
+        offset += len(line)
+    return lines, offset
+
+
+class DeltaIngester:
+    # Applies lines appended to the data files since the repository was populated, without
+    # reloading anything that was already read. Records must be appended as whole lines ending
+    # in a newline. Compressed data files cannot be followed and are ignored. A line that cannot
+    # be parsed, or a review by an unknown user, is logged and skipped; the rest of the batch
+    # is still applied.
+
+    def __init__(
+        self,
+        data_path: Path,
+        repo: MemoryRepository,
+        lazy_descriptions: bool = False,
+        password_hashing: str = LAZY_HASHING,
+        offsets: Optional[Dict[str, int]] = None,
+    ):
+        self.__data_path = Path(data_path)
+        self.__repo = repo
+        self.__lazy_descriptions = lazy_descriptions
+        self.__password_hashing = password_hashing
+        self.__lock = threading.Lock()
+
+        # Pass the sizes the repository was populated from (see datafiles.data_file_sizes);
+        # without them, everything present now is assumed to be in the repository already.
+        self.__files = {name: find_data_file(self.__data_path, name) for name in DATA_FILE_NAMES}
+        if offsets is None:
+            offsets = data_file_sizes(self.__data_path, DATA_FILE_NAMES)
+        self.__offsets = {name: offsets[name] for name in DATA_FILE_NAMES}
+
+        # Built on the first delta, so that startup does not pay for them.
+        self.__authors_index = None
+        self.__users = None
+        self.__reader = None
+
+    @property
+    def offsets(self) -> Dict[str, int]:
+        return dict(self.__offsets)
+
+    def pending(self) -> bool:
+        return any(
+            not is_compressed(path) and file_size(path) > self.__offsets[name]
+            for name, path in self.__files.items()
+        )
+
+    def __prepare(self):
+        if self.__reader is not None:
+            return
+        self.__reader = BooksJSONReader(
+            str(self.__files[BOOKS_FILE_NAME]),
+            str(self.__files[AUTHORS_FILE_NAME]),
+            self.__lazy_descriptions,
+            dict(self.__offsets),
+        )
+        # Only what is already loaded is read here; the appended lines are applied below.
+        self.__authors_index = self.__reader.read_authors_index()
+
+        # Reviews refer to users by the id column of users.csv.
+        data_rows = list(
+            read_csv_file(str(self.__files[USERS_FILE_NAME]), self.__offsets[USERS_FILE_NAME])
+        )
+        users = {
+            normalize_user_name(user.user_name): user
+            for user in self.__repo.get_users(data_row[1] for data_row in data_rows)
+        }
+        self.__users = dict()
+        for data_row in data_rows:
+            user = users.get(normalize_user_name(data_row[1]))
+            if user is not None:
+                self.__users[data_row[0]] = user
+
+    def __appended_lines(self, name: str) -> Tuple[List[Tuple[int, bytes]], int]:
+        # Returns the appended lines and the offset after them. apply() only saves the offset
+        # once the lines have been applied, so a batch that fails part way is read again.
+        path = self.__files[name]
+        if is_compressed(path) or file_size(path) <= self.__offsets[name]:
+            return [], self.__offsets[name]
+        return read_appended_lines(path, self.__offsets[name])
+
+    def __skip(self, name: str, offset: int, error: Exception):
+        logging.getLogger(__name__).warning(
+            "Skipping line at byte %d of %s: %r", offset, self.__files[name], error
+        )
+
+    def __appended_rows(self, name: str) -> Tuple[List[Tuple[int, List[str]]], int]:
+        # Each line is parsed on its own, so an unbalanced quote cannot swallow the next lines.
+        lines, end = self.__appended_lines(name)
+        rows = []
+        for offset, line in lines:
+            if offset == 0:
+                # The header row of a file that was empty when the repository was populated.
+                continue
+            try:
+                row = next(csv.reader([line.decode("utf-8-sig")]))
+            except (UnicodeDecodeError, csv.Error) as error:
+                self.__skip(name, offset, error)
+                continue
+            rows.append((offset, [item.strip() for item in row]))
+        return rows, end
+
+    def apply(self) -> Dict[str, int]:
+        # Applies every complete line appended since the last call and returns how many
+        # records of each kind were added.
+        with self.__lock:
+            try:
+                return self.__apply()
+            finally:
+                # A repository kept between starts resumes from the files applied so far.
+                self.__repo.set_data_file_offsets(self.offsets)
+
+    def __apply(self) -> Dict[str, int]:
+        self.__prepare()
+        counts = {"authors": 0, "books": 0, "users": 0, "reviews": 0}
+
+        lines, end = self.__appended_lines(AUTHORS_FILE_NAME)
+        for offset, line in lines:
+            try:
+                author_json = json.loads(line)
+                self.__authors_index[int(author_json["author_id"])] = author_json["name"]
+            except (ValueError, KeyError, TypeError) as error:
+                self.__skip(AUTHORS_FILE_NAME, offset, error)
+                continue
+            counts["authors"] += 1
+        self.__offsets[AUTHORS_FILE_NAME] = end
+
+        new_books = []
+        lazy = self.__reader.description_file is not None
+        books = []
+        lines, end = self.__appended_lines(BOOKS_FILE_NAME)
+        for offset, line in lines:
+            try:
+                books.append(self.__reader.make_book(
+                    json.loads(line), self.__authors_index, offset if lazy else None
+                ))
+            except (ValueError, KeyError, TypeError, AttributeError) as error:
+                self.__skip(BOOKS_FILE_NAME, offset, error)
+        # A re-appended book_id would duplicate a catalogue entry, so only the first wins.
+        stored = set(
+            book.book_id for book in self.__repo.get_books(book.book_id for book in books)
+        )
+        for book in books:
+            if book.book_id not in stored:
+                self.__repo.add_book(book)
+                new_books.append(book)
+                stored.add(book.book_id)
+        if new_books:
+            self.__repo.add_publishers(set(book.publisher for book in new_books))
+            self.__repo.add_authors(
+                author for book in new_books for author in book.authors
+            )
+        counts["books"] = len(new_books)
+        self.__offsets[BOOKS_FILE_NAME] = end
+
+        data_rows, end = self.__appended_rows(USERS_FILE_NAME)
+        for offset, data_row in data_rows:
+            try:
+                user = make_user(data_row, self.__password_hashing)
+            except (IndexError, ValueError) as error:
+                self.__skip(USERS_FILE_NAME, offset, error)
+                continue
+            try:
+                self.__repo.add_user(user)
+            except RepositoryException:
+                # A repeated user name refers to the user already loaded.
+                user = self.__repo.get_user(user.user_name)
+            self.__users[data_row[0]] = user
+            counts["users"] += 1
+        self.__offsets[USERS_FILE_NAME] = end
+
+        # Look up the books of the whole batch at once, then build each review on its own.
+        data_rows, end = self.__appended_rows(REVIEWS_FILE_NAME)
+        book_ids = set()
+        for _, data_row in data_rows:
+            try:
+                book_ids.add(int(data_row[2]))
+            except (IndexError, ValueError):
+                pass
+        books = {book.book_id: book for book in self.__repo.get_books(book_ids)}
+        for offset, data_row in data_rows:
+            try:
+                user = self.__users[data_row[1]]
+                book = books[int(data_row[2])]
+                timestamp = datetime.fromisoformat(data_row[4])
+                review_text = data_row[3]
+            except (IndexError, KeyError, ValueError) as error:
+                self.__skip(REVIEWS_FILE_NAME, offset, error)
+                continue
+            self.__repo.add_review(make_review(review_text, user, book, timestamp))
+            counts["reviews"] += 1
+        self.__offsets[REVIEWS_FILE_NAME] = end
+
+        return counts
+
+
+class DeltaPoller(threading.Thread):
+    # Background thread that applies appended data every `interval` seconds.
+
+    def __init__(self, ingester: DeltaIngester, interval: float):
+        super().__init__(name="delta-poller", daemon=True)
+        self.__ingester = ingester
+        self.__interval = interval
+        self.__stopped = threading.Event()
+
+    def run(self):
+        while not self.__stopped.wait(self.__interval):
+            try:
+                if self.__ingester.pending():
+                    self.__ingester.apply()
+            except Exception:
+                # Keep polling; a malformed record should not stop later deltas from loading.
+                logging.getLogger(__name__).exception("Could not apply appended data")
+
+    def stop(self):
+        self.__stopped.set()
@@ -0,0 +1,420 @@
+import heapq
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, bisect_right, insort_left
+from collections import Counter, OrderedDict, defaultdict
+from math import inf
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+
+class BookIdIndex:
+    # Maps a key (an author id, a publisher name, ...) to the ids of its books in book_id order.
+    # Repositories keep ids rather than Book objects so the index works with any book store.
+
+    def __init__(self):
+        self.__book_ids: Dict[Hashable, List[int]] = dict()
+
+    def __contains__(self, key) -> bool:
+        return key in self.__book_ids
+
+    def __len__(self) -> int:
+        return len(self.__book_ids)
+
+    def keys(self):
+        return self.__book_ids.keys()
+
+    def get(self, key) -> List[int]:
+        return self.__book_ids.get(key, [])
+
+    def count(self, key) -> int:
+        return len(self.__book_ids.get(key, ()))
+
+    def add(self, key, book_id: int):
+        book_ids = self.__book_ids.setdefault(key, [])
+        position = bisect_left(book_ids, book_id)
+        if position == len(book_ids) or book_ids[position] != book_id:
+            book_ids.insert(position, book_id)
+
+    def extend(self, pairs: Iterable[Tuple[Hashable, int]]):
+        # Bulk version of add: ids are appended and each list touched is sorted once.
+        changed = set()
+        for key, book_id in pairs:
+            self.__book_ids.setdefault(key, []).append(book_id)
+            changed.add(key)
+        for key in changed:
+            self.__book_ids[key] = sorted(set(self.__book_ids[key]))
+
+    def clear(self):
+        self.__book_ids.clear()
+
+
+def contains_book_id(book_ids: List[int], book_id: int) -> bool:
+    # Membership test for the sorted id lists held by the indexes.
+    position = bisect_left(book_ids, book_id)
+    return position < len(book_ids) and book_ids[position] == book_id
+
+
+class SortedValueIndex:
+    # Books ordered by a numeric field such as num_pages, for range queries. Books without a
+    # value are left out.
+
+    def __init__(self):
+        self.__entries: List[Tuple[float, int]] = list()
+
+    def add(self, value, book_id: int):
+        if value is not None:
+            insort_left(self.__entries, (value, book_id))
+
+    def extend(self, pairs: Iterable[Tuple[float, int]]):
+        self.__entries.extend((value, book_id) for value, book_id in pairs if value is not None)
+        self.__entries.sort()
+
+    def remove(self, value, book_id: int):
+        if value is not None:
+            position = bisect_left(self.__entries, (value, book_id))
+            if position < len(self.__entries) and self.__entries[position] == (value, book_id):
+                del self.__entries[position]
+
+    def __bounds(self, low, high) -> Tuple[int, int]:
+        start = 0 if low is None else bisect_left(self.__entries, (low, -inf))
+        stop = len(self.__entries) if high is None else bisect_right(self.__entries, (high, inf))
+        return start, stop
+
+    def count_between(self, low=None, high=None) -> int:
+        start, stop = self.__bounds(low, high)
+        return max(0, stop - start)
+
+    def book_ids_between(self, low=None, high=None) -> List[int]:
+        # Ids of books whose value is in [low, high], in book_id order.
+        start, stop = self.__bounds(low, high)
+        return sorted(set(book_id for _, book_id in self.__entries[start:stop]))
+
+
+class BookOrder:
+    # Every book in the order of a field, such as the title or the average rating, then of
+    # book_id: a permutation of the catalogue kept sorted as books are added, so a page in that
+    # order is a slice found with bisect rather than a sort of every book. Entries are
+    # (key, book_id) pairs, where the key of a missing value sorts below every other key.
+
+    def __init__(self):
+        self.__entries: List[Tuple[tuple, int]] = list()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    @staticmethod
+    def entry(value, book_id: int) -> Tuple[tuple, int]:
+        return ((0,) if value is None else (1, value)), book_id
+
+    @property
+    def entries(self) -> List[Tuple[tuple, int]]:
+        return self.__entries
+
+    def add(self, value, book_id: int):
+        insort_left(self.__entries, self.entry(value, book_id))
+
+    def extend(self, pairs: Iterable[Tuple[object, int]]):
+        self.__entries.extend(self.entry(value, book_id) for value, book_id in pairs)
+        self.__entries.sort()
+
+    def remove(self, value, book_id: int):
+        entry = self.entry(value, book_id)
+        position = bisect_left(self.__entries, entry)
+        if position < len(self.__entries) and self.__entries[position] == entry:
+            del self.__entries[position]
+
+
+class Leaderboard:
+    # The best books of a set, such as all books or one publisher's, by a score such as the
+    # average rating. Entries are (key, book_id) pairs, lowest key first, and only the first size
+    # to 2 * size of them are kept, so the top k books are a slice. While the board is not
+    # complete (it has left books out), every book left out ranks below its last entry; a book
+    # whose score changes is moved, dropped off the end or let in on that basis. Once demoted
+    # books have taken it below size entries it must be rebuilt from the whole set.
+
+    SIZE = 20
+
+    def __init__(self, entries: Iterable[Tuple[tuple, int]], size: int = SIZE):
+        self.__size = size
+        self.__entries = heapq.nsmallest(2 * size + 1, entries)
+        self.__complete = len(self.__entries) <= 2 * size
+        if not self.__complete:
+            self.__entries.pop()
+        self.__keys: Dict[int, tuple] = {book_id: key for key, book_id in self.__entries}
+
+    @property
+    def size(self) -> int:
+        return self.__size
+
+    @property
+    def needs_rebuild(self) -> bool:
+        return not self.__complete and len(self.__entries) < self.__size
+
+    def top(self, limit: int) -> List[int]:
+        return [book_id for _, book_id in self.__entries[:limit]]
+
+    def update(self, book_id: int, key: Optional[tuple]):
+        # Moves a book to its new key, or takes it off the board if key is None.
+        old_key = self.__keys.pop(book_id, None)
+        if old_key is not None:
+            del self.__entries[bisect_left(self.__entries, (old_key, book_id))]
+        if key is None:
+            return
+        if self.__complete or (self.__entries and (key, book_id) < self.__entries[-1]):
+            insort_left(self.__entries, (key, book_id))
+            self.__keys[book_id] = key
+            if len(self.__entries) > 2 * self.__size:
+                _, dropped = self.__entries.pop()
+                del self.__keys[dropped]
+                self.__complete = False
+
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def normalize_name(name: Optional[str]) -> str:
+    # Lower-cased words of a name without accents or punctuation, e.g. "Émile Zola" and
+    # "emile  zola." both become "emile zola".
+    if not name:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(WORD_PATTERN.findall(stripped.casefold()))
+
+
+class PrefixIndex:
+    # Completes names (titles, author names, ...) from the start of any of their words, most
+    # popular first. Each word of a name is stored with the rest of the name after it, in one
+    # sorted list, so the names matching a prefix form a single run found with bisect. Each key
+    # carries a weight, such as a ratings count, used to rank its matches; weights only grow.
+    #
+    # Short prefixes match long runs, so the best TOP_KEYS keys of every prefix of up to
+    # TOP_KEYS_PREFIX_LENGTH characters are kept up to date as names are added. Longer prefixes
+    # scan their run, and their answers are cached until the index changes; the cache is shared
+    # between threads and guarded by a lock.
+
+    TOP_KEYS = 50
+    TOP_KEYS_PREFIX_LENGTH = 3
+    CACHE_SIZE = 256
+
+    def __init__(self):
+        self.__entries: List[Tuple[str, Hashable]] = list()
+        self.__names: Dict[Hashable, str] = dict()
+        self.__weights: Dict[Hashable, int] = dict()
+        self.__top_keys: Dict[str, List[Hashable]] = dict()
+        self.__cache = OrderedDict()
+        self.__cache_lock = threading.Lock()
+        self.__version = 0
+
+    def __getstate__(self):
+        # Locks cannot be pickled (e.g. into a snapshot); a fresh one is made on unpickling.
+        state = self.__dict__.copy()
+        del state["_PrefixIndex__cache_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__cache_lock = threading.Lock()
+
+    def __contains__(self, key) -> bool:
+        return key in self.__names
+
+    def __len__(self) -> int:
+        return len(self.__names)
+
+    @staticmethod
+    def __entries_for(key, name: str) -> List[Tuple[str, Hashable]]:
+        words = normalize_name(name).split()
+        return [(" ".join(words[position:]), key) for position in range(len(words))]
+
+    def __rank(self, key):
+        return -self.__weights[key], self.__names[key]
+
+    def add(self, key, name: str, weight: int = 0):
+        # A key already present keeps its name; its weight is increased by weight.
+        self.extend([(key, name, weight)])
+
+    def extend(self, items: Iterable[Tuple[Hashable, str, int]]):
+        # Adds (key, name, weight) items: entries are appended and sorted once, and the top keys
+        # are rebuilt in one pass when many keys change, or else updated key by key.
+        num_entries = len(self.__entries)
+        changed = dict()
+        for key, name, weight in items:
+            if key not in self.__names:
+                self.__names[key] = name
+                self.__weights[key] = 0
+                self.__entries.extend(self.__entries_for(key, name))
+            self.__weights[key] += weight
+            changed[key] = None
+        if not changed:
+            return
+        if len(self.__entries) > num_entries:
+            self.__entries.sort()
+        if len(changed) > len(self.__names) // 10:
+            self.__rebuild_top_keys()
+        else:
+            for key in changed:
+                self.__update_top_keys(key)
+        with self.__cache_lock:
+            self.__version += 1
+            self.__cache.clear()
+
+    def __rebuild_top_keys(self):
+        # Top keys of the longest prefixes come from their runs; those of each shorter prefix
+        # are the best of its longer prefixes' top keys.
+        level = defaultdict(list)
+        for suffix, key in self.__entries:
+            level[suffix[:self.TOP_KEYS_PREFIX_LENGTH]].append(key)
+        self.__top_keys = dict()
+        for length in range(self.TOP_KEYS_PREFIX_LENGTH, 0, -1):
+            grouped = defaultdict(list)
+            for prefix, keys in level.items():
+                grouped[prefix[:length]].extend(keys)
+            level = {
+                prefix: heapq.nsmallest(self.TOP_KEYS, dict.fromkeys(keys), key=self.__rank)
+                for prefix, keys in grouped.items()
+            }
+            self.__top_keys.update(level)
+
+    def __update_top_keys(self, key):
+        # Weights only grow, so a key can only move up in or enter the lists of its prefixes.
+        prefixes = {
+            suffix[:length]
+            for suffix, _ in self.__entries_for(key, self.__names[key])
+            for length in range(1, self.TOP_KEYS_PREFIX_LENGTH + 1)
+        }
+        for prefix in prefixes:
+            keys = [other for other in self.__top_keys.get(prefix, ()) if other != key]
+            keys.append(key)
+            keys.sort(key=self.__rank)
+            self.__top_keys[prefix] = keys[:self.TOP_KEYS]
+
+    def complete(self, prefix: str, limit: Optional[int] = 10) -> List[Hashable]:
+        # Keys of the names with a word starting with prefix, by descending weight and then by
+        # name. A limit of None returns every match.
+        prefix = normalize_name(prefix)
+        if not prefix:
+            return []
+        if (
+            len(prefix) <= self.TOP_KEYS_PREFIX_LENGTH
+            and limit is not None
+            and limit <= self.TOP_KEYS
+        ):
+            return self.__top_keys.get(prefix, [])[:limit]
+
+        cache_key = (prefix, limit)
+        with self.__cache_lock:
+            version = self.__version
+            keys = self.__cache.get(cache_key)
+            if keys is not None:
+                self.__cache.move_to_end(cache_key)
+                return keys
+
+        start = bisect_left(self.__entries, (prefix,))
+        stop = bisect_left(self.__entries, (prefix + "\U0010ffff",))
+        matches = dict.fromkeys(key for _, key in self.__entries[start:stop])
+        if limit is None:
+            keys = sorted(matches, key=self.__rank)
+        else:
+            keys = heapq.nsmallest(limit, matches, key=self.__rank)
+        # Answers found while names were added are not cached.
+        with self.__cache_lock:
+            if version == self.__version:
+                self.__cache[cache_key] = keys
+                self.__cache.move_to_end(cache_key)
+                while len(self.__cache) > self.CACHE_SIZE:
+                    self.__cache.popitem(last=False)
+        return keys
+
+
+def name_trigrams(normalized_name: str) -> frozenset:
+    # Three-letter pieces of each word, padded so that word starts and ends count as well.
+    trigrams = set()
+    for word in normalized_name.split():
+        padded = "  " + word + " "
+        trigrams.update(padded[position:position + 3] for position in range(len(word) + 1))
+    return frozenset(trigrams)
+
+
+def canonical_name(name: Optional[str]) -> str:
+    # A normalized name with its words sorted, so "Ennis, Garth" matches "Garth Ennis".
+    return " ".join(sorted(normalize_name(name).split()))
+
+
+class FuzzyNameIndex:
+    # Resolves names that differ from the stored ones in case, accents, punctuation, word order
+    # or spelling. Names with the same canonical form match exactly; otherwise names are ranked
+    # by the Jaccard similarity of their trigram sets.
+    #
+    # A query only reads the key sets of its own trigrams, so its cost depends on how common
+    # those trigrams are rather than on the number of names. The rarest sets are counted in
+    # bulk. A name with similarity t shares at least t * len(trigrams) trigrams with the query,
+    # so a name missing from too many rare sets cannot match; only the names left are looked
+    # up in the few most common sets.
+
+    THRESHOLD = 0.4
+
+    def __init__(self):
+        self.__names: Dict[Hashable, str] = dict()
+        self.__keys_by_canonical_name: Dict[str, List[Hashable]] = dict()
+        self.__num_trigrams: Dict[Hashable, int] = dict()
+        self.__keys_by_trigram: Dict[str, set] = dict()
+
+    def __contains__(self, key) -> bool:
+        return key in self.__names
+
+    def __len__(self) -> int:
+        return len(self.__names)
+
+    def add(self, key, name: str):
+        # A key already present keeps its name.
+        if key in self.__names:
+            return
+        canonical = canonical_name(name)
+        trigrams = name_trigrams(canonical)
+        self.__names[key] = name
+        self.__keys_by_canonical_name.setdefault(canonical, []).append(key)
+        self.__num_trigrams[key] = len(trigrams)
+        for trigram in trigrams:
+            self.__keys_by_trigram.setdefault(trigram, set()).add(key)
+
+    def extend(self, items: Iterable[Tuple[Hashable, str]]):
+        for key, name in items:
+            self.add(key, name)
+
+    def exact(self, name: str) -> List[Hashable]:
+        # Keys whose names equal name apart from case, accents, punctuation and word order.
+        return list(self.__keys_by_canonical_name.get(canonical_name(name), ()))
+
+    def similar(
+        self, name: str, limit: Optional[int] = 10, threshold: float = THRESHOLD
+    ) -> List[Tuple[Hashable, float]]:
+        # (key, similarity) pairs for the names at least threshold similar to name, most similar
+        # first and then by name. Exact matches score 1.0.
+        trigrams = name_trigrams(canonical_name(name))
+        if not trigrams:
+            return []
+        key_sets = sorted(
+            (self.__keys_by_trigram.get(trigram, set()) for trigram in trigrams), key=len
+        )
+        min_shared = threshold * len(trigrams)
+        # Fewer common sets are skipped than a match must share, so every match is counted.
+        num_skipped = max(0, (int(min_shared) - 1) // 2)
+        common_sets = key_sets[len(key_sets) - num_skipped:]
+        counts = Counter()
+        for keys in key_sets[:len(key_sets) - num_skipped]:
+            counts.update(keys)
+
+        matches = []
+        for key, count in counts.items():
+            if count < min_shared - num_skipped:
+                continue
+            shared = count + sum(key in keys for keys in common_sets)
+            similarity = shared / (len(trigrams) + self.__num_trigrams[key] - shared)
+            if similarity >= threshold:
+                matches.append((key, similarity))
+        rank = lambda match: (-match[1], self.__names[match[0]])
+        if limit is None:
+            return sorted(matches, key=rank)
+        return heapq.nsmallest(limit, matches, key=rank)
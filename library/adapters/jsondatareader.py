@@ -1,77 +1,258 @@
 import json
-from typing import List
+import mmap
+import os
+import threading
+from functools import lru_cache
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 
+from library.adapters.datafiles import is_compressed, open_data_file
 from library.domain.model import Publisher, Author, Book
 
+# Author index shared by the books-file parser processes, set once per worker by _init_worker.
+_worker_authors_index = None
+
+
+def _init_worker(authors_index: Dict[int, str]):
+    global _worker_authors_index
+    _worker_authors_index = authors_index
+
+
+def _read_books_chunk(chunk_range: Tuple[str, int, int, bool]):
+    books_file_name, start, end, lazy_descriptions = chunk_range
+    reader = BooksJSONReader(books_file_name, None)
+    with open(books_file_name, 'rb') as books_jsonfile:
+        books_jsonfile.seek(start)
+        chunk = books_jsonfile.read(end - start)
+
+    books = []
+    offset = start
+    for line in chunk.splitlines(keepends=True):
+        if line.strip():
+            # Lazy books only carry their line offset back; the parent attaches its DescriptionFile.
+            books.append(reader.make_book(
+                json.loads(line), _worker_authors_index, offset if lazy_descriptions else None
+            ))
+        offset += len(line)
+    return books, reader.unresolved_author_ids
+
+
+def split_on_lines(file_name: str, num_chunks: int, size: int = None) -> List[Tuple[int, int]]:
+    # Split the first `size` bytes of the file (all of it by default) into roughly equal byte
+    # ranges, moving each boundary forward to the start of the next line so that no JSON entry
+    # straddles two ranges.
+    if size is None:
+        size = os.path.getsize(file_name)
+    boundaries = [0]
+    with open(file_name, 'rb') as infile:
+        for i in range(1, num_chunks):
+            infile.seek(max(size * i // num_chunks, boundaries[-1]))
+            infile.readline()
+            boundaries.append(min(infile.tell(), size))
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if start < end]
+
+
+class DescriptionFile:
+    # Reads book descriptions on demand from the books file, given the byte offset of the
+    # book's line. The file is memory-mapped on first use and the most recently read
+    # descriptions are kept in a small LRU cache.
+
+    def __init__(self, books_file_name: str, cache_size: int = 256):
+        self.__books_file_name = books_file_name
+        self.__cache_size = cache_size
+        self.__open()
+
+    def __open(self):
+        self.__map = None
+        self.__lock = threading.Lock()
+        self.read_description = lru_cache(maxsize=self.__cache_size)(self.__read_description)
+
+    @property
+    def books_file_name(self) -> str:
+        return self.__books_file_name
+
+    def __mapping(self, offset: int) -> mmap.mmap:
+        with self.__lock:
+            # Remap when the offset lies past the mapped length, i.e. the file has grown.
+            if self.__map is None or offset >= len(self.__map):
+                with open(self.__books_file_name, 'rb') as books_jsonfile:
+                    self.__map = mmap.mmap(books_jsonfile.fileno(), 0, access=mmap.ACCESS_READ)
+            return self.__map
+
+    def __read_description(self, offset: int) -> Optional[str]:
+        mapping = self.__mapping(offset)
+        end = mapping.find(b'\n', offset)
+        if end < 0:
+            end = len(mapping)
+        description = json.loads(mapping[offset:end])['description']
+        return description.strip() if isinstance(description, str) else None
+
+    def __getstate__(self):
+        # The mapping, lock and cache belong to this process; they are recreated after unpickling.
+        return {'books_file_name': self.__books_file_name, 'cache_size': self.__cache_size}
+
+    def __setstate__(self, state):
+        self.__books_file_name = state['books_file_name']
+        self.__cache_size = state['cache_size']
+        self.__open()
+
+
 class BooksJSONReader:
 
-    def __init__(self, books_file_name: str, authors_file_name: str):
+    def __init__(
+        self,
+        books_file_name: str,
+        authors_file_name: str,
+        lazy_descriptions: bool = False,
+        sizes: Dict[str, int] = None,
+    ):
         self.__books_file_name = books_file_name
         self.__authors_file_name = authors_file_name
+        # Only the first sizes[name] bytes of a file named in sizes are read.
+        self.__sizes = dict() if sizes is None else sizes
         self.__dataset_of_books = []
+        self.__unresolved_author_ids = set()
+        # With lazy_descriptions, books keep the offset of their line instead of the description.
+        # Offsets into a compressed file cannot be read back directly, so those stay eager.
+        if lazy_descriptions and not is_compressed(books_file_name):
+            self.__description_file = DescriptionFile(books_file_name)
+        else:
+            self.__description_file = None
 
     @property
     def dataset_of_books(self) -> List[Book]:
         return self.__dataset_of_books
 
-    def read_books_file(self) -> list:
-        books_json = []
-        with open(self.__books_file_name, encoding='UTF-8') as books_jsonfile:
+    @property
+    def unresolved_author_ids(self) -> Set[int]:
+        # Author ids referenced by a book but missing from the authors file.
+        return self.__unresolved_author_ids
+
+    @property
+    def description_file(self) -> Optional[DescriptionFile]:
+        return self.__description_file
+
+    def __size_of(self, file_name: str) -> Optional[int]:
+        # Sizes are keyed by the uncompressed name; compressed files are always read to the end.
+        return self.__sizes.get(Path(file_name).name)
+
+    def iter_books_file_with_offsets(self) -> Iterator[Tuple[int, dict]]:
+        # Yields each parsed entry with the byte offset of its line in the books file.
+        offset = 0
+        with open_data_file(
+            self.__books_file_name, 'rb', size=self.__size_of(self.__books_file_name)
+        ) as books_jsonfile:
             for line in books_jsonfile:
-                book_entry = json.loads(line)
-                books_json.append(book_entry)
-        return books_json
+                if line.strip():
+                    yield offset, json.loads(line)
+                offset += len(line)
 
-    def read_authors_file(self) -> list:
-        authors_json = []
-        with open(self.__authors_file_name, encoding='UTF-8') as authors_jsonfile:
+    def iter_books_file(self) -> Iterator[dict]:
+        for _, book_json in self.iter_books_file_with_offsets():
+            yield book_json
+
+    def iter_authors_file(self) -> Iterator[dict]:
+        with open_data_file(
+            self.__authors_file_name,
+            encoding='UTF-8',
+            size=self.__size_of(self.__authors_file_name),
+        ) as authors_jsonfile:
             for line in authors_jsonfile:
-                author_entry = json.loads(line)
-                authors_json.append(author_entry)
-        return authors_json
-
-
-    def read_json_files(self):
-        authors_json = self.read_authors_file()
-        books_json = self.read_books_file()
-
-        for book_json in books_json:
-            book_instance = Book(int(book_json['book_id']), book_json['title'])
-            book_instance.publisher = Publisher(book_json['publisher'])
-            if book_json['publication_year'] != "":
-                book_instance.release_year = int(book_json['publication_year'])
-            if book_json['is_ebook'].lower() == 'false':
-                book_instance.ebook = False
-            else:
-                if book_json['is_ebook'].lower() == 'true':
-                    book_instance.ebook = True
+                if line.strip():
+                    yield json.loads(line)
+
+    def read_books_file(self) -> list:
+        return list(self.iter_books_file())
+
+    def read_authors_file(self) -> list:
+        return list(self.iter_authors_file())
+
+    def read_authors_index(self) -> Dict[int, str]:
+        # Map each author_id to its name once, so resolving a book's authors is a dict lookup
+        # rather than a scan of the whole authors file.
+        authors_index = dict()
+        for author_json in self.iter_authors_file():
+            authors_index[int(author_json['author_id'])] = author_json['name']
+        return authors_index
+
+    def make_book(
+        self, book_json: dict, authors_index: Dict[int, str], description_offset: int = None
+    ) -> Book:
+        book_instance = Book(int(book_json['book_id']), book_json['title'])
+        book_instance.publisher = Publisher(book_json['publisher'])
+        if book_json['publication_year'] != "":
+            book_instance.release_year = int(book_json['publication_year'])
+        if book_json['is_ebook'].lower() == 'false':
+            book_instance.ebook = False
+        else:
+            if book_json['is_ebook'].lower() == 'true':
+                book_instance.ebook = True
+        if description_offset is None:
             book_instance.description = book_json['description']
-            if book_json['num_pages'] != "":
-                book_instance.num_pages = int(book_json['num_pages'])
+        else:
+            book_instance.load_description_from(self.__description_file, description_offset)
+        if book_json['num_pages'] != "":
+            book_instance.num_pages = int(book_json['num_pages'])
+
+        if book_json['url'] != "":
+            book_instance.hyperlink = book_json['url']
+
+        if book_json['image_url'] != "":
+            book_instance.image_hyperlink = book_json['image_url']
+
+        if book_json["ratings_count"] != "" and book_json["average_rating"] != "":
+            av_rating = float(book_json["average_rating"])
+            ratings_count = int(book_json["ratings_count"])
+            book_instance.initiliase_rating_and_count(av_rating, ratings_count)
 
-            if book_json['url'] != "":
-                book_instance.hyperlink = book_json['url']
+        # extract the author ids:
+        list_of_authors_ids = book_json['authors']
+        for author_id in list_of_authors_ids:
 
-            if book_json['image_url'] != "":
-                book_instance.image_hyperlink = book_json['image_url']
+            numerical_id = int(author_id['author_id'])
+            author_name = authors_index.get(numerical_id)
+            if author_name is None:
+                # Authors missing from the authors file cannot be named, so record them
+                # for the caller instead of attaching a nameless Author.
+                self.__unresolved_author_ids.add(numerical_id)
+                continue
+            book_instance.add_author(Author(numerical_id, author_name))
 
-            if book_json["ratings_count"] != "" and book_json["average_rating"] != "":
-                av_rating = float(book_json["average_rating"])
-                ratings_count = int(book_json["ratings_count"])
-                book_instance.initiliase_rating_and_count(av_rating, ratings_count)
+        return book_instance
 
+    def iter_books(self) -> Iterator[Book]:
+        # Only the author index is held in memory; books are parsed and yielded one line at a
+        # time so callers can store them without an intermediate list of JSON entries.
+        authors_index = self.read_authors_index()
+        lazy_descriptions = self.__description_file is not None
+        for offset, book_json in self.iter_books_file_with_offsets():
+            yield self.make_book(book_json, authors_index, offset if lazy_descriptions else None)
 
-            # extract the author ids:
-            list_of_authors_ids = book_json['authors']
-            for author_id in list_of_authors_ids:
+    def iter_books_parallel(self, workers: int) -> Iterator[Book]:
+        # Parse byte ranges of the books file in worker processes. Chunks are yielded in file
+        # order, so the books come out in the same order as iter_books(). A compressed file
+        # cannot be split into byte ranges and is always read by a single stream.
+        if workers <= 1 or is_compressed(self.__books_file_name):
+            yield from self.iter_books()
+            return
 
-                numerical_id = int(author_id['author_id'])
-                # We assume book authors are available in the authors file,
-                # otherwise more complex handling is required.
-                author_name = None
-                for author_json in authors_json:
-                    if int(author_json['author_id']) == numerical_id:
-                        author_name = author_json['name']
-                book_instance.add_author(Author(numerical_id, author_name))
+        authors_index = self.read_authors_index()
+        chunks = split_on_lines(
+            self.__books_file_name, workers * 4, self.__size_of(self.__books_file_name)
+        )
+        with Pool(workers, initializer=_init_worker, initargs=(authors_index,)) as pool:
+            lazy_descriptions = self.__description_file is not None
+            chunk_ranges = [
+                (self.__books_file_name, start, end, lazy_descriptions) for start, end in chunks
+            ]
+            for books, unresolved_author_ids in pool.imap(_read_books_chunk, chunk_ranges):
+                self.__unresolved_author_ids.update(unresolved_author_ids)
+                for book in books:
+                    if lazy_descriptions:
+                        book.load_description_from(self.__description_file, book.description_offset)
+                    yield book
 
-            self.__dataset_of_books.append(book_instance)
+    def read_json_files(self, workers: int = 1):
+        self.__dataset_of_books.extend(self.iter_books_parallel(workers))
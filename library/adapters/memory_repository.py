@@ -1,31 +1,116 @@
 import random
 import csv
+import logging
+import threading
+from collections import Counter
 from pathlib import Path
 from datetime import datetime
-from typing import List
-from bisect import insort_left
-
-from library.adapters.repository import AbstractRepository
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from bisect import bisect_left, bisect_right, insort_left
+from math import log2
+from operator import attrgetter
+
+from library.adapters.repository import (
+    AbstractRepository,
+    BOOK_ORDERS,
+    BookPage,
+    BookQuery,
+    BookQueryResult,
+    LEADERBOARDS,
+    RepositoryException,
+    page_of_keys,
+    page_of_matching_keys,
+)
 from library.adapters.jsondatareader import BooksJSONReader
+from library.adapters.columnar import ColumnarBookStore
+from library.adapters.indexes import (
+    BookIdIndex,
+    BookOrder,
+    FuzzyNameIndex,
+    Leaderboard,
+    PrefixIndex,
+    SortedValueIndex,
+    contains_book_id,
+)
+from library.adapters.search import SearchIndex
+from library.adapters.datafiles import find_data_file, open_data_file
+from library.adapters.profiling import StartupProfiler, profile_stage
+from library.authentication.passwords import LAZY_HASHING, hash_passwords
 from library.domain.model import User, Book, Review, make_review, Publisher, Author
-from werkzeug.security import generate_password_hash
+
+logger = logging.getLogger(__name__)
+
+# Author ids listed in the warning about authors missing from the authors file.
+UNRESOLVED_AUTHORS_SAMPLE = 10
+
+
+class BookIds(Sequence):
+    # The ids of a list of books held in book_id order, read in place so they can be searched
+    # with bisect without copying them out.
+    def __init__(self, books):
+        self.__books = books
+
+    def __len__(self):
+        return len(self.__books)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [book.book_id for book in self.__books[index]]
+        return self.__books[index].book_id
 
 
 class MemoryRepository(AbstractRepository):
-    # Books ordered by ID
-    def __init__(self):
-        self.__users = list()
-        self.__books = list()
-        self.__release_years = list()
+    # Books ordered by ID. With columnar=True books are kept in a ColumnarBookStore, which holds
+    # their fields in typed arrays and hands out BookView objects instead of storing Books.
+    def __init__(self, columnar: bool = False):
+        self.__columnar = columnar
+        # Users by normalized user name. The lock makes the uniqueness check and the insert in
+        # add_user atomic when several registrations arrive at once.
+        self.__users = dict()
+        self.__users_lock = threading.Lock()
+        self.__books = ColumnarBookStore() if columnar else list()
         self.__books_index = dict()
+        if columnar:
+            self.__books.observe_rating(self)
         self.__reviews = list()
         self.__publishers = list()
         self.__authors = list()
         self.__authors_index = dict()
-
-        for book in self.__books:
-            self.__release_years.append(book.release_year)
-        self.__release_years = sorted(self.__release_years)
+        self.__publishers_index = dict()
+        # Ids of each author's and each publisher's books, in book_id order.
+        self.__books_by_author = BookIdIndex()
+        self.__books_by_publisher = BookIdIndex()
+        # Books by release year, with books of unknown year under None, and the distinct known
+        # years in ascending order for get_all_release_years and range queries.
+        self.__books_by_release_year = BookIdIndex()
+        self.__release_years = list()
+        # Further facets for query_books.
+        self.__books_by_ebook = BookIdIndex()
+        self.__books_by_num_pages = SortedValueIndex()
+        self.__books_by_average_rating = SortedValueIndex()
+        # Full-text index over titles, descriptions and author names for search_books.
+        self.__search_index = SearchIndex()
+        # Prefix indexes for autocomplete, ranked by ratings count: titles by book_id, authors
+        # by unique_id and publishers by name, the latter two weighted by their books' ratings.
+        self.__title_completions = PrefixIndex()
+        self.__author_completions = PrefixIndex()
+        self.__publisher_completions = PrefixIndex()
+        # Author names by unique_id for match_authors.
+        self.__author_names = FuzzyNameIndex()
+
+        # The books in each of BOOK_ORDERS, for browsing in an order other than book_id. Books
+        # report changes to their rating, so the rating orders are kept up to date in place.
+        self.__orders = {order: BookOrder() for order in BOOK_ORDERS}
+        self.__rating_changes = 0
+
+        # Leaderboards by scope (None for all books, or a (kind, key) pair such as
+        # ("publisher", name)), then by (board, min_ratings). Each is built the first time it is
+        # asked for and then updated as ratings and reviews change.
+        self.__leaderboards = dict()
+
+    @property
+    def columnar(self) -> bool:
+        return self.__columnar
 
     def get_author_by_id(self, unique_id: int):
         try:
@@ -33,18 +118,35 @@ class MemoryRepository(AbstractRepository):
         except KeyError:
             return None
 
+    def get_authors(self, unique_ids: Iterable[int]) -> List[Author]:
+        authors = map(self.__authors_index.get, unique_ids)
+        return [author for author in authors if author is not None]
+
     def get_number_of_book(self) -> int:
         return len(self.__books)
 
 
     def load_authors(self):
         authors = set()
+        self.__books_by_author.clear()
         for book in self.__books:
             for author in book.authors:
                 authors.add(author)
                 self.__authors_index[author.unique_id] = author
+        self.__books_by_author.extend(
+            (author.unique_id, book.book_id) for book in self.__books for author in book.authors
+        )
         self.__authors = list(authors)
 
+    def add_authors(self, authors):
+        # Adds authors not seen before, without rescanning every book like load_authors.
+        for author in authors:
+            if author.unique_id not in self.__authors_index:
+                self.__authors_index[author.unique_id] = author
+                self.__authors.append(author)
+            self.__author_completions.add(author.unique_id, author.full_name)
+            self.__author_names.add(author.unique_id, author.full_name)
+
     def get_all_authors(self) -> List[Author]:
         return self.__authors
 
@@ -52,44 +154,99 @@ class MemoryRepository(AbstractRepository):
         return self.__release_years
 
     def get_books_by_author(self, author: Author):
-        if author in self.__authors:
-            return [book for book in self.__books if author in book.authors]
+        if author.unique_id in self.__authors_index:
+            return self.get_books(self.__books_by_author.get(author.unique_id))
         return None
 
-    def get_book_release_year(self, year: int) -> List[Book]:
-        return [book for book in self.__books if book.release_year == year]
+    def get_book_release_year(self, year: int, start: int = 0, stop: int = None) -> List[Book]:
+        return self.get_books(self.__books_by_release_year.get(year)[start:stop])
 
-    def get_books_by_publisher(self, the_publisher: Publisher) -> List[Book]:
+    def get_number_of_books_by_release_year(self, year: int) -> int:
+        return self.__books_by_release_year.count(year)
+
+    def get_books_between_years(self, start_year: int = None, end_year: int = None) -> List[Book]:
+        # Books released from start_year to end_year inclusive, ordered by year and then book_id.
+        # Either bound may be None to leave that end open; books of unknown year are excluded.
+        return self.get_books(
+            book_id
+            for year in self.__release_years_between(start_year, end_year)
+            for book_id in self.__books_by_release_year.get(year)
+        )
+
+    def __release_years_between(self, start_year: int = None, end_year: int = None) -> List[int]:
+        low = 0 if start_year is None else bisect_left(self.__release_years, start_year)
+        high = (
+            len(self.__release_years)
+            if end_year is None
+            else bisect_right(self.__release_years, end_year)
+        )
+        return self.__release_years[low:high]
+
+    def get_books_by_publisher(
+        self, the_publisher: Publisher, start: int = 0, stop: int = None
+    ) -> List[Book]:
         if the_publisher is None:
             the_publisher = Publisher("N/A")
-        return [book for book in self.__books if book.publisher == the_publisher]
+        return self.get_books(self.__books_by_publisher.get(the_publisher.name)[start:stop])
+
+    def get_number_of_books_by_publisher(self, the_publisher: Publisher) -> int:
+        if the_publisher is None:
+            the_publisher = Publisher("N/A")
+        return self.__books_by_publisher.count(the_publisher.name)
 
     def get_publisher_by_name(self, name: str):
         if name == "N/A":
             return None
-        return next(
-            (publisher for publisher in self.__publishers if publisher.name == name),
-            None,
-        )
+        return self.__publishers_index.get(name)
 
     def add_publishers(self, set_of_publishers: set):
+        new_publishers = list()
         for publisher in set_of_publishers:
-            if publisher not in self.__publishers:
-                self.__publishers.append(publisher)
-        self.__publishers.sort()
+            if publisher.name not in self.__publishers_index:
+                self.__publishers_index[publisher.name] = publisher
+                new_publishers.append(publisher)
+        if new_publishers:
+            # The list is already sorted, so the sort only has to merge in the new run.
+            self.__publishers.extend(sorted(new_publishers))
+            self.__publishers.sort()
 
     def get_publishers(self):
         return self.__publishers
 
     def add_user(self, user: User):
-        self.__users.append(user)
+        key = normalize_user_name(user.user_name)
+        if key is None:
+            raise RepositoryException("User has no user name")
+        with self.__users_lock:
+            if key in self.__users:
+                raise RepositoryException("User name already taken")
+            self.__users[key] = user
 
     def get_user(self, user_name) -> User:
-        return next(
-            (user for user in self.__users if user.user_name == user_name), None
-        )
+        return self.__users.get(normalize_user_name(user_name))
+
+    def get_users(self, user_names: Iterable[str]) -> List[User]:
+        users = [self.__users.get(normalize_user_name(user_name)) for user_name in user_names]
+        return [user for user in users if user is not None]
+
+    def get_all_users(self) -> List[User]:
+        with self.__users_lock:
+            return list(self.__users.values())
+
+    def __getstate__(self):
+        # Locks cannot be pickled (e.g. into a snapshot); a fresh one is made on unpickling.
+        state = self.__dict__.copy()
+        del state["_MemoryRepository__users_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__users_lock = threading.Lock()
 
     def get_book(self, book_id: int) -> Book:
+        if self.__columnar:
+            return self.__books.get(book_id)
+
         book = None
         try:
             book = self.__books_index[book_id]
@@ -98,13 +255,391 @@ class MemoryRepository(AbstractRepository):
 
         return book
 
+    def get_books(self, book_ids: Iterable[int]) -> List[Book]:
+        # Ids come from the indexes in bulk, so they are looked up without a call per book.
+        lookup = self.__books.get if self.__columnar else self.__books_index.get
+        return [book for book in map(lookup, book_ids) if book is not None]
+
     def add_book(self, book: Book):
+        for author in book.authors:
+            self.__books_by_author.add(author.unique_id, book.book_id)
+        self.__books_by_publisher.add(self.__publisher_key(book), book.book_id)
+        if book.release_year is not None and book.release_year not in self.__books_by_release_year:
+            insort_left(self.__release_years, book.release_year)
+        self.__books_by_release_year.add(book.release_year, book.book_id)
+        self.__books_by_ebook.add(book.ebook, book.book_id)
+        self.__books_by_num_pages.add(book.num_pages, book.book_id)
+        self.__books_by_average_rating.add(book.average_rating, book.book_id)
+        self.__search_index.add(book)
+        self.__title_completions.add(*self.__title_completion(book))
+        self.__author_completions.extend(self.__author_completions_of(book))
+        self.__publisher_completions.extend(self.__publisher_completions_of(book))
+        self.__author_names.extend(
+            (author.unique_id, author.full_name) for author in book.authors
+        )
+        for order, (attribute, _) in BOOK_ORDERS.items():
+            self.__orders[order].add(getattr(book, attribute), book.book_id)
+        self.__update_leaderboards(book, LEADERBOARDS)
+        if self.__columnar:
+            self.__books.add(book)
+            return
+
         insort_left(self.__books, book)
         self.__books_index[book.book_id] = book
+        book.observe_rating(self)
+
+    @staticmethod
+    def __publisher_key(book: Book):
+        return None if book.publisher is None else book.publisher.name
+
+    @staticmethod
+    def __title_completion(book: Book):
+        return book.book_id, book.title, book.ratings_count or 0
+
+    @staticmethod
+    def __author_completions_of(book: Book):
+        return [
+            (author.unique_id, author.full_name, book.ratings_count or 0)
+            for author in book.authors
+        ]
+
+    @staticmethod
+    def __publisher_completions_of(book: Book):
+        if book.publisher is None or book.publisher.name == "N/A":
+            return []
+        return [(book.publisher.name, book.publisher.name, book.ratings_count or 0)]
 
     def load_books(self, list_of_books):
-        for book in list_of_books:
-            self.add_book(book)
+        # Bulk load: add_book keeps the list sorted with insort_left, which moves O(n) elements
+        # per book. Here the books are appended, indexed in one pass and sorted once by book_id;
+        # the sort is stable, so the list ends up in the same order as repeated add_book calls
+        # apart from the placement of duplicate ids.
+        # The author, publisher and release year indexes are extended the same way: ids are
+        # appended and each list touched is sorted once at the end.
+        if self.__columnar:
+            new_books = list(list_of_books)
+            self.__books.extend(new_books)
+        else:
+            num_books = len(self.__books)
+            self.__books.extend(list_of_books)
+            new_books = self.__books[num_books:]
+            for book in new_books:
+                self.__books_index[book.book_id] = book
+                book.observe_rating(self)
+            if new_books:
+                self.__books.sort(key=attrgetter("book_id"))
+        self.__books_by_author.extend(
+            (author.unique_id, book.book_id) for book in new_books for author in book.authors
+        )
+        self.__books_by_publisher.extend(
+            (self.__publisher_key(book), book.book_id) for book in new_books
+        )
+        self.__books_by_release_year.extend((book.release_year, book.book_id) for book in new_books)
+        self.__release_years = sorted(
+            year for year in self.__books_by_release_year.keys() if year is not None
+        )
+        self.__books_by_ebook.extend((book.ebook, book.book_id) for book in new_books)
+        self.__books_by_num_pages.extend((book.num_pages, book.book_id) for book in new_books)
+        self.__books_by_average_rating.extend(
+            (book.average_rating, book.book_id) for book in new_books
+        )
+        for book in new_books:
+            self.__search_index.add(book)
+        self.__title_completions.extend(self.__title_completion(book) for book in new_books)
+        self.__author_completions.extend(
+            item for book in new_books for item in self.__author_completions_of(book)
+        )
+        self.__publisher_completions.extend(
+            item for book in new_books for item in self.__publisher_completions_of(book)
+        )
+        self.__author_names.extend(
+            (author.unique_id, author.full_name) for book in new_books for author in book.authors
+        )
+        for order, (attribute, _) in BOOK_ORDERS.items():
+            self.__orders[order].extend(
+                (getattr(book, attribute), book.book_id) for book in new_books
+            )
+        # Rebuilt on demand rather than updated a book at a time.
+        self.__leaderboards.clear()
+
+    def rating_changed(self, book: Book, old_average_rating: float, old_ratings_count: int):
+        book_id = book.book_id
+        self.__books_by_average_rating.remove(old_average_rating, book_id)
+        self.__books_by_average_rating.add(book.average_rating, book_id)
+        for order, old_value, value in (
+            ("average_rating", old_average_rating, book.average_rating),
+            ("ratings_count", old_ratings_count, book.ratings_count),
+        ):
+            self.__orders[order].remove(old_value, book_id)
+            self.__orders[order].add(value, book_id)
+        self.__update_leaderboards(book, ("highest_rated", "most_rated"))
+        self.__rating_changes += 1
+
+    @property
+    def rating_changes(self) -> int:
+        return self.__rating_changes
+
+    def complete_titles(self, prefix: str, limit: int = 10) -> List[Book]:
+        return self.get_books(self.__title_completions.complete(prefix, limit))
+
+    def complete_authors(self, prefix: str, limit: int = 10) -> List[Author]:
+        return [
+            self.__author(unique_id)
+            for unique_id in self.__author_completions.complete(prefix, limit)
+        ]
+
+    def match_authors(self, name: str, limit: int = 10) -> List[Author]:
+        # Exact matches (ignoring case, accents, punctuation and word order) come first, then
+        # names close enough in spelling, most similar first.
+        unique_ids = self.__author_names.exact(name)
+        if limit is None or len(unique_ids) < limit:
+            unique_ids += [
+                unique_id
+                for unique_id, _ in self.__author_names.similar(name, limit)
+                if unique_id not in unique_ids
+            ]
+        return [self.__author(unique_id) for unique_id in unique_ids[:limit]]
+
+    def __author(self, unique_id: int) -> Author:
+        # Authors are looked up in the author index when it has them; it is filled by
+        # load_authors and add_authors, while the name indexes are filled as books are added.
+        return self.__authors_index.get(unique_id) or self.__author_of_book(unique_id)
+
+    def __author_of_book(self, unique_id: int) -> Author:
+        book = self.get_book(self.__books_by_author.get(unique_id)[0])
+        return next(author for author in book.authors if author.unique_id == unique_id)
+
+    def complete_publishers(self, prefix: str, limit: int = 10) -> List[Publisher]:
+        return [
+            self.__publishers_index.get(name) or Publisher(name)
+            for name in self.__publisher_completions.complete(prefix, limit)
+        ]
+
+    def find_authors_by_name(self, name: str) -> List[Author]:
+        return self.complete_authors(name, None)
+
+    def search_books(self, query: str, start: int = 0, stop: int = None) -> Tuple[List[Book], int]:
+        results, total = self.__search_index.search(query, self.get_book, start, stop)
+        return self.get_books(book_id for book_id, _ in results), total
+
+    def __filters(self, query: BookQuery) -> list:
+        # Each filter gives the number of books it matches, a way to list their ids in book_id
+        # order and a test for a single book.
+        filters = []
+
+        def posting_filter(book_ids):
+            return (
+                len(book_ids),
+                lambda: book_ids,
+                lambda book: contains_book_id(book_ids, book.book_id),
+            )
+
+        def range_filter(count, list_book_ids, attribute, low, high):
+            def test(book):
+                value = getattr(book, attribute)
+                return (
+                    value is not None
+                    and (low is None or value >= low)
+                    and (high is None or value <= high)
+                )
+            return count, list_book_ids, test
+
+        if query.publisher is not None:
+            filters.append(posting_filter(self.__books_by_publisher.get(query.publisher.name)))
+        if query.author is not None:
+            filters.append(posting_filter(self.__books_by_author.get(query.author.unique_id)))
+        if query.ebook is not None:
+            filters.append(posting_filter(self.__books_by_ebook.get(query.ebook)))
+        if query.unknown_year:
+            filters.append(posting_filter(self.__books_by_release_year.get(None)))
+        if query.start_year is not None or query.end_year is not None:
+            years = self.__release_years_between(query.start_year, query.end_year)
+            if len(years) == 1:
+                # A single year's ids are already listed in order.
+                filters.append(posting_filter(self.__books_by_release_year.get(years[0])))
+            else:
+                filters.append(range_filter(
+                    sum(self.__books_by_release_year.count(year) for year in years),
+                    lambda: sorted(
+                        book_id
+                        for year in years
+                        for book_id in self.__books_by_release_year.get(year)
+                    ),
+                    "release_year", query.start_year, query.end_year,
+                ))
+        if query.min_pages is not None or query.max_pages is not None:
+            pages = self.__books_by_num_pages
+            filters.append(range_filter(
+                pages.count_between(query.min_pages, query.max_pages),
+                lambda: pages.book_ids_between(query.min_pages, query.max_pages),
+                "num_pages", query.min_pages, query.max_pages,
+            ))
+        if query.min_rating is not None:
+            ratings = self.__books_by_average_rating
+            filters.append(range_filter(
+                ratings.count_between(query.min_rating),
+                lambda: ratings.book_ids_between(query.min_rating),
+                "average_rating", query.min_rating, None,
+            ))
+        return filters
+
+    def __matching_book_ids(self, query: BookQuery) -> Sequence[int]:
+        # Only the ids of the most selective filter are listed and the other filters are tested
+        # against those books, so a query costs time in proportion to its smallest filter rather
+        # than to the catalogue. A query with a single filter costs nothing here: its id list is
+        # returned as it is held by the index.
+        filters = self.__filters(query)
+        if not filters:
+            return BookIds(self.__books)
+        filters.sort(key=lambda entry: entry[0])
+        _, list_book_ids, _ = filters[0]
+        tests = [test for _, _, test in filters[1:]]
+        if not tests:
+            return list_book_ids()
+        return [
+            book_id
+            for book_id in list_book_ids()
+            if all(test(self.get_book(book_id)) for test in tests)
+        ]
+
+    def get_books_page(
+        self, query: BookQuery, after_key: int = None, limit: int = 5, reverse: bool = False,
+        order: str = None,
+    ) -> BookPage:
+        book_ids = self.__matching_book_ids(query)
+        if order is None:
+            page, previous_key, next_key = page_of_keys(book_ids, after_key, limit, reverse)
+        else:
+            page, previous_key, next_key = self.__page_in_order(
+                order, book_ids, after_key, limit, reverse
+            )
+        return BookPage(
+            self.get_books(page), len(book_ids), previous_key, next_key
+        )
+
+    def __page_in_order(
+        self, order: str, book_ids: Sequence[int], after_key: Optional[int], limit: int,
+        reverse: bool,
+    ) -> Tuple[List[int], Optional[int], Optional[int]]:
+        # Pages through the entries of a BookOrder, which are held lowest first: a descending
+        # order is read from the end, and the page and its keys are turned round to match.
+        attribute, descending = BOOK_ORDERS[order]
+        entries = self.__orders[order].entries
+        after_entry = None
+        if after_key is not None:
+            book = self.get_book(after_key)
+            if book is not None:
+                after_entry = BookOrder.entry(getattr(book, attribute), after_key)
+        backwards = reverse != descending
+
+        if len(book_ids) == len(entries):
+            # Every book matches, so the page is a slice of the order.
+            page, previous_entry, next_entry = page_of_keys(
+                entries, after_entry, limit, backwards
+            )
+        elif len(book_ids) ** 2 * log2(len(book_ids) + 1) <= (limit + 2) * len(entries):
+            # Walking the order steps over about len(entries) / len(book_ids) books for each
+            # match it reads, so a few matches are cheaper to sort than to look for.
+            matches = sorted(
+                BookOrder.entry(getattr(book, attribute), book.book_id)
+                for book in self.get_books(book_ids)
+            )
+            page, previous_entry, next_entry = page_of_keys(
+                matches, after_entry, limit, backwards
+            )
+        else:
+            page, previous_entry, next_entry = page_of_matching_keys(
+                entries,
+                lambda entry: contains_book_id(book_ids, entry[1]),
+                after_entry, limit, backwards,
+            )
+
+        page = [book_id for _, book_id in page]
+        previous_key = None if previous_entry is None else previous_entry[1]
+        next_key = None if next_entry is None else next_entry[1]
+        if descending:
+            page.reverse()
+            previous_key, next_key = next_key, previous_key
+        return page, previous_key, next_key
+
+    def query_books(self, query: BookQuery, start: int = 0, stop: int = None) -> BookQueryResult:
+        matches = self.get_books(self.__matching_book_ids(query))
+
+        facets = {
+            "publisher": Counter(),
+            "author": Counter(),
+            "release_year": Counter(),
+            "ebook": Counter(),
+        }
+        for book in matches:
+            facets["publisher"][book.publisher] += 1
+            facets["author"].update(book.authors)
+            facets["release_year"][book.release_year] += 1
+            facets["ebook"][book.ebook] += 1
+        return BookQueryResult(
+            matches[start:stop], len(matches), {name: dict(counts) for name, counts in facets.items()}
+        )
+
+    @staticmethod
+    def __leaderboard_key(board: str, book: Book, min_ratings: int) -> Optional[tuple]:
+        # The key that ranks a book on a board, lowest first, or None if it is left off.
+        if board == "highest_rated":
+            if book.average_rating is None or (book.ratings_count or 0) < min_ratings:
+                return None
+            return -book.average_rating, -book.ratings_count
+        if board == "most_rated":
+            return (-book.ratings_count,) if book.ratings_count else None
+        number_of_reviews = book.number_of_reviews
+        return (-number_of_reviews,) if number_of_reviews else None
+
+    def __scopes_of(self, book: Book) -> list:
+        return [
+            None,
+            ("publisher", self.__publisher_key(book)),
+            ("release_year", book.release_year),
+        ] + [("author", author.unique_id) for author in book.authors]
+
+    def __update_leaderboards(self, book: Book, boards):
+        if not self.__leaderboards:
+            return
+        for scope in self.__scopes_of(book):
+            scope_boards = self.__leaderboards.get(scope, {})
+            for (board, min_ratings), leaderboard in list(scope_boards.items()):
+                if board in boards:
+                    leaderboard.update(
+                        book.book_id, self.__leaderboard_key(board, book, min_ratings)
+                    )
+
+    def get_top_books(
+        self, board: str, limit: int = 10, publisher: Publisher = None, author: Author = None,
+        release_year: int = None, min_ratings: int = 0,
+    ) -> List[Book]:
+        if board not in LEADERBOARDS:
+            raise ValueError("Unknown leaderboard %r" % board)
+        if board != "highest_rated":
+            min_ratings = 0
+        if publisher is not None:
+            scope = ("publisher", publisher.name)
+            book_ids = self.__books_by_publisher.get(publisher.name)
+        elif author is not None:
+            scope = ("author", author.unique_id)
+            book_ids = self.__books_by_author.get(author.unique_id)
+        elif release_year is not None:
+            scope = ("release_year", release_year)
+            book_ids = self.__books_by_release_year.get(release_year)
+        else:
+            scope, book_ids = None, None
+
+        boards = self.__leaderboards.setdefault(scope, dict())
+        leaderboard = boards.get((board, min_ratings))
+        if leaderboard is None or leaderboard.needs_rebuild or leaderboard.size < limit:
+            books = self.__books if book_ids is None else self.get_books(book_ids)
+            keys = ((self.__leaderboard_key(board, book, min_ratings), book) for book in books)
+            leaderboard = boards[(board, min_ratings)] = Leaderboard(
+                ((key, book.book_id) for key, book in keys if key is not None),
+                max(limit, Leaderboard.SIZE),
+            )
+        return self.get_books(leaderboard.top(limit))
 
     def get_books_random(self, num_books=5):
         if num_books >= 100 or num_books > len(self.__books):
@@ -120,10 +655,19 @@ class MemoryRepository(AbstractRepository):
     def add_review(self, review: Review):
         super().add_review(review)
         self.__reviews.append(review)
+        self.__update_leaderboards(review.book, ("most_reviewed",))
+
+
+def normalize_user_name(user_name) -> Optional[str]:
+    # User stores names stripped and lower-cased, so lookups are normalized the same way.
+    if not isinstance(user_name, str) or user_name.strip() == "":
+        return None
+    return user_name.strip().lower()
 
 
-def read_csv_file(filename: str):
-    with open(filename, encoding="utf-8-sig") as infile:
+def read_csv_file(filename: str, size: int = None):
+    # With a size, rows are read from the first `size` bytes of the file only.
+    with open_data_file(filename, encoding="utf-8-sig", size=size) as infile:
         reader = csv.reader(infile)
 
         # Read first line of the the CSV file.
@@ -135,56 +679,154 @@ def read_csv_file(filename: str):
             yield row
 
 
-def load_books(data_path: Path, repo: MemoryRepository):
-    books_filename = str(data_path / "comic_books_excerpt.json")
-    authors_filename = str(data_path / "book_authors_excerpt.json")
-    reader = BooksJSONReader(books_filename, authors_filename)
-    reader.read_json_files()
-    repo.load_books(reader.dataset_of_books)
+def load_books(
+    data_path: Path,
+    repo: AbstractRepository,
+    workers: int = 1,
+    lazy_descriptions: bool = False,
+    profiler: Optional[StartupProfiler] = None,
+    sizes: Optional[Dict[str, int]] = None,
+):
+    books_filename = str(find_data_file(data_path, "comic_books_excerpt.json"))
+    authors_filename = str(find_data_file(data_path, "book_authors_excerpt.json"))
+    reader = BooksJSONReader(books_filename, authors_filename, lazy_descriptions, sizes)
+    if profiler is None:
+        # Stream books straight into the repository rather than materialising them in the reader first.
+        repo.load_books(reader.iter_books_parallel(workers))
+    elif workers > 1:
+        # A profiled load streams the same way, timing JSON parsing, Book construction and
+        # insertion separately as each book passes through them. Worker processes do the first
+        # two together.
+        with profiler.stage("add_books") as stage:
+            books = profiler.stream("read_books", reader.iter_books_parallel(workers))
+            repo.load_books(books)
+            stage.records = repo.get_number_of_book()
+    else:
+        with profiler.stage("read_authors") as stage:
+            authors_index = reader.read_authors_index()
+            stage.records = len(authors_index)
+        with profiler.stage("add_books") as stage:
+            lazy = reader.description_file is not None
+            entries = profiler.stream("parse_books", reader.iter_books_file_with_offsets())
+            books = profiler.stream(
+                "build_books",
+                (
+                    reader.make_book(book_json, authors_index, offset if lazy else None)
+                    for offset, book_json in entries
+                ),
+            )
+            repo.load_books(books)
+            stage.records = repo.get_number_of_book()
+
+    # Books keep only the authors named in the authors file; say which ones had to be left off.
+    unresolved = sorted(reader.unresolved_author_ids)
+    if unresolved:
+        logger.warning(
+            "%d author ids in %s are missing from %s and were left off their books, e.g. %s",
+            len(unresolved),
+            books_filename,
+            authors_filename,
+            ", ".join(str(author_id) for author_id in unresolved[:UNRESOLVED_AUTHORS_SAMPLE]),
+        )
 
 
-def load_users(data_path: Path, repo: MemoryRepository):
+def load_users(
+    data_path: Path,
+    repo: AbstractRepository,
+    password_hashing: str = LAZY_HASHING,
+    workers: int = 1,
+    sizes: Optional[Dict[str, int]] = None,
+):
     users = dict()
 
-    users_filename = str(Path(data_path) / "users.csv")
-    for data_row in read_csv_file(users_filename):
-        user = User(user_name=data_row[1], password=generate_password_hash(data_row[2]))
-        repo.add_user(user)
+    users_filename = str(find_data_file(data_path, "users.csv"))
+    data_rows = list(read_csv_file(users_filename, (sizes or dict()).get("users.csv")))
+    # Pre-hashed passwords are stored as they are; plaintext ones are hashed eagerly, in
+    # `workers` processes, or on the user's first login (see library.authentication.passwords).
+    passwords = hash_passwords([data_row[2] for data_row in data_rows], password_hashing, workers)
+    for data_row, password in zip(data_rows, passwords):
+        user = User(user_name=data_row[1], password=password)
+        try:
+            repo.add_user(user)
+        except RepositoryException:
+            # A repeated user name refers to the user already loaded.
+            user = repo.get_user(user.user_name)
         users[data_row[0]] = user
     return users
 
 
-def load_publishers(repo: MemoryRepository):
+def make_user(data_row: List[str], password_hashing: str = LAZY_HASHING) -> User:
+    password = hash_passwords([data_row[2]], password_hashing)[0]
+    return User(user_name=data_row[1], password=password)
+
+
+def load_publishers(repo: AbstractRepository):
     books = repo.get_all_books()
     list_of_publishers = set([book.publisher for book in books])
     repo.add_publishers(list_of_publishers)
 
 
-def load_reviews(data_path: Path, repo: MemoryRepository, users):
-    reviews_filename = str(Path(data_path) / "reviews.csv")
-    for data_row in read_csv_file(reviews_filename):
-        review = make_review(
+def load_reviews(
+    data_path: Path, repo: AbstractRepository, users, sizes: Optional[Dict[str, int]] = None
+) -> int:
+    reviews_filename = str(find_data_file(data_path, "reviews.csv"))
+    data_rows = list(read_csv_file(reviews_filename, (sizes or dict()).get("reviews.csv")))
+    reviews = make_reviews_from_rows(data_rows, repo, users)
+    for review in reviews:
+        repo.add_review(review)
+    return len(reviews)
+
+
+def make_reviews_from_rows(
+    data_rows: List[List[str]], repo: AbstractRepository, users
+) -> List[Review]:
+    # The reviewed books of all the rows are fetched with one get_books call.
+    books = {
+        book.book_id: book
+        for book in repo.get_books(set(int(data_row[2]) for data_row in data_rows))
+    }
+    return [
+        make_review(
             review_text=data_row[3],
             user=users[data_row[1]],
-            book=repo.get_book(int(data_row[2])),
+            book=books.get(int(data_row[2])),
             timestamp=datetime.fromisoformat(data_row[4]),
         )
-        repo.add_review(review)
-
-
-def populate(data_path: Path, repo: MemoryRepository):
-    # Load Books into the repository.
-    load_books(data_path, repo)
+        for data_row in data_rows
+    ]
+
+
+def populate(
+    data_path: Path,
+    repo: AbstractRepository,
+    workers: int = 1,
+    lazy_descriptions: bool = False,
+    password_hashing: str = LAZY_HASHING,
+    profiler: Optional[StartupProfiler] = None,
+    sizes: Optional[Dict[str, int]] = None,
+):
+    # Load Books into the repository, parsing the books file in `workers` processes. With
+    # lazy_descriptions, descriptions are left in the books file and read when first displayed.
+    # A profiler, when given, records the time, memory and record count of every stage.
+    # With sizes (see datafiles.data_file_sizes), each file is read up to its given size only.
+    load_books(data_path, repo, workers, lazy_descriptions, profiler, sizes)
 
     # Load users into repository
-    users = load_users(data_path, repo)
+    with profile_stage(profiler, "load_users") as stage:
+        users = load_users(data_path, repo, password_hashing, workers, sizes)
+        stage.records = len(users)
 
     # Load publishers into repository
-    load_publishers(repo)
+    with profile_stage(profiler, "load_publishers") as stage:
+        load_publishers(repo)
+        stage.records = len(repo.get_publishers())
 
     # Load authors into repository from book objects
-    repo.load_authors()
+    with profile_stage(profiler, "load_authors") as stage:
+        repo.load_authors()
+        stage.records = len(repo.get_all_authors())
 
     #load_reviewsss
-    load_reviews(data_path, repo, users)
+    with profile_stage(profiler, "load_reviews") as stage:
+        stage.records = load_reviews(data_path, repo, users, sizes)
 
@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StageReport:
+    # Measurements for one stage of populate. CPU time includes worker processes that were
+    # reaped during the stage; peak memory only covers allocations made in this process.
+
+    def __init__(self, name: str):
+        self.name = name
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_memory_delta = None
+        self.records = None
+
+    def as_dict(self) -> dict:
+        return {
+            "stage": self.name,
+            "wall_s": round(self.wall_seconds, 6),
+            "cpu_s": round(self.cpu_seconds, 6),
+            "peak_mem_bytes": self.peak_memory_delta,
+            "records": self.records,
+        }
+
+
+def _cpu_seconds() -> float:
+    # process_time has a finer resolution than os.times, which is only needed for the children.
+    times = os.times()
+    return time.process_time() + times.children_user + times.children_system
+
+
+class StartupProfiler:
+    # Collects a StageReport per stage of populate. With trace_memory, each stage runs under
+    # tracemalloc, which reports its peak allocation but slows it down noticeably.
+    #
+    # Stages of a streaming pipeline run interleaved, so each one is charged only its own time:
+    # time spent in a nested stream() is taken off the stage or stream that pulled from it.
+
+    def __init__(self, trace_memory: bool = True):
+        self.__trace_memory = trace_memory
+        self.__stages = list()
+        # [wall, cpu] seconds spent in nested streams, one entry per stage or stream running.
+        self.__nested = list()
+
+    @property
+    def stages(self) -> List[StageReport]:
+        return self.__stages
+
+    @property
+    def trace_memory(self) -> bool:
+        return self.__trace_memory
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageReport]:
+        # The caller may set records on the yielded report.
+        report = StageReport(name)
+        started_tracing = False
+        if self.__trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            elif hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
+        cpu_before = _cpu_seconds()
+        wall_before = time.perf_counter()
+        self.__nested.append([0.0, 0.0])
+        try:
+            yield report
+        finally:
+            self.__charge(report, wall_before, cpu_before)
+            if self.__trace_memory:
+                report.peak_memory_delta = tracemalloc.get_traced_memory()[1] - memory_before
+                if started_tracing:
+                    tracemalloc.stop()
+            self.__stages.append(report)
+
+    def stream(self, name: str, items: Iterable) -> Iterator:
+        # Yields `items` unchanged, charging the time taken to produce each one to a stage
+        # called `name` and counting them as they pass. Its allocations cannot be told apart
+        # from those of the stages it is interleaved with, so only the enclosing stage reports
+        # peak memory.
+        report = StageReport(name)
+        report.records = 0
+        self.__stages.append(report)
+        return self.__stream(report, iter(items))
+
+    def __stream(self, report: StageReport, iterator: Iterator) -> Iterator:
+        while True:
+            cpu_before = _cpu_seconds()
+            wall_before = time.perf_counter()
+            self.__nested.append([0.0, 0.0])
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.__charge(report, wall_before, cpu_before)
+            report.records += 1
+            yield item
+
+    def __charge(self, report: StageReport, wall_before: float, cpu_before: float):
+        # Adds the time since wall_before and cpu_before, less that of nested streams, to
+        # report, and counts all of it as nested time of whatever is running around it.
+        wall = time.perf_counter() - wall_before
+        cpu = _cpu_seconds() - cpu_before
+        nested_wall, nested_cpu = self.__nested.pop()
+        report.wall_seconds += wall - nested_wall
+        report.cpu_seconds += cpu - nested_cpu
+        if self.__nested:
+            self.__nested[-1][0] += wall
+            self.__nested[-1][1] += cpu
+
+    def as_dict(self) -> Dict:
+        return {
+            "wall_s": round(sum(stage.wall_seconds for stage in self.__stages), 6),
+            "cpu_s": round(sum(stage.cpu_seconds for stage in self.__stages), 6),
+            "stages": [stage.as_dict() for stage in self.__stages],
+        }
+
+    def log(self, log: logging.Logger = logger):
+        # One line of JSON, so startup times can be collected from the logs and compared.
+        log.info("startup profile %s", json.dumps(self.as_dict(), sort_keys=True))
+
+    def format_table(self) -> str:
+        lines = ["%-16s %10s %10s %14s %10s" % ("stage", "wall s", "cpu s", "peak mem KiB", "records")]
+        for stage in self.__stages:
+            memory = "-" if stage.peak_memory_delta is None else "%.1f" % (stage.peak_memory_delta / 1024)
+            records = "-" if stage.records is None else str(stage.records)
+            lines.append("%-16s %10.3f %10.3f %14s %10s" % (
+                stage.name, stage.wall_seconds, stage.cpu_seconds, memory, records
+            ))
+        totals = self.as_dict()
+        lines.append("%-16s %10.3f %10.3f" % ("total", totals["wall_s"], totals["cpu_s"]))
+        return "\n".join(lines)
+
+
+@contextmanager
+def profile_stage(profiler: Optional[StartupProfiler], name: str) -> Iterator[StageReport]:
+    # Lets loaders time a stage without branching on whether a profiler was given.
+    if profiler is None:
+        yield StageReport(name)
+    else:
+        with profiler.stage(name) as report:
+            yield report
@@ -1,5 +1,6 @@
 import abc
-from typing import List
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 from datetime import date
 from collections import MutableMapping
 from library.domain.model import User, Book, Review, Publisher, Author
@@ -12,19 +13,151 @@ class RepositoryException(Exception):
         pass
 
 
+class BookQuery:
+    # Filters for AbstractRepository.query_books and get_books_page. Every filter left as None
+    # matches all books; the ranges are inclusive and either end may be None. unknown_year=True
+    # keeps only the books whose release year is unknown.
+    def __init__(
+        self,
+        publisher: Publisher = None,
+        author: Author = None,
+        start_year: int = None,
+        end_year: int = None,
+        ebook: bool = None,
+        min_pages: int = None,
+        max_pages: int = None,
+        min_rating: float = None,
+        unknown_year: bool = False,
+    ):
+        self.publisher = publisher
+        self.author = author
+        self.start_year = start_year
+        self.end_year = end_year
+        self.ebook = ebook
+        self.min_pages = min_pages
+        self.max_pages = max_pages
+        self.min_rating = min_rating
+        self.unknown_year = unknown_year
+
+
+class BookQueryResult:
+    # The requested slice of the matching books, the number of matches and, for each facet, the
+    # number of matching books per value: facets["publisher"] maps Publisher to a count, and
+    # "author", "release_year" and "ebook" map Author, year and bool (None if unknown) likewise.
+    def __init__(self, books: List[Book], total: int, facets: dict):
+        self.books = books
+        self.total = total
+        self.facets = facets
+
+
+class BookPage:
+    # One page of the books matching a query, and the number of matching books. previous_key and
+    # next_key are the keys to page backwards and forwards from, or None at either end.
+    def __init__(self, books: list, total: int, previous_key=None, next_key=None):
+        self.books = books
+        self.total = total
+        self.previous_key = previous_key
+        self.next_key = next_key
+
+
+# The orders get_books_page can list books in besides book_id: the Book attribute sorted on
+# and whether it is listed highest first. Ties are broken by book_id, in the same direction.
+# Books without a value sort below all others, so the descending orders list them last.
+BOOK_ORDERS = {
+    "title": ("title", False),
+    "release_year": ("release_year", True),
+    "average_rating": ("average_rating", True),
+    "ratings_count": ("ratings_count", True),
+}
+
+# The lists get_top_books can give, best first: "highest_rated" by average rating, then number of
+# ratings, among the books with at least min_ratings ratings; "most_rated" by number of ratings;
+# "most_reviewed" by number of reviews in the catalogue. Ties go to the lower book_id, and books
+# with no ratings (or no reviews) are left out.
+LEADERBOARDS = ("highest_rated", "most_rated", "most_reviewed")
+
+
+def page_of_keys(
+    keys: Sequence, after_key=None, limit: int = 5, reverse: bool = False
+) -> Tuple[Sequence, Optional[object], Optional[object]]:
+    # Keyset paging over a sorted sequence of keys: the limit keys after after_key (from the
+    # start if None), or with reverse=True the limit keys before it (from the end if None).
+    # Returns the keys on the page and the previous and next keys to page from, or None where
+    # there are no keys left that way. A range of positions pages through an ordered list.
+    if reverse:
+        stop = len(keys) if after_key is None else bisect_left(keys, after_key)
+        start = max(0, stop - limit)
+    else:
+        start = 0 if after_key is None else bisect_right(keys, after_key)
+        stop = min(len(keys), start + limit)
+    previous_key = keys[start] if start > 0 else None
+    next_key = keys[stop - 1] if stop < len(keys) and stop > start else None
+    return keys[start:stop], previous_key, next_key
+
+
+def page_of_matching_keys(
+    keys: Sequence, accept, after_key=None, limit: int = 5, reverse: bool = False
+) -> Tuple[list, Optional[object], Optional[object]]:
+    # As page_of_keys, over only the keys that accept returns True for. The keys are walked from
+    # after_key, stepping over the others, until the page is full and one more match either way
+    # is found, so the cost depends on how densely the matches are spread rather than on the
+    # number of keys.
+    def any_match(positions):
+        return any(accept(keys[position]) for position in positions)
+
+    page = []
+    if reverse:
+        position = len(keys) if after_key is None else bisect_left(keys, after_key)
+        end = position
+        while position > 0 and len(page) < limit:
+            position -= 1
+            if accept(keys[position]):
+                page.append(keys[position])
+        page.reverse()
+        more_before = any_match(range(position - 1, -1, -1))
+        more_after = any_match(range(end, len(keys)))
+    else:
+        position = 0 if after_key is None else bisect_right(keys, after_key)
+        start = position
+        while position < len(keys) and len(page) < limit:
+            if accept(keys[position]):
+                page.append(keys[position])
+            position += 1
+        more_before = any_match(range(start - 1, -1, -1))
+        more_after = any_match(range(position, len(keys)))
+    previous_key = page[0] if page and more_before else None
+    next_key = page[-1] if page and more_after else None
+    return page, previous_key, next_key
+
+
 class AbstractRepository(abc.ABC):
     @abc.abstractmethod
     def add_user(self, user: User):
-        """ " Adds a User to the repository."""
+        """Adds a User to the repository.
+        Raises RepositoryException if a User with the same user name is already stored.
+        """
         raise NotImplementedError
 
     @abc.abstractmethod
     def get_user(self, user_name) -> User:
-        """Returns the User named user_name from the repository.
-        If there is no User given user_name, this method returns None.
+        """Returns the User named user_name from the repository, ignoring case and surrounding
+        whitespace. If there is no User given user_name, this method returns None.
         """
         raise NotImplementedError
 
+    def get_users(self, user_names: Iterable[str]) -> List[User]:
+        """Returns the Users with the given user names, in the order given, skipping names with
+        no User. Repositories that can fetch several users at once should override this.
+        """
+        users = [self.get_user(user_name) for user_name in user_names]
+        return [user for user in users if user is not None]
+
+    def update_user(self, user: User):
+        """Stores changes made to a User returned by get_user, such as a new password or
+        favourite. Repositories that hold the User objects themselves have nothing to do.
+        """
+        pass
+
     @abc.abstractmethod
     def add_book(self, book: Book):
         """Adds a given book to the repository."""
@@ -35,6 +168,27 @@ class AbstractRepository(abc.ABC):
         """Returns a book with the given ID from the repository, else returns None"""
         raise NotImplementedError
 
+    def get_books(self, book_ids: Iterable[int]) -> List[Book]:
+        """Returns the books with the given IDs, in the order given, skipping IDs with no book.
+        Repositories that can fetch several books at once should override this.
+        """
+        books = [self.get_book(book_id) for book_id in book_ids]
+        return [book for book in books if book is not None]
+
+    def rating_changed(self, book: Book, old_average_rating: float, old_ratings_count: int):
+        """Called by a stored Book after its rating changes in place (see Book.observe_rating),
+        with the rating it had before, so the repository can store the new rating and move the
+        book within its orders by rating. Repositories that keep no such orders ignore it.
+        """
+        pass
+
+    @property
+    def rating_changes(self) -> int:
+        """The number of calls made to rating_changed, so that results cached in front of the
+        repository can tell when a rating has changed under them.
+        """
+        return 0
+
     def get_number_of_books(self) -> int:
         """Returns the number of books in the repository."""
         raise NotImplementedError
@@ -65,8 +219,16 @@ class AbstractRepository(abc.ABC):
         raise NotImplementedError
 
     @abc.abstractmethod
-    def get_books_by_publisher(self, publisher: Publisher) -> List[Book]:
-        """Returns a list of all the books published by the named publisher."""
+    def get_books_by_publisher(
+        self, publisher: Publisher, start: int = 0, stop: int = None
+    ) -> List[Book]:
+        """Returns the books published by the named publisher, in book_id order.
+        start and stop select a slice of them, e.g. one page of results.
+        """
+        raise NotImplementedError
+
+    def get_number_of_books_by_publisher(self, publisher: Publisher) -> int:
+        """Returns the number of books published by the named publisher."""
         raise NotImplementedError
 
     @abc.abstractmethod
@@ -75,8 +237,18 @@ class AbstractRepository(abc.ABC):
         raise NotImplementedError
 
     @abc.abstractmethod
-    def get_book_release_year(self, year: int) -> List[Book]:
-        """Returns all books published in a given year."""
+    def get_book_release_year(self, year: int, start: int = 0, stop: int = None) -> List[Book]:
+        """Returns the books published in a given year, in book_id order; a year of None
+        returns the books whose year is unknown. start and stop select a slice of them.
+        """
+        raise NotImplementedError
+
+    def get_number_of_books_by_release_year(self, year: int) -> int:
+        """Returns the number of books published in a given year."""
+        raise NotImplementedError
+
+    def get_books_between_years(self, start_year: int = None, end_year: int = None) -> List[Book]:
+        """Returns the books published from start_year to end_year inclusive, ordered by year."""
         raise NotImplementedError
 
     @abc.abstractmethod
@@ -86,7 +258,7 @@ class AbstractRepository(abc.ABC):
 
     @abc.abstractmethod
     def get_all_release_years(self):
-        """Iterates through all books in repository, and returns a list of all the release years"""
+        """Returns the distinct known release years of the books in ascending order."""
         raise NotImplementedError
 
     @abc.abstractmethod
@@ -95,10 +267,95 @@ class AbstractRepository(abc.ABC):
         raise NotImplementedError
 
 
+    def query_books(self, query: BookQuery, start: int = 0, stop: int = None) -> BookQueryResult:
+        """Returns the books matching every filter in query, in book_id order, with facet counts
+        over all the matches. start and stop select a slice of the matching books.
+        """
+        raise NotImplementedError
+
+    def get_books_page(
+        self, query: BookQuery, after_key: int = None, limit: int = 5, reverse: bool = False,
+        order: str = None,
+    ) -> BookPage:
+        """Returns a BookPage of up to limit books matching query, in book_id order: the books
+        with a book_id greater than after_key, or with reverse=True the last books with a
+        book_id less than after_key. An after_key of None starts at the first (or last) book.
+        Only the books on the page are fetched, so any page costs about as much as the first.
+        order, if given, is one of BOOK_ORDERS; the books are then listed in that order and
+        after_key is still a book_id, that of the book to page on from.
+        """
+        raise NotImplementedError
+
+    def get_top_books(
+        self, board: str, limit: int = 10, publisher: Publisher = None, author: Author = None,
+        release_year: int = None, min_ratings: int = 0,
+    ) -> List[Book]:
+        """Returns the first limit books of one of LEADERBOARDS, among all books or, if one of
+        publisher, author or release_year is given, among that publisher's, author's or year's
+        books. min_ratings only applies to "highest_rated".
+        """
+        raise NotImplementedError
+
+    def search_books(self, query: str, start: int = 0, stop: int = None) -> Tuple[List[Book], int]:
+        """Returns the books matching a full-text query, best match first, and the number of
+        matches. Every word must match; quoted phrases must match as written. start and stop
+        select a slice of the results.
+        """
+        raise NotImplementedError
+
+    def complete_titles(self, prefix: str, limit: int = 10) -> List[Book]:
+        """Returns up to limit books with a title word starting with prefix, ignoring case and
+        accents, most rated first.
+        """
+        raise NotImplementedError
+
+    def complete_authors(self, prefix: str, limit: int = 10) -> List[Author]:
+        """Returns up to limit authors with a name word starting with prefix, ignoring case and
+        accents, ordered by the number of ratings of their books.
+        """
+        raise NotImplementedError
+
+    def complete_publishers(self, prefix: str, limit: int = 10) -> List[Publisher]:
+        """Returns up to limit publishers with a name word starting with prefix, ignoring case
+        and accents, ordered by the number of ratings of their books.
+        """
+        raise NotImplementedError
+
+    def find_authors_by_name(self, name: str) -> List[Author]:
+        """Returns every author with a name word starting with name, as complete_authors does."""
+        raise NotImplementedError
+
+    def match_authors(self, name: str, limit: int = 10) -> List[Author]:
+        """Returns up to limit authors whose names match name, ignoring case, accents,
+        punctuation and word order, followed by authors with similarly spelled names, most
+        similar first.
+        """
+        raise NotImplementedError
+
     def get_author_by_id(self, unique_id: int) -> Author:
         """Returns an author with the associated id."""
         raise NotImplementedError
 
+    def get_authors(self, unique_ids: Iterable[int]) -> List[Author]:
+        """Returns the authors with the given ids, in the order given, skipping ids with no
+        author. Repositories that can fetch several authors at once should override this.
+        """
+        authors = [self.get_author_by_id(unique_id) for unique_id in unique_ids]
+        return [author for author in authors if author is not None]
+
+    def get_data_file_offsets(self) -> Dict[str, int]:
+        """Returns the byte offset up to which each data file has been loaded, keyed by file
+        name, as last stored by set_data_file_offsets. Repositories loaded afresh at every start
+        keep no offsets and return an empty dict.
+        """
+        return dict()
+
+    def set_data_file_offsets(self, offsets: Dict[str, int]):
+        """Stores the byte offset up to which each data file has been loaded, so that a
+        repository kept between starts can resume following the files where it left off.
+        """
+        pass
+
 
     @abc.abstractmethod
     def add_review(self, review: Review):
@@ -0,0 +1,203 @@
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from library.domain.model import Book
+
+TOKEN_PATTERN = re.compile(r"\w+")
+TAG_PATTERN = re.compile(r"<[^>]+>")
+PHRASE_PATTERN = re.compile(r'"([^"]*)"')
+
+# Words too common to help rank results; leaving them out keeps their posting lists from being
+# scanned on every query.
+STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has he her his in is it its of on or she that the "
+    "their them they this to was were which who will with".split()
+)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(TAG_PATTERN.sub(" ", text).casefold())
+
+
+def book_fields(book: Book) -> List[List[str]]:
+    # The searchable text of a book, one token list per field.
+    return [
+        tokenize(book.title),
+        tokenize(book.description),
+        tokenize(" ".join(author.full_name for author in book.authors)),
+    ]
+
+
+def contains_phrase(fields: List[List[str]], phrase: List[str]) -> bool:
+    # Phrases only match within a field, never across the end of one and the start of the next.
+    length = len(phrase)
+    for tokens in fields:
+        for position in range(len(tokens) - length + 1):
+            if tokens[position:position + length] == phrase:
+                return True
+    return False
+
+
+def parse_query(query: str) -> Tuple[List[str], List[List[str]]]:
+    # Returns the distinct terms to look up and the phrases to check.
+    phrases = [tokenize(phrase) for phrase in PHRASE_PATTERN.findall(query)]
+    phrases = [phrase for phrase in phrases if len(phrase) > 1]
+    terms = []
+    for token in tokenize(query):
+        if token not in STOP_WORDS and token not in terms:
+            terms.append(token)
+    return terms, phrases
+
+
+def bigram(first: str, second: str) -> str:
+    # Tokens never contain spaces, so word pairs cannot collide with single words.
+    return first + " " + second
+
+
+def indexed_bigrams(tokens: List[str]) -> List[str]:
+    # Adjacent word pairs without a stop word; pairs such as "the war" would have posting lists
+    # nearly as long as the other word's, at the cost of many more entries.
+    return [
+        bigram(first, second)
+        for first, second in zip(tokens, tokens[1:])
+        if first not in STOP_WORDS and second not in STOP_WORDS
+    ]
+
+
+class SearchIndex:
+    # Inverted index over book titles, descriptions and author names, ranked with BM25.
+    #
+    # Every word of a query must appear in a result, and quoted phrases must appear as written.
+    # Terms are looked up rarest first, so a query costs time in proportion to the books that
+    # contain its rarest term. Adjacent word pairs without stop words are indexed too, so a
+    # phrase only has to be checked against the text of books that contain all of its indexed
+    # pairs, and a phrase of two words that are not stop words not at all. Ranked results of
+    # recent queries are cached until the next book is added, so paging through results does
+    # not rank them again; the cache is shared between threads and guarded by a lock.
+
+    K1 = 1.2
+    B = 0.75
+    CACHE_SIZE = 128
+
+    def __init__(self):
+        self.__postings: Dict[str, Dict[int, int]] = dict()
+        self.__lengths: Dict[int, int] = dict()
+        self.__total_length = 0
+        self.__cache = OrderedDict()
+        self.__cache_lock = threading.Lock()
+        self.__version = 0
+
+    def __len__(self):
+        return len(self.__lengths)
+
+    def __getstate__(self):
+        # Locks cannot be pickled (e.g. into a snapshot); a fresh one is made on unpickling.
+        state = self.__dict__.copy()
+        del state["_SearchIndex__cache_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__cache_lock = threading.Lock()
+
+    def add(self, book: Book):
+        # Books are indexed once; re-adding a book_id leaves its first entry in place.
+        if book.book_id in self.__lengths:
+            return
+        length = 0
+        frequencies = Counter()
+        for tokens in book_fields(book):
+            length += len(tokens)
+            frequencies.update(tokens)
+            frequencies.update(indexed_bigrams(tokens))
+        for term, frequency in frequencies.items():
+            if term in STOP_WORDS:
+                continue
+            postings = self.__postings.get(term)
+            if postings is None:
+                postings = self.__postings[term] = dict()
+            postings[book.book_id] = frequency
+        self.__lengths[book.book_id] = length
+        self.__total_length += length
+        with self.__cache_lock:
+            self.__version += 1
+            self.__cache.clear()
+
+    def search(
+        self, query: str, get_book, start: int = 0, stop: int = None
+    ) -> Tuple[List[Tuple[int, float]], int]:
+        # Returns (book_id, score) pairs for the requested slice of the results, best first,
+        # and the total number of results. get_book is used to check phrases.
+        with self.__cache_lock:
+            version = self.__version
+            ranked = self.__cache.get(query)
+            if ranked is not None:
+                self.__cache.move_to_end(query)
+                return ranked[start:stop], len(ranked)
+        # Ranking runs outside the lock; results ranked while a book was added are not cached.
+        ranked = self.__rank(query, get_book)
+        with self.__cache_lock:
+            if version == self.__version:
+                self.__cache[query] = ranked
+                self.__cache.move_to_end(query)
+                while len(self.__cache) > self.CACHE_SIZE:
+                    self.__cache.popitem(last=False)
+        return ranked[start:stop], len(ranked)
+
+    def __rank(self, query: str, get_book) -> List[Tuple[int, float]]:
+        terms, phrases = parse_query(query)
+        if not terms:
+            return []
+        postings = [self.__postings.get(term) for term in terms]
+        # Word pairs narrow the candidates for phrases but do not count towards the score.
+        filters = [
+            self.__postings.get(pair) for phrase in phrases for pair in indexed_bigrams(phrase)
+        ]
+        if any(posting is None for posting in postings + filters):
+            return []
+        postings.sort(key=len)
+        filters.sort(key=len)
+        smallest = min(postings[0], filters[0], key=len) if filters else postings[0]
+
+        candidates = [
+            book_id
+            for book_id in smallest
+            if all(book_id in posting for posting in filters)
+            and all(book_id in posting for posting in postings)
+        ]
+        # Only a phrase of two words, neither a stop word, is fully checked by its word pair.
+        unchecked_phrases = [
+            phrase for phrase in phrases if len(phrase) > 2 or not indexed_bigrams(phrase)
+        ]
+        if unchecked_phrases:
+            candidates = [
+                book_id
+                for book_id in candidates
+                if all(
+                    contains_phrase(book_fields(get_book(book_id)), phrase)
+                    for phrase in unchecked_phrases
+                )
+            ]
+
+        num_books = len(self.__lengths)
+        average_length = self.__total_length / num_books
+        idfs = [
+            math.log(1 + (num_books - len(posting) + 0.5) / (len(posting) + 0.5))
+            for posting in postings
+        ]
+
+        def score(book_id: int) -> float:
+            norm = self.K1 * (1 - self.B + self.B * self.__lengths[book_id] / average_length)
+            total = 0.0
+            for idf, posting in zip(idfs, postings):
+                frequency = posting[book_id]
+                total += idf * frequency * (self.K1 + 1) / (frequency + norm)
+            return total
+
+        ranked = sorted(((score(book_id), -book_id) for book_id in candidates), reverse=True)
+        return [(-negative_id, value) for value, negative_id in ranked]
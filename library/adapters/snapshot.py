@@ -0,0 +1,138 @@
+import hashlib
+import os
+import pickle
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from library.adapters.datafiles import data_file_sizes, find_data_file
+from library.adapters.memory_repository import MemoryRepository, populate
+from library.adapters.profiling import StartupProfiler, profile_stage
+from library.authentication.passwords import LAZY_HASHING, hash_pending_passwords
+
+# Bump when the pickled repository layout changes so that old snapshots are rebuilt.
+SNAPSHOT_VERSION = 15
+
+SOURCE_FILE_NAMES = [
+    "comic_books_excerpt.json",
+    "book_authors_excerpt.json",
+    "users.csv",
+    "reviews.csv",
+]
+
+
+def file_fingerprint(filename: Path, size: int = None) -> Tuple[str, int, int, str]:
+    # With a size, only the first `size` bytes are hashed, matching what populate() reads.
+    stat = os.stat(filename)
+    if size is None:
+        size = stat.st_size
+    digest = hashlib.sha256()
+    with open(filename, "rb") as infile:
+        remaining = size
+        for block in iter(lambda: infile.read(min(1 << 20, remaining)), b""):
+            digest.update(block)
+            remaining -= len(block)
+    return Path(filename).name, size, stat.st_mtime_ns, digest.hexdigest()
+
+
+def source_fingerprint(
+    data_path: Path, sizes: Optional[Dict[str, int]] = None
+) -> List[Tuple[str, int, int, str]]:
+    # Size, modification time and content hash of every file populate() reads.
+    sizes = dict() if sizes is None else sizes
+    return [
+        file_fingerprint(find_data_file(data_path, name), sizes.get(name))
+        for name in SOURCE_FILE_NAMES
+    ]
+
+
+def snapshot_options(columnar: bool, lazy_descriptions: bool, password_hashing: str) -> dict:
+    # Ingest options that change what the snapshot holds; a snapshot only matches the same ones.
+    return {
+        "columnar": columnar,
+        "lazy_descriptions": lazy_descriptions,
+        "password_hashing": password_hashing,
+    }
+
+
+def read_snapshot(
+    snapshot_path: Path,
+    fingerprint,
+    columnar: bool = False,
+    lazy_descriptions: bool = False,
+    password_hashing: str = LAZY_HASHING,
+) -> Optional[MemoryRepository]:
+    # Snapshots are pickles, so only ever point snapshot_path at a file this app wrote.
+    try:
+        with open(snapshot_path, "rb") as infile:
+            snapshot = pickle.load(infile)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+
+    if (
+        not isinstance(snapshot, dict)
+        or snapshot.get("version") != SNAPSHOT_VERSION
+        or snapshot.get("fingerprint") != fingerprint
+        or snapshot.get("options")
+        != snapshot_options(columnar, lazy_descriptions, password_hashing)
+    ):
+        return None
+    return snapshot["repository"]
+
+
+def write_snapshot(
+    snapshot_path: Path,
+    repo: MemoryRepository,
+    fingerprint,
+    lazy_descriptions: bool = False,
+    password_hashing: str = LAZY_HASHING,
+    workers: int = 1,
+):
+    # Passwords left unhashed by lazy hashing are hashed in `workers` processes first, so the
+    # snapshot file never holds a plaintext password.
+    hash_pending_passwords(repo.get_all_users(), workers)
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "fingerprint": fingerprint,
+        "options": snapshot_options(repo.columnar, lazy_descriptions, password_hashing),
+        "repository": repo,
+    }
+    snapshot_path = Path(snapshot_path)
+    snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Write next to the target and rename, so concurrent workers never read a partial file.
+    temporary_path = snapshot_path.with_name(f"{snapshot_path.name}.{os.getpid()}.tmp")
+    with open(temporary_path, "wb") as outfile:
+        pickle.dump(snapshot, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, snapshot_path)
+
+
+def populate_from_snapshot(
+    data_path: Path,
+    snapshot_path: Path,
+    workers: int = 1,
+    columnar: bool = False,
+    lazy_descriptions: bool = False,
+    password_hashing: str = LAZY_HASHING,
+    profiler: Optional[StartupProfiler] = None,
+    sizes: Optional[Dict[str, int]] = None,
+) -> MemoryRepository:
+    # Load the repository from snapshot_path when it was built from the current data files with
+    # the same options, otherwise populate a new repository and write a fresh snapshot. Both
+    # cover the data files up to the given sizes, taken now when none are given.
+    if sizes is None:
+        sizes = data_file_sizes(data_path, SOURCE_FILE_NAMES)
+    with profile_stage(profiler, "read_snapshot") as stage:
+        fingerprint = source_fingerprint(data_path, sizes)
+        repo = read_snapshot(
+            snapshot_path, fingerprint, columnar, lazy_descriptions, password_hashing
+        )
+        stage.records = 0 if repo is None else repo.get_number_of_book()
+    if repo is None:
+        repo = MemoryRepository(columnar)
+        populate(data_path, repo, workers, lazy_descriptions, password_hashing, profiler, sizes)
+        with profile_stage(profiler, "write_snapshot") as stage:
+            write_snapshot(
+                snapshot_path, repo, fingerprint, lazy_descriptions, password_hashing, workers
+            )
+            stage.records = repo.get_number_of_book()
+    return repo
@@ -0,0 +1,967 @@
+import sqlite3
+import threading
+import weakref
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from library.adapters.indexes import canonical_name, name_trigrams, normalize_name
+from library.adapters.memory_repository import normalize_user_name
+from library.adapters.repository import (
+    AbstractRepository,
+    BOOK_ORDERS,
+    BookPage,
+    BookQuery,
+    BookQueryResult,
+    LEADERBOARDS,
+    RepositoryException,
+)
+from library.adapters.search import parse_query, tokenize
+from library.authentication.passwords import hash_pending_passwords
+from library.domain.model import User, Book, Review, Publisher, Author
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    book_id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT,
+    publisher TEXT,
+    release_year INTEGER,
+    ebook INTEGER,
+    num_pages INTEGER,
+    average_rating REAL,
+    ratings_count INTEGER,
+    hyperlink TEXT,
+    image_hyperlink TEXT
+);
+CREATE INDEX IF NOT EXISTS books_by_publisher ON books (publisher, book_id);
+CREATE INDEX IF NOT EXISTS books_by_release_year ON books (release_year, book_id);
+CREATE INDEX IF NOT EXISTS books_by_ebook ON books (ebook, book_id);
+CREATE INDEX IF NOT EXISTS books_by_num_pages ON books (num_pages);
+CREATE INDEX IF NOT EXISTS books_by_average_rating ON books (average_rating);
+CREATE INDEX IF NOT EXISTS books_by_ratings_count ON books (ratings_count);
+CREATE INDEX IF NOT EXISTS books_by_title ON books (title);
+
+CREATE TABLE IF NOT EXISTS authors (
+    author_id INTEGER PRIMARY KEY,
+    full_name TEXT NOT NULL,
+    canonical_name TEXT NOT NULL,
+    num_trigrams INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS authors_by_canonical_name ON authors (canonical_name);
+CREATE TABLE IF NOT EXISTS author_trigrams (
+    trigram TEXT,
+    author_id INTEGER,
+    PRIMARY KEY (trigram, author_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS book_authors (
+    book_id INTEGER,
+    position INTEGER,
+    author_id INTEGER NOT NULL,
+    PRIMARY KEY (book_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS book_authors_by_author ON book_authors (author_id, book_id);
+
+CREATE TABLE IF NOT EXISTS publishers (name TEXT PRIMARY KEY) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS users (user_name TEXT PRIMARY KEY, password TEXT) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS favourites (
+    user_name TEXT,
+    position INTEGER,
+    book_id INTEGER NOT NULL,
+    PRIMARY KEY (user_name, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS reviews (
+    review_id INTEGER PRIMARY KEY,
+    book_id INTEGER NOT NULL,
+    user_name TEXT NOT NULL,
+    review_text TEXT,
+    timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS reviews_by_book ON reviews (book_id, review_id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS books_text USING fts5 (
+    title, description, authors, tokenize = 'unicode61 remove_diacritics 0'
+);
+
+CREATE TABLE IF NOT EXISTS completion_names (
+    kind TEXT,
+    item,
+    name TEXT NOT NULL,
+    weight INTEGER NOT NULL,
+    PRIMARY KEY (kind, item)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS completion_words (
+    kind TEXT,
+    suffix TEXT,
+    item,
+    PRIMARY KEY (kind, suffix, item)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS data_file_offsets (
+    file_name TEXT PRIMARY KEY,
+    byte_offset INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+BOOK_COLUMNS = (
+    "book_id, title, description, publisher, release_year, ebook, num_pages, average_rating, "
+    "ratings_count, hyperlink, image_hyperlink"
+)
+INSERT_BOOK = "INSERT OR IGNORE INTO books (%s) VALUES (%s)" % (
+    BOOK_COLUMNS, ", ".join("?" * len(BOOK_COLUMNS.split(",")))
+)
+INSERT_AUTHOR = (
+    "INSERT OR IGNORE INTO authors (author_id, full_name, canonical_name, num_trigrams) "
+    "VALUES (?, ?, ?, ?)"
+)
+INSERT_COMPLETION_NAME = (
+    "INSERT INTO completion_names (kind, item, name, weight) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (kind, item) DO UPDATE SET weight = weight + excluded.weight"
+)
+INSERT_COMPLETION_WORD = (
+    "INSERT OR IGNORE INTO completion_words (kind, suffix, item) VALUES (?, ?, ?)"
+)
+COMPLETE = (
+    "SELECT n.item FROM completion_words w "
+    "JOIN completion_names n ON n.kind = w.kind AND n.item = w.item "
+    "WHERE w.kind = ? AND w.suffix >= ? AND w.suffix < ? "
+    "GROUP BY n.item ORDER BY n.weight DESC, n.name LIMIT ?"
+)
+
+TITLE, AUTHOR, PUBLISHER = "title", "author", "publisher"
+
+# Ids per "IN (...)" clause, well below SQLite's limit on bound parameters.
+CHUNK_SIZE = 500
+
+SIMILARITY_THRESHOLD = 0.4
+
+
+def chunks(values: List, size: int = CHUNK_SIZE) -> Iterable[List]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def placeholders(values) -> str:
+    return ", ".join("?" * len(values))
+
+
+def row_limit(start: int, stop: Optional[int]) -> Tuple[int, int]:
+    # LIMIT and OFFSET for the slice [start:stop]; a LIMIT of -1 means no limit.
+    return (-1 if stop is None else max(0, stop - start)), start
+
+
+def completion_words(name: str) -> List[str]:
+    # Each word of the normalized name with the rest of the name after it, as in PrefixIndex.
+    words = normalize_name(name).split()
+    return [" ".join(words[position:]) for position in range(len(words))]
+
+
+class SqliteRepository(AbstractRepository):
+    # Keeps the catalogue in an SQLite database file, so it survives restarts and need not fit
+    # in memory. Each thread gets its own connection; writes are serialized by a lock and run
+    # in transactions, and every statement is a constant parameterized string, which sqlite3
+    # compiles once per connection and then reuses.
+    #
+    # Books and users are rebuilt as domain objects when read. Objects still in use elsewhere
+    # are handed out again rather than rebuilt, so a Book or User read twice is the same
+    # object, as with MemoryRepository; the identity lock makes sure two threads reading the
+    # same row end up with the same object. Changes made to a User afterwards are stored by
+    # update_user. Passwords whose hashing was deferred are hashed before they are stored.
+
+    def __init__(self, database_path: Union[str, Path]):
+        self.__database_path = str(database_path)
+        self.__local = threading.local()
+        self.__write_lock = threading.Lock()
+        self.__identity_lock = threading.Lock()
+        self.__books = weakref.WeakValueDictionary()
+        self.__users = weakref.WeakValueDictionary()
+        self.__rating_changes = 0
+        with self.__write_lock:
+            self.__connection().executescript(SCHEMA)
+
+    def __getstate__(self):
+        # Connections and locks cannot be pickled; an unpickled copy reopens the same file.
+        return self.__database_path
+
+    def __setstate__(self, state):
+        self.__init__(state)
+
+    def __connection(self) -> sqlite3.Connection:
+        connection = getattr(self.__local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.__database_path, timeout=30)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            self.__local.connection = connection
+        return connection
+
+    def __query(self, sql: str, parameters=()) -> List[tuple]:
+        return self.__connection().execute(sql, parameters).fetchall()
+
+    def __scalars(self, sql: str, parameters=()) -> list:
+        return [row[0] for row in self.__query(sql, parameters)]
+
+    # ------------------------------------------------------------------
+    # Users
+    # ------------------------------------------------------------------
+
+    def add_user(self, user: User):
+        key = normalize_user_name(user.user_name)
+        if key is None:
+            raise RepositoryException("User has no user name")
+        hash_pending_passwords([user])
+        connection = self.__connection()
+        with self.__write_lock, connection:
+            try:
+                connection.execute(
+                    "INSERT INTO users (user_name, password) VALUES (?, ?)", (key, user.password)
+                )
+            except sqlite3.IntegrityError:
+                raise RepositoryException("User name already taken")
+            self.__write_favourites(connection, key, user)
+        with self.__identity_lock:
+            self.__users[key] = user
+
+    def get_user(self, user_name) -> User:
+        users = self.get_users([user_name])
+        return users[0] if users else None
+
+    def get_users(self, user_names: Iterable[str]) -> List[User]:
+        # Users not yet handed out are read with their favourites in two queries per chunk of
+        # names, and the favourite books of all of them with one get_books call.
+        keys = [normalize_user_name(user_name) for user_name in user_names]
+        with self.__identity_lock:
+            found = {key: self.__users.get(key) for key in keys if key is not None}
+        missing = [key for key, user in found.items() if user is None]
+        loaded = dict()
+        favourite_ids = dict()
+        for names in chunks(missing):
+            for key, password in self.__query(
+                "SELECT user_name, password FROM users WHERE user_name IN (%s)"
+                % placeholders(names),
+                names,
+            ):
+                loaded[key] = User(key, password)
+                favourite_ids[key] = []
+            for key, book_id in self.__query(
+                "SELECT user_name, book_id FROM favourites WHERE user_name IN (%s) "
+                "ORDER BY user_name, position" % placeholders(names),
+                names,
+            ):
+                favourite_ids[key].append(book_id)
+        books = {
+            book.book_id: book
+            for book in self.get_books(
+                set(book_id for book_ids in favourite_ids.values() for book_id in book_ids)
+            )
+        }
+        for key, user in loaded.items():
+            for book_id in favourite_ids[key]:
+                if book_id in books:
+                    user.add_to_favourites(books[book_id])
+        with self.__identity_lock:
+            for key, user in loaded.items():
+                found[key] = self.__users.setdefault(key, user)
+        return [found[key] for key in keys if key is not None and found[key] is not None]
+
+    def update_user(self, user: User):
+        key = normalize_user_name(user.user_name)
+        hash_pending_passwords([user])
+        connection = self.__connection()
+        with self.__write_lock, connection:
+            connection.execute(
+                "UPDATE users SET password = ? WHERE user_name = ?", (user.password, key)
+            )
+            connection.execute("DELETE FROM favourites WHERE user_name = ?", (key,))
+            self.__write_favourites(connection, key, user)
+
+    @staticmethod
+    def __write_favourites(connection: sqlite3.Connection, key: str, user: User):
+        connection.executemany(
+            "INSERT INTO favourites (user_name, position, book_id) VALUES (?, ?, ?)",
+            [(key, position, book.book_id) for position, book in enumerate(user.favourites)],
+        )
+
+    def __reviewers(self, user_names: Iterable[str]) -> Dict[str, User]:
+        # Users attached to reviews. Users already handed out by get_user are reused; the
+        # others are built without their favourites, which reviews do not need.
+        reviewers = dict()
+        missing = list()
+        with self.__identity_lock:
+            for user_name in set(user_names):
+                user = self.__users.get(user_name)
+                if user is None:
+                    missing.append(user_name)
+                else:
+                    reviewers[user_name] = user
+        for names in chunks(missing):
+            for user_name, password in self.__query(
+                "SELECT user_name, password FROM users WHERE user_name IN (%s)"
+                % placeholders(names),
+                names,
+            ):
+                reviewers[user_name] = User(user_name, password)
+        return reviewers
+
+    # ------------------------------------------------------------------
+    # Books
+    # ------------------------------------------------------------------
+
+    def add_book(self, book: Book):
+        self.load_books([book])
+        with self.__identity_lock:
+            stored = self.__books.setdefault(book.book_id, book)
+        if stored is book:
+            book.observe_rating(self)
+
+    def load_books(self, list_of_books):
+        # Bulk load in one transaction. A book whose id is already stored is skipped.
+        connection = self.__connection()
+        with self.__write_lock, connection:
+            cursor = connection.cursor()
+            new_books = list()
+            for book in list_of_books:
+                cursor.execute(INSERT_BOOK, self.__book_row(book))
+                if cursor.rowcount == 1:
+                    new_books.append(book)
+            cursor.executemany(
+                "INSERT INTO book_authors (book_id, position, author_id) VALUES (?, ?, ?)",
+                [
+                    (book.book_id, position, author.unique_id)
+                    for book in new_books
+                    for position, author in enumerate(book.authors)
+                ],
+            )
+            authors = {author.unique_id: author for book in new_books for author in book.authors}
+            self.__insert_authors(cursor, authors.values())
+            cursor.executemany(
+                "INSERT INTO books_text (rowid, title, description, authors) VALUES (?, ?, ?, ?)",
+                [
+                    (
+                        book.book_id,
+                        " ".join(tokenize(book.title)),
+                        " ".join(tokenize(book.description)),
+                        " ".join(tokenize(" ".join(author.full_name for author in book.authors))),
+                    )
+                    for book in new_books
+                ],
+            )
+            self.__insert_completions(cursor, self.__completions_of(new_books))
+
+    @staticmethod
+    def __book_row(book: Book) -> tuple:
+        return (
+            book.book_id,
+            book.title,
+            book.description,
+            None if book.publisher is None else book.publisher.name,
+            book.release_year,
+            None if book.ebook is None else int(book.ebook),
+            book.num_pages,
+            book.average_rating,
+            book.ratings_count,
+            book.hyperlink,
+            book.image_hyperlink,
+        )
+
+    @staticmethod
+    def __completions_of(books: List[Book]) -> Iterable[Tuple[str, object, str, int]]:
+        # (kind, item, name, weight) rows: each title, author and publisher of the books,
+        # weighted by the books' ratings counts.
+        for book in books:
+            weight = book.ratings_count or 0
+            yield TITLE, book.book_id, book.title, weight
+            for author in book.authors:
+                yield AUTHOR, author.unique_id, author.full_name, weight
+            if book.publisher is not None and book.publisher.name != "N/A":
+                yield PUBLISHER, book.publisher.name, book.publisher.name, weight
+
+    @staticmethod
+    def __insert_completions(cursor: sqlite3.Cursor, completions):
+        completions = list(completions)
+        cursor.executemany(INSERT_COMPLETION_NAME, completions)
+        names = {(kind, item): name for kind, item, name, _ in completions}
+        cursor.executemany(
+            INSERT_COMPLETION_WORD,
+            [
+                (kind, suffix, item)
+                for (kind, item), name in names.items()
+                for suffix in completion_words(name)
+            ],
+        )
+
+    def __insert_authors(self, cursor: sqlite3.Cursor, authors: Iterable[Author]):
+        new_authors = list()
+        for author in authors:
+            canonical = canonical_name(author.full_name)
+            trigrams = name_trigrams(canonical)
+            cursor.execute(
+                INSERT_AUTHOR, (author.unique_id, author.full_name, canonical, len(trigrams))
+            )
+            if cursor.rowcount == 1:
+                new_authors.append((author, trigrams))
+        cursor.executemany(
+            "INSERT OR IGNORE INTO author_trigrams (trigram, author_id) VALUES (?, ?)",
+            [
+                (trigram, author.unique_id)
+                for author, trigrams in new_authors
+                for trigram in trigrams
+            ],
+        )
+
+    def get_book(self, book_id: int) -> Book:
+        books = self.get_books([book_id])
+        return books[0] if books else None
+
+    def get_books(self, book_ids: Iterable[int]) -> List[Book]:
+        # The stored books among book_ids, in the order given.
+        book_ids = list(book_ids)
+        with self.__identity_lock:
+            found = {book_id: self.__books.get(book_id) for book_id in book_ids}
+        missing = [book_id for book_id, book in found.items() if book is None]
+        rows = []
+        for ids in chunks(missing):
+            rows += self.__query(
+                "SELECT %s FROM books WHERE book_id IN (%s)" % (BOOK_COLUMNS, placeholders(ids)),
+                ids,
+            )
+        for book in self.__make_books(rows):
+            found[book.book_id] = book
+        return [found[book_id] for book_id in book_ids if found[book_id] is not None]
+
+    def __select_books(self, where: str = "", parameters=(), order: str = "book_id") -> List[Book]:
+        return self.__make_books(
+            self.__query(
+                "SELECT %s FROM books %s ORDER BY %s" % (BOOK_COLUMNS, where, order), parameters
+            )
+        )
+
+    def __make_books(self, rows: List[tuple]) -> List[Book]:
+        # Builds Books from rows of BOOK_COLUMNS, with their authors and reviews, reusing the
+        # Books still in use elsewhere.
+        books = list()
+        new_books = dict()
+        with self.__identity_lock:
+            stored = [self.__books.get(row[0]) for row in rows]
+        for row, book in zip(rows, stored):
+            if book is None:
+                book = new_books.get(row[0]) or self.__make_book(row)
+                new_books[book.book_id] = book
+            books.append(book)
+
+        ids = list(new_books)
+        authors = dict()
+        for chunk in chunks(ids):
+            for book_id, author_id, full_name in self.__query(
+                "SELECT ba.book_id, a.author_id, a.full_name FROM book_authors ba "
+                "JOIN authors a ON a.author_id = ba.author_id "
+                "WHERE ba.book_id IN (%s) ORDER BY ba.book_id, ba.position" % placeholders(chunk),
+                chunk,
+            ):
+                author = authors.get(author_id)
+                if author is None:
+                    author = authors[author_id] = Author(author_id, full_name)
+                new_books[book_id].add_author(author)
+
+        review_rows = list()
+        for chunk in chunks(ids):
+            review_rows += self.__query(
+                "SELECT book_id, user_name, review_text, timestamp FROM reviews "
+                "WHERE book_id IN (%s) ORDER BY review_id" % placeholders(chunk),
+                chunk,
+            )
+        reviewers = self.__reviewers(row[1] for row in review_rows)
+        for book_id, user_name, review_text, timestamp in review_rows:
+            book = new_books[book_id]
+            timestamp = None if timestamp is None else datetime.fromisoformat(timestamp)
+            book.add_review(Review(review_text, reviewers.get(user_name), book, timestamp))
+
+        # Another thread may have built some of the same books meanwhile; the first stored wins.
+        observed = list()
+        with self.__identity_lock:
+            for book_id, book in new_books.items():
+                stored_book = self.__books.get(book_id)
+                if stored_book is None:
+                    self.__books[book_id] = book
+                    observed.append(book)
+                else:
+                    new_books[book_id] = stored_book
+        for book in observed:
+            book.observe_rating(self)
+        return [new_books.get(book.book_id, book) for book in books]
+
+    @staticmethod
+    def __make_book(row: tuple) -> Book:
+        (
+            book_id, title, description, publisher, release_year, ebook, num_pages,
+            average_rating, ratings_count, hyperlink, image_hyperlink,
+        ) = row
+        book = Book(book_id, title)
+        book.description = description
+        if publisher is not None:
+            book.publisher = Publisher(publisher)
+        if release_year is not None:
+            book.release_year = release_year
+        if ebook is not None:
+            book.ebook = bool(ebook)
+        if num_pages is not None:
+            book.num_pages = num_pages
+        if hyperlink is not None:
+            book.hyperlink = hyperlink
+        if image_hyperlink is not None:
+            book.image_hyperlink = image_hyperlink
+        if average_rating is not None and ratings_count is not None:
+            book.initiliase_rating_and_count(float(average_rating), ratings_count)
+        return book
+
+    def rating_changed(self, book: Book, old_average_rating: float, old_ratings_count: int):
+        # Books handed out by the repository report changes to their rating, which are written
+        # straight back.
+        connection = self.__connection()
+        with self.__write_lock, connection:
+            connection.execute(
+                "UPDATE books SET average_rating = ?, ratings_count = ? WHERE book_id = ?",
+                (book.average_rating, book.ratings_count, book.book_id),
+            )
+            self.__rating_changes += 1
+
+    @property
+    def rating_changes(self) -> int:
+        return self.__rating_changes
+
+    def get_number_of_books(self) -> int:
+        return self.__scalars("SELECT COUNT(*) FROM books")[0]
+
+    def get_number_of_book(self) -> int:
+        # Name used by MemoryRepository.
+        return self.get_number_of_books()
+
+    def get_books_random(self, num_books=5):
+        num_books = min(num_books, 100)
+        return self.__make_books(
+            self.__query(
+                "SELECT %s FROM books ORDER BY random() LIMIT ?" % BOOK_COLUMNS, (num_books,)
+            )
+        )
+
+    def get_all_books(self):
+        return self.__select_books()
+
+    # ------------------------------------------------------------------
+    # Publishers
+    # ------------------------------------------------------------------
+
+    def get_publishers(self):
+        names = self.__scalars("SELECT name FROM publishers ORDER BY name")
+        return [Publisher(name) for name in names]
+
+    def add_publishers(self, set_of_publishers: set):
+        connection = self.__connection()
+        with self.__write_lock, connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO publishers (name) VALUES (?)",
+                [(publisher.name,) for publisher in set_of_publishers if publisher is not None],
+            )
+
+    def get_publisher_by_name(self, name: str) -> Publisher:
+        if name == "N/A":
+            return None
+        names = self.__scalars("SELECT name FROM publishers WHERE name = ?", (name,))
+        return Publisher(names[0]) if names else None
+
+    def get_books_by_publisher(
+        self, the_publisher: Publisher, start: int = 0, stop: int = None
+    ) -> List[Book]:
+        if the_publisher is None:
+            the_publisher = Publisher("N/A")
+        return self.__select_books(
+            "WHERE publisher = ?",
+            (the_publisher.name, *row_limit(start, stop)),
+            "book_id LIMIT ? OFFSET ?",
+        )
+
+    def get_number_of_books_by_publisher(self, the_publisher: Publisher) -> int:
+        if the_publisher is None:
+            the_publisher = Publisher("N/A")
+        return self.__scalars(
+            "SELECT COUNT(*) FROM books WHERE publisher = ?", (the_publisher.name,)
+        )[0]
+
+    # ------------------------------------------------------------------
+    # Release years
+    # ------------------------------------------------------------------
+
+    def get_book_release_year(self, year: int, start: int = 0, stop: int = None) -> List[Book]:
+        return self.__select_books(
+            "WHERE release_year IS ?", (year, *row_limit(start, stop)), "book_id LIMIT ? OFFSET ?"
+        )
+
+    def get_number_of_books_by_release_year(self, year: int) -> int:
+        return self.__scalars("SELECT COUNT(*) FROM books WHERE release_year IS ?", (year,))[0]
+
+    def get_books_between_years(self, start_year: int = None, end_year: int = None) -> List[Book]:
+        conditions = ["release_year IS NOT NULL"]
+        parameters = list()
+        if start_year is not None:
+            conditions.append("release_year >= ?")
+            parameters.append(start_year)
+        if end_year is not None:
+            conditions.append("release_year <= ?")
+            parameters.append(end_year)
+        return self.__select_books(
+            "WHERE " + " AND ".join(conditions), parameters, "release_year, book_id"
+        )
+
+    def get_all_release_years(self) -> List[int]:
+        return self.__scalars(
+            "SELECT DISTINCT release_year FROM books WHERE release_year IS NOT NULL "
+            "ORDER BY release_year"
+        )
+
+    # ------------------------------------------------------------------
+    # Authors
+    # ------------------------------------------------------------------
+
+    def load_authors(self):
+        # Authors are stored with their books, so there is nothing to rebuild.
+        pass
+
+    def add_authors(self, authors):
+        authors = list(authors)
+        connection = self.__connection()
+        with self.__write_lock, connection:
+            cursor = connection.cursor()
+            self.__insert_authors(cursor, authors)
+            self.__insert_completions(
+                cursor, [(AUTHOR, author.unique_id, author.full_name, 0) for author in authors]
+            )
+
+    def get_all_authors(self) -> List[Author]:
+        return [
+            Author(author_id, full_name)
+            for author_id, full_name in self.__query(
+                "SELECT author_id, full_name FROM authors ORDER BY author_id"
+            )
+        ]
+
+    def get_author_by_id(self, unique_id: int) -> Author:
+        authors = self.get_authors([unique_id])
+        return authors[0] if authors else None
+
+    def get_authors(self, unique_ids: Iterable[int]) -> List[Author]:
+        # The stored authors among unique_ids, in the order given.
+        unique_ids = list(unique_ids)
+        authors = dict()
+        for chunk in chunks(unique_ids):
+            for author_id, full_name in self.__query(
+                "SELECT author_id, full_name FROM authors WHERE author_id IN (%s)"
+                % placeholders(chunk),
+                chunk,
+            ):
+                authors[author_id] = Author(author_id, full_name)
+        return [authors[unique_id] for unique_id in unique_ids if unique_id in authors]
+
+    def get_books_by_author(self, author: Author) -> List[Book]:
+        if not self.__scalars("SELECT 1 FROM authors WHERE author_id = ?", (author.unique_id,)):
+            return None
+        return self.__select_books(
+            "WHERE book_id IN (SELECT book_id FROM book_authors WHERE author_id = ?)",
+            (author.unique_id,),
+        )
+
+    # ------------------------------------------------------------------
+    # Queries, search and completion
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def __where(query: BookQuery) -> Tuple[List[str], list]:
+        conditions = list()
+        parameters = list()
+        if query.publisher is not None:
+            conditions.append("publisher = ?")
+            parameters.append(query.publisher.name)
+        if query.author is not None:
+            conditions.append("book_id IN (SELECT book_id FROM book_authors WHERE author_id = ?)")
+            parameters.append(query.author.unique_id)
+        if query.ebook is not None:
+            conditions.append("ebook = ?")
+            parameters.append(int(query.ebook))
+        if query.unknown_year:
+            conditions.append("release_year IS NULL")
+        for column, low, high in (
+            ("release_year", query.start_year, query.end_year),
+            ("num_pages", query.min_pages, query.max_pages),
+            ("average_rating", query.min_rating, None),
+        ):
+            if low is not None:
+                conditions.append("%s >= ?" % column)
+                parameters.append(low)
+            if high is not None:
+                conditions.append("%s <= ?" % column)
+                parameters.append(high)
+        return conditions, parameters
+
+    def get_books_page(
+        self, query: BookQuery, after_key: int = None, limit: int = 5, reverse: bool = False,
+        order: str = None,
+    ) -> BookPage:
+        # Seeks with book_id > ? (or < ?) instead of an OFFSET, so SQLite starts reading at the
+        # page rather than stepping over every book before it. One extra row tells whether there
+        # is another page in the direction of travel; the other direction is an EXISTS check.
+        # Other orders seek on (column, book_id) the same way, through the column's index.
+        conditions, parameters = self.__where(query)
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        total = self.__scalars("SELECT COUNT(*) FROM books %s" % where, parameters)[0]
+        column, descending = ("book_id", False) if order is None else BOOK_ORDERS[order]
+
+        def seek(after: Optional[tuple], backwards: bool, count: int) -> List[tuple]:
+            # Up to count (value, book_id) rows next to after in ascending order: those following
+            # it, or with backwards=True those preceding it, nearest first. NULLs sort first, and
+            # the rows with and without a value are read as two runs so that each is a seek.
+            comparison, direction = ("<", "DESC") if backwards else (">", "ASC")
+            values = ["%s IS NOT NULL" % column], []
+            nulls = ["%s IS NULL" % column], []
+            if after is not None:
+                value, book_id = after
+                if value is None:
+                    nulls[0].append("book_id %s ?" % comparison)
+                    nulls[1].append(book_id)
+                    values = None if backwards else values
+                elif column == "book_id":
+                    values[0].append("book_id %s ?" % comparison)
+                    values[1].append(book_id)
+                else:
+                    values[0].append("(%s, book_id) %s (?, ?)" % (column, comparison))
+                    values[1].extend((value, book_id))
+                    nulls = nulls if backwards else None
+            rows = list()
+            for run in [values, nulls] if backwards else [nulls, values]:
+                if run is None or len(rows) >= count:
+                    continue
+                run_conditions, run_parameters = run
+                rows += self.__query(
+                    "SELECT %s, book_id FROM books WHERE %s ORDER BY %s %s, book_id %s LIMIT ?"
+                    % (column, " AND ".join(conditions + run_conditions), column, direction,
+                       direction),
+                    parameters + run_parameters + [count - len(rows)],
+                )
+            return rows
+
+        after_row = None
+        if after_key is not None:
+            after_row = (after_key, after_key)
+            if order is not None:
+                after_value = self.__scalars(
+                    "SELECT %s FROM books WHERE book_id = ?" % column, (after_key,)
+                )
+                after_row = (after_value[0], after_key) if after_value else None
+
+        # A descending order is read from the end, and the page is turned round to match.
+        if reverse != descending:
+            rows = seek(after_row, True, limit + 1)
+            more_before = len(rows) > limit
+            rows = rows[:limit][::-1]
+            more_after = bool(rows) and bool(seek(rows[-1], False, 1))
+        else:
+            rows = seek(after_row, False, limit + 1)
+            more_after = len(rows) > limit
+            rows = rows[:limit]
+            more_before = bool(rows) and bool(seek(rows[0], True, 1))
+        book_ids = [book_id for _, book_id in rows]
+        if descending:
+            book_ids.reverse()
+            more_before, more_after = more_after, more_before
+        return BookPage(
+            self.get_books(book_ids),
+            total,
+            book_ids[0] if more_before else None,
+            book_ids[-1] if more_after else None,
+        )
+
+    def get_top_books(
+        self, board: str, limit: int = 10, publisher: Publisher = None, author: Author = None,
+        release_year: int = None, min_ratings: int = 0,
+    ) -> List[Book]:
+        # The rating boards read the rating indexes from the top; reviews are counted per book.
+        if board not in LEADERBOARDS:
+            raise ValueError("Unknown leaderboard %r" % board)
+        if publisher is not None:
+            query = BookQuery(publisher=publisher)
+        elif author is not None:
+            query = BookQuery(author=author)
+        else:
+            query = BookQuery(start_year=release_year, end_year=release_year)
+        conditions, parameters = self.__where(query)
+        if board == "most_reviewed":
+            where = ""
+            if conditions:
+                where = "WHERE book_id IN (SELECT book_id FROM books WHERE %s)" % " AND ".join(
+                    conditions
+                )
+            book_ids = self.__scalars(
+                "SELECT book_id FROM reviews %s GROUP BY book_id "
+                "ORDER BY COUNT(*) DESC, book_id LIMIT ?" % where,
+                parameters + [limit],
+            )
+        else:
+            if board == "highest_rated":
+                conditions += ["average_rating IS NOT NULL", "ratings_count >= ?"]
+                parameters.append(min_ratings)
+                order = "average_rating DESC, ratings_count DESC, book_id"
+            else:
+                conditions.append("ratings_count > 0")
+                order = "ratings_count DESC, book_id"
+            book_ids = self.__scalars(
+                "SELECT book_id FROM books WHERE %s ORDER BY %s LIMIT ?"
+                % (" AND ".join(conditions), order),
+                parameters + [limit],
+            )
+        return self.get_books(book_ids)
+
+    def query_books(self, query: BookQuery, start: int = 0, stop: int = None) -> BookQueryResult:
+        conditions, parameters = self.__where(query)
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+
+        book_ids = self.__scalars(
+            "SELECT book_id FROM books %s ORDER BY book_id" % where, parameters
+        )
+        facets = {
+            "publisher": {
+                None if name is None else Publisher(name): count
+                for name, count in self.__query(
+                    "SELECT publisher, COUNT(*) FROM books %s GROUP BY publisher" % where,
+                    parameters,
+                )
+            },
+            "author": {
+                Author(author_id, full_name): count
+                for author_id, full_name, count in self.__query(
+                    "SELECT a.author_id, a.full_name, COUNT(*) FROM book_authors ba "
+                    "JOIN authors a ON a.author_id = ba.author_id "
+                    "WHERE ba.book_id IN (SELECT book_id FROM books %s) GROUP BY a.author_id"
+                    % where,
+                    parameters,
+                )
+            },
+            "release_year": dict(
+                self.__query(
+                    "SELECT release_year, COUNT(*) FROM books %s GROUP BY release_year" % where,
+                    parameters,
+                )
+            ),
+            "ebook": {
+                None if ebook is None else bool(ebook): count
+                for ebook, count in self.__query(
+                    "SELECT ebook, COUNT(*) FROM books %s GROUP BY ebook" % where, parameters
+                )
+            },
+        }
+        return BookQueryResult(self.get_books(book_ids[start:stop]), len(book_ids), facets)
+
+    def search_books(self, query: str, start: int = 0, stop: int = None) -> Tuple[List[Book], int]:
+        # The same terms and phrases as SearchIndex, matched and ranked by SQLite's FTS5.
+        terms, phrases = parse_query(query)
+        if not terms:
+            return [], 0
+        # Tokens are runs of word characters, so they can be quoted as FTS5 strings as they are.
+        match = " AND ".join(
+            ['"%s"' % term for term in terms] + ['"%s"' % " ".join(phrase) for phrase in phrases]
+        )
+        total = self.__scalars(
+            "SELECT COUNT(*) FROM books_text WHERE books_text MATCH ?", (match,)
+        )[0]
+        book_ids = self.__scalars(
+            "SELECT rowid FROM books_text WHERE books_text MATCH ? "
+            "ORDER BY bm25(books_text), rowid LIMIT ? OFFSET ?",
+            (match, *row_limit(start, stop)),
+        )
+        return self.get_books(book_ids), total
+
+    def __complete(self, kind: str, prefix: str, limit: Optional[int]) -> list:
+        prefix = normalize_name(prefix)
+        if not prefix:
+            return []
+        return self.__scalars(
+            COMPLETE, (kind, prefix, prefix + "\U0010ffff", -1 if limit is None else limit)
+        )
+
+    def complete_titles(self, prefix: str, limit: int = 10) -> List[Book]:
+        return self.get_books(self.__complete(TITLE, prefix, limit))
+
+    def complete_authors(self, prefix: str, limit: int = 10) -> List[Author]:
+        return self.get_authors(self.__complete(AUTHOR, prefix, limit))
+
+    def complete_publishers(self, prefix: str, limit: int = 10) -> List[Publisher]:
+        return [Publisher(name) for name in self.__complete(PUBLISHER, prefix, limit)]
+
+    def find_authors_by_name(self, name: str) -> List[Author]:
+        return self.complete_authors(name, None)
+
+    def match_authors(self, name: str, limit: int = 10) -> List[Author]:
+        # As MemoryRepository: exact canonical matches first, then names whose trigram sets are
+        # similar enough, counted by SQLite from the trigram index.
+        unique_ids = self.__scalars(
+            "SELECT author_id FROM authors WHERE canonical_name = ? ORDER BY author_id",
+            (canonical_name(name),),
+        )
+        if limit is None or len(unique_ids) < limit:
+            unique_ids += [
+                unique_id
+                for unique_id in self.__similar_authors(name, limit)
+                if unique_id not in unique_ids
+            ]
+        return self.get_authors(unique_ids[:limit])
+
+    def __similar_authors(self, name: str, limit: Optional[int]) -> List[int]:
+        trigrams = sorted(name_trigrams(canonical_name(name)))
+        if not trigrams:
+            return []
+        matches = list()
+        for author_id, full_name, num_trigrams, shared in self.__query(
+            "SELECT a.author_id, a.full_name, a.num_trigrams, COUNT(*) FROM author_trigrams t "
+            "JOIN authors a ON a.author_id = t.author_id "
+            "WHERE t.trigram IN (%s) GROUP BY a.author_id HAVING COUNT(*) >= ?"
+            % placeholders(trigrams),
+            (*trigrams, SIMILARITY_THRESHOLD * len(trigrams)),
+        ):
+            similarity = shared / (len(trigrams) + num_trigrams - shared)
+            if similarity >= SIMILARITY_THRESHOLD:
+                matches.append((-similarity, full_name, author_id))
+        matches.sort()
+        return [author_id for _, _, author_id in matches[:limit]]
+
+    # ------------------------------------------------------------------
+    # Reviews
+    # ------------------------------------------------------------------
+
+    def add_review(self, review: Review):
+        super().add_review(review)
+        timestamp = review.timestamp
+        connection = self.__connection()
+        with self.__write_lock, connection:
+            connection.execute(
+                "INSERT INTO reviews (book_id, user_name, review_text, timestamp) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    review.book.book_id,
+                    review.user.user_name,
+                    review.review_text,
+                    timestamp.isoformat() if isinstance(timestamp, datetime) else None,
+                ),
+            )
+
+    # ------------------------------------------------------------------
+    # Data files
+    # ------------------------------------------------------------------
+
+    def get_data_file_offsets(self) -> Dict[str, int]:
+        return dict(self.__query("SELECT file_name, byte_offset FROM data_file_offsets"))
+
+    def set_data_file_offsets(self, offsets: Dict[str, int]):
+        connection = self.__connection()
+        with self.__write_lock, connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO data_file_offsets (file_name, byte_offset) VALUES (?, ?)",
+                list(offsets.items()),
+            )
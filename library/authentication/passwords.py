@@ -0,0 +1,60 @@
+import hashlib
+from multiprocessing import Pool
+from typing import Iterable, List
+
+from werkzeug.security import generate_password_hash
+
+# Werkzeug's "plain" method stores the password itself. It marks seeded passwords whose hashing
+# is deferred until the user first logs in; check_password_hash accepts it like any other hash.
+# Such values must never be written to disk, see hash_pending_passwords.
+PENDING_HASH_PREFIX = "plain$$"
+
+EAGER_HASHING = "eager"
+PARALLEL_HASHING = "parallel"
+LAZY_HASHING = "lazy"
+
+
+def is_password_hash(password: str) -> bool:
+    # True for values in werkzeug's method$salt$hash format, e.g. from generate_password_hash.
+    if not isinstance(password, str) or password.count("$") < 2:
+        return False
+    method = password.split("$", 1)[0]
+    return (
+        method.startswith("pbkdf2:")
+        or method == "plain"
+        or method in hashlib.algorithms_guaranteed
+    )
+
+
+def is_pending_hash(password: str) -> bool:
+    return isinstance(password, str) and password.startswith(PENDING_HASH_PREFIX)
+
+
+def hash_passwords(passwords: List[str], hashing: str = LAZY_HASHING, workers: int = 1) -> List[str]:
+    # Returns the passwords ready to be stored on User objects. Values that are already hashes
+    # are kept as they are; plaintext ones are hashed according to `hashing`.
+    plaintext = [i for i, password in enumerate(passwords) if not is_password_hash(password)]
+    stored = list(passwords)
+    if hashing == LAZY_HASHING:
+        for i in plaintext:
+            stored[i] = PENDING_HASH_PREFIX + passwords[i]
+    elif hashing == PARALLEL_HASHING and workers > 1 and len(plaintext) > 1:
+        with Pool(workers) as pool:
+            hashes = pool.map(generate_password_hash, [passwords[i] for i in plaintext])
+        for i, password_hash in zip(plaintext, hashes):
+            stored[i] = password_hash
+    else:
+        for i in plaintext:
+            stored[i] = generate_password_hash(passwords[i])
+    return stored
+
+
+def hash_pending_passwords(users: Iterable, workers: int = 1):
+    # Replaces the deferred plaintext passwords of `users` with real hashes, computed in
+    # `workers` processes. Call before users are stored in a database or snapshot file.
+    pending = [user for user in users if is_pending_hash(user.password)]
+    hashes = hash_passwords(
+        [user.password[len(PENDING_HASH_PREFIX):] for user in pending], PARALLEL_HASHING, workers
+    )
+    for user, password_hash in zip(pending, hashes):
+        user.password = password_hash
@@ -1,5 +1,6 @@
 from werkzeug.security import generate_password_hash, check_password_hash
-from library.adapters.repository import AbstractRepository
+from library.adapters.repository import AbstractRepository, RepositoryException
+from library.authentication.passwords import is_pending_hash
 from library.domain.model import User
 
 
@@ -24,9 +25,13 @@ def add_user(user_name: str, password: str, repo: AbstractRepository):
     # Encrypt password so that the database doesn't store passwords 'in the clear'.
     password_hash = generate_password_hash(password)
 
-    # Create and store the new User, with password encrypted.
+    # Create and store the new User, with password encrypted. The repository rejects the name
+    # if a concurrent registration took it after the check above.
     user = User(user_name, password_hash)
-    repo.add_user(user)
+    try:
+        repo.add_user(user)
+    except RepositoryException:
+        raise NameNotUniqueException
 
 
 def get_user(user_name: str, repo: AbstractRepository):
@@ -46,6 +51,11 @@ def authenticate_user(user_name: str, password: str, repo: AbstractRepository):
     if not authenticated:
         raise AuthenticationException
 
+    # Seeded users keep their password unhashed until now; replace it with a real hash.
+    if is_pending_hash(user.password):
+        user.password = generate_password_hash(password)
+        repo.update_user(user)
+
 
 # ===================================================
 # Functions to convert model entities to dictionaries
@@ -2,7 +2,7 @@ import datetime
 
 from flask import Blueprint
 from werkzeug.urls import url_encode
-from flask import request, render_template, redirect, url_for, session
+from flask import request, render_template, redirect, url_for, session, jsonify
 from better_profanity import profanity
 from flask_wtf import FlaskForm
 from wtforms import TextAreaField, SubmitField, HiddenField
@@ -21,47 +21,9 @@ books_blueprint = Blueprint("books_bp", __name__)
 @books_blueprint.route("/add_favourite", methods=["GET", "POST"])
 @login_required
 def add_favourite():
-    books_per_page = 5
-
-    cursor_index = request.args.get("cursor")
-
-    if cursor_index is None:
-        cursor_index = 0
-    else:
-        cursor_index = int(cursor_index)
-
     # Obtain logged in user's username
     user_name = session["user_name"]
 
-    favourite_books = services.get_users_favourite_books(user_name, repo.repo_instance)
-
-    book_to_show_reviews = request.args.get("view_reviews_for")
-
-    if book_to_show_reviews is None:
-        book_to_show_reviews = -1
-    else:
-        # Convert book_to_show_reviews from string to int.
-        book_to_show_reviews = int(book_to_show_reviews)
-
-    (
-        first_page_of_books_url,
-        next_page_of_books_url,
-        previous_page_of_books_url,
-        last_page_of_books_url,
-    ) = get_book_first_last_pages(
-        cursor_index, favourite_books, "books_bp.add_favourite"
-    )
-
-    list_of_books_to_show = favourite_books
-
-    for book in list_of_books_to_show:
-        book["view_review_url"] = url_for(
-            "books_bp.add_favourite",
-            cursor=cursor_index,
-            view_reviews_for=book["id"],
-        )
-        book["add_review_url"] = url_for("books_bp.review_book", book=book["id"])
-
     form = FavouriteForm()
     print("Is this happening?")
     if form.is_submitted():
@@ -114,14 +76,16 @@ def display_all_books():
 
     books_per_page = 5
 
-    cursor_index = request.args.get("cursor")
-
-    if cursor_index is None:
-        cursor_index = 0
-    else:
-        cursor_index = int(cursor_index)
+    # The cursor names the book the page starts after (or ends before), so any page is found
+    # with one index lookup rather than by counting through the books ahead of it.
+    cursor = request.args.get("cursor")
+    after_key, reverse = utilities.read_cursor(cursor)
+    # One of the repository's BOOK_ORDERS, or catalogue (book_id) order if missing or unknown.
+    sort = request.args.get("sort")
 
-    all_books = services.get_all_books(repo.repo_instance)
+    page = services.get_all_books_page(
+        repo.repo_instance, after_key, books_per_page, reverse, sort
+    )
 
     book_to_show_reviews = request.args.get("view_reviews_for")
 
@@ -133,23 +97,18 @@ def display_all_books():
 
     (
         first_page_of_books_url,
-        next_page_of_books_url,
         previous_page_of_books_url,
+        next_page_of_books_url,
         last_page_of_books_url,
-    ) = get_book_first_last_pages(cursor_index, all_books, "books_bp.display_all_books")
+    ) = utilities.page_urls("books_bp.display_all_books", page, sort=sort)
 
-    list_of_books_to_show = []
-    for index in range(cursor_index, books_per_page + cursor_index):
-        try:
-            book = services.book_to_dict(all_books[index])
-            list_of_books_to_show.append(book)
-        except IndexError:
-            break
+    list_of_books_to_show = page.books
 
     for book in list_of_books_to_show:
         book["view_review_url"] = url_for(
             "books_bp.display_all_books",
-            cursor=cursor_index,
+            cursor=cursor,
+            sort=sort,
             view_reviews_for=book["id"],
         )
         book["add_review_url"] = url_for("books_bp.review_book", book=book["id"])
@@ -163,6 +122,7 @@ def display_all_books():
         "books/book.html",
         books=list_of_books_to_show,
         page_title="All Books",
+        sort_urls=utilities.sort_urls("books_bp.display_all_books", sort),
         first_book_page_url=first_page_of_books_url,
         last_page_url=last_page_of_books_url,
         next_page_url=next_page_of_books_url,
@@ -171,171 +131,19 @@ def display_all_books():
     )
 
 
-def get_book_first_last_pages(cursor, list_of_books, url_for_param, books_per_page=5):
-    first_page_of_books_url = url_for(url_for_param, cursor=0)
-    last_page_of_books_url = url_for(
-        url_for_param,
-        cursor=len(list_of_books) - len(list_of_books) % books_per_page
-        if len(list_of_books) % books_per_page != 0
-        else len(list_of_books) - books_per_page,
-    )
-    next_page_of_books_url = None
-    previous_page_of_books_url = None
-
-    lastpage = len(list_of_books) - books_per_page
-
-    if cursor == 0:
-        first_page_of_books_url = None
-
-    if cursor - books_per_page >= 0:
-        previous_page_of_books_url = url_for(
-            url_for_param, cursor=cursor - books_per_page
-        )
-
-    if cursor + books_per_page < len(list_of_books):
-        next_page_of_books_url = url_for(url_for_param, cursor=books_per_page + cursor)
-
-    if cursor >= lastpage:
-        last_page_of_books_url = None
-
-    return (
-        first_page_of_books_url,
-        next_page_of_books_url,
-        previous_page_of_books_url,
-        last_page_of_books_url,
-    )
-
-
-def get_first_prev_next_last_urls_publisher_order(
-    cursor, list_of_books, url_for_param, publisher_name, books_per_page=3
-):
-    first_page_of_books_url = url_for(
-        url_for_param, cursor=0, by_publisher=publisher_name
-    )
-    last_page_of_books_url = url_for(
-        url_for_param,
-        cursor=len(list_of_books) - len(list_of_books) % books_per_page
-        if len(list_of_books) % books_per_page != 0
-        else len(list_of_books) - books_per_page,
-        by_publisher=publisher_name,
-    )
-    next_page_of_books_url = None
-    previous_page_of_books_url = None
-    if cursor == 0:
-        first_page_of_books_url = None
-
-    if cursor >= len(list_of_books) - books_per_page:
-        last_page_of_books_url = None
-
-    if cursor + books_per_page < len(list_of_books):
-        next_page_of_books_url = url_for(
-            url_for_param, cursor=cursor + books_per_page, by_publisher=publisher_name
-        )
-
-    if cursor - books_per_page >= 0:
-        previous_page_of_books_url = url_for(
-            url_for_param, cursor=cursor - books_per_page, by_publisher=publisher_name
-        )
-
-    return (
-        first_page_of_books_url,
-        previous_page_of_books_url,
-        next_page_of_books_url,
-        last_page_of_books_url,
-    )
-
-
-def get_first_prev_next_last_urls_author_order(
-    cursor, list_of_books, url_for_param, author_name, books_per_page=3
-):
-    first_page_of_books_url = url_for(url_for_param, cursor=0, by_author=author_name)
-    last_page_of_books_url = url_for(
-        url_for_param,
-        cursor=len(list_of_books) - len(list_of_books) % books_per_page
-        if len(list_of_books) % books_per_page != 0
-        else len(list_of_books) - books_per_page,
-        by_author=author_name,
-    )
-    next_page_of_books_url = None
-    previous_page_of_books_url = None
-    if cursor == 0:
-        first_page_of_books_url = None
-
-    if cursor >= len(list_of_books) - books_per_page:
-        last_page_of_books_url = None
-
-    if cursor + books_per_page < len(list_of_books):
-        next_page_of_books_url = url_for(
-            url_for_param, cursor=cursor + books_per_page, by_author=author_name
-        )
-
-    if cursor - books_per_page >= 0:
-        previous_page_of_books_url = url_for(
-            url_for_param, cursor=cursor - books_per_page, by_author=author_name
-        )
-
-    return (
-        first_page_of_books_url,
-        previous_page_of_books_url,
-        next_page_of_books_url,
-        last_page_of_books_url,
-    )
-
-
-def get_first_prev_next_last_urls_release_year_order(
-    cursor, list_of_books, url_for_param, release_year, books_per_page=3
-):
-    first_page_of_books_url = url_for(
-        url_for_param, cursor=0, by_release_year=release_year
-    )
-    last_page_of_books_url = url_for(
-        url_for_param,
-        cursor=len(list_of_books) - len(list_of_books) % books_per_page
-        if len(list_of_books) % books_per_page != 0
-        else len(list_of_books) - books_per_page,
-        by_release_year=release_year,
-    )
-    next_page_of_books_url = None
-    previous_page_of_books_url = None
-    if cursor == 0:
-        first_page_of_books_url = None
-
-    if cursor >= len(list_of_books) - books_per_page:
-        last_page_of_books_url = None
-
-    if cursor + books_per_page < len(list_of_books):
-        next_page_of_books_url = url_for(
-            url_for_param, cursor=cursor + books_per_page, by_release_year=release_year
-        )
-
-    if cursor - books_per_page >= 0:
-        previous_page_of_books_url = url_for(
-            url_for_param, cursor=cursor - books_per_page, by_release_year=release_year
-        )
-
-    return (
-        first_page_of_books_url,
-        previous_page_of_books_url,
-        next_page_of_books_url,
-        last_page_of_books_url,
-    )
-
-
 @books_blueprint.route("/browse_by_favourites", methods=["GET"])
 def browse_by_favourites():
     books_per_page = 5
 
-    cursor_index = request.args.get("cursor")
-
-    if cursor_index is None:
-        cursor_index = 0
-    else:
-        cursor_index = int(cursor_index)
+    cursor = request.args.get("cursor")
+    after_key, reverse = utilities.read_cursor(cursor)
 
     # Obtain logged in user's username
     user_name = session["user_name"]
 
-    favourite_books = services.get_users_favourite_books(user_name, repo.repo_instance)
+    page = services.get_users_favourite_books_page(
+        user_name, repo.repo_instance, after_key, books_per_page, reverse
+    )
 
     book_to_show_reviews = request.args.get("view_reviews_for")
 
@@ -347,19 +155,17 @@ def browse_by_favourites():
 
     (
         first_page_of_books_url,
-        next_page_of_books_url,
         previous_page_of_books_url,
+        next_page_of_books_url,
         last_page_of_books_url,
-    ) = get_book_first_last_pages(
-        cursor_index, favourite_books, "books_bp.browse_by_favourites"
-    )
+    ) = utilities.page_urls("books_bp.browse_by_favourites", page)
 
-    list_of_books_to_show = favourite_books
+    list_of_books_to_show = page.books
 
     for book in list_of_books_to_show:
         book["view_review_url"] = url_for(
             "books_bp.browse_by_favourites",
-            cursor=cursor_index,
+            cursor=cursor,
             view_reviews_for=book["id"],
         )
         book["add_review_url"] = url_for("books_bp.review_book", book=book["id"])
@@ -392,12 +198,11 @@ def browse_by_publisher():
 
     books_per_page = 5
     cursor = request.args.get("cursor")
-    if cursor is None:
-        cursor = 0
-    else:
-        cursor = int(cursor)
-    books_by_publisher = utilities_services.get_books_by_publisher_name(
-        publisher_name, repo.repo_instance
+    after_key, reverse = utilities.read_cursor(cursor)
+    sort = request.args.get("sort")
+    # Only the books on this page are fetched; the index gives the total without loading the rest.
+    page = services.get_books_page_by_publisher_name(
+        publisher_name, repo.repo_instance, after_key, books_per_page, reverse, sort
     )
 
     book_to_show_reviews = request.args.get("view_reviews_for")
@@ -412,22 +217,17 @@ def browse_by_publisher():
         previous_page_of_books_url,
         next_page_of_books_url,
         last_page_of_books_url,
-    ) = get_first_prev_next_last_urls_publisher_order(
-        cursor, books_by_publisher, "books_bp.browse_by_publisher", publisher_name
+    ) = utilities.page_urls(
+        "books_bp.browse_by_publisher", page, by_publisher=publisher_name, sort=sort
     )
 
-    list_of_books_to_show = []
-    for i in range(cursor, cursor + books_per_page):
-        try:
-            book = services.book_to_dict(books_by_publisher[i])
-            list_of_books_to_show.append(book)
-        except IndexError:
-            break
+    list_of_books_to_show = page.books
 
     for book in list_of_books_to_show:
         book["view_review_url"] = url_for(
             "books_bp.browse_by_publisher",
             cursor=cursor,
+            sort=sort,
             by_publisher=publisher_name,
             view_reviews_for=book["id"],
         )
@@ -441,6 +241,9 @@ def browse_by_publisher():
     return render_template(
         "books/book.html",
         books=list_of_books_to_show,
+        sort_urls=utilities.sort_urls(
+            "books_bp.browse_by_publisher", sort, by_publisher=publisher_name
+        ),
         first_book_page_url=first_page_of_books_url,
         last_page_url=last_page_of_books_url,
         next_page_url=next_page_of_books_url,
@@ -461,12 +264,10 @@ def browse_by_author():
     # If a author is specified, then retrieve books to display
     books_per_page = 5
     cursor = request.args.get("cursor")
-    if cursor is None:
-        cursor = 0
-    else:
-        cursor = int(cursor)
-    books_by_author = utilities_services.get_books_by_author_name(
-        author_name, repo.repo_instance
+    after_key, reverse = utilities.read_cursor(cursor)
+    sort = request.args.get("sort")
+    page = services.get_books_page_by_author_name(
+        author_name, repo.repo_instance, after_key, books_per_page, reverse, sort
     )
 
     book_to_show_reviews = request.args.get("view_reviews_for")
@@ -481,22 +282,15 @@ def browse_by_author():
         previous_page_of_books_url,
         next_page_of_books_url,
         last_page_of_books_url,
-    ) = get_first_prev_next_last_urls_author_order(
-        cursor, books_by_author, "books_bp.browse_by_author", author_name
-    )
+    ) = utilities.page_urls("books_bp.browse_by_author", page, by_author=author_name, sort=sort)
 
-    list_of_books_to_show = []
-    for i in range(cursor, cursor + books_per_page):
-        try:
-            book = services.book_to_dict(books_by_author[i])
-            list_of_books_to_show.append(book)
-        except IndexError:
-            break
+    list_of_books_to_show = page.books
 
     for book in list_of_books_to_show:
         book["view_review_url"] = url_for(
             "books_bp.browse_by_author",
             cursor=cursor,
+            sort=sort,
             by_author=author_name,
             view_reviews_for=book["id"],
         )
@@ -510,6 +304,7 @@ def browse_by_author():
     return render_template(
         "books/book.html",
         books=list_of_books_to_show,
+        sort_urls=utilities.sort_urls("books_bp.browse_by_author", sort, by_author=author_name),
         first_book_page_url=first_page_of_books_url,
         last_page_url=last_page_of_books_url,
         next_page_url=next_page_of_books_url,
@@ -522,36 +317,25 @@ def browse_by_author():
 @books_blueprint.route("/browse_by_release_year", methods=["GET"])
 def browse_by_release_year():
 
-    all_books = utilities_services.get_all_books(repo.repo_instance)
-    release_years = []
-    for book in all_books:
-        if book.release_year not in release_years and book.release_year is not None:
-            release_years.append(book.release_year)
-    release_years.sort()
-    release_years.append("Unknown")
+    # The repository keeps the distinct years sorted; books of unknown year are listed last.
+    release_years = utilities_services.get_all_release_years(repo.repo_instance) + ["Unknown"]
 
     release_year = request.args.get("by_release_year")
-    print("release_year books.py:", release_year)
     if release_year is None:
         return render_template(
             "release_year/release_year.html", release_years=release_years
         )
 
-    # If a author is specified, then retrieve books to display
+    # If a release year is specified, then retrieve books to display
     books_per_page = 5
     cursor = request.args.get("cursor")
-    if cursor is None:
-        cursor = 0
-    else:
-        cursor = int(cursor)
+    after_key, reverse = utilities.read_cursor(cursor)
+    sort = request.args.get("sort")
 
-    books_by_release_year = []
-    for book in all_books:
-        if book.release_year is None and release_year == "Unknown":
-            books_by_release_year.append(book)
-        elif book.release_year is not None and release_year != "Unknown":
-            if book.release_year == int(release_year):
-                books_by_release_year.append(book)
+    year = None if release_year == "Unknown" else int(release_year)
+    page = services.get_books_page_by_release_year(
+        year, repo.repo_instance, after_key, books_per_page, reverse, sort
+    )
 
     book_to_show_reviews = request.args.get("view_reviews_for")
     if book_to_show_reviews is None:
@@ -566,22 +350,17 @@ def browse_by_release_year():
         previous_page_of_books_url,
         next_page_of_books_url,
         last_page_of_books_url,
-    ) = get_first_prev_next_last_urls_author_order(
-        cursor, books_by_release_year, "books_bp.browse_by_release_year", release_year
+    ) = utilities.page_urls(
+        "books_bp.browse_by_release_year", page, by_release_year=release_year, sort=sort
     )
 
-    list_of_books_to_show = []
-    for i in range(cursor, cursor + books_per_page):
-        try:
-            book = services.book_to_dict(books_by_release_year[i])
-            list_of_books_to_show.append(book)
-        except IndexError:
-            break
+    list_of_books_to_show = page.books
 
     for book in list_of_books_to_show:
         book["view_review_url"] = url_for(
             "books_bp.browse_by_release_year",
             cursor=cursor,
+            sort=sort,
             by_release_year=release_year,
             view_reviews_for=book["id"],
         )
@@ -595,6 +374,9 @@ def browse_by_release_year():
     return render_template(
         "books/book.html",
         books=list_of_books_to_show,
+        sort_urls=utilities.sort_urls(
+            "books_bp.browse_by_release_year", sort, by_release_year=release_year
+        ),
         first_book_page_url=first_page_of_books_url,
         last_page_url=last_page_of_books_url,
         next_page_url=next_page_of_books_url,
@@ -604,6 +386,72 @@ def browse_by_release_year():
     )
 
 
+@books_blueprint.route("/search", methods=["GET"])
+def search():
+    query = request.args.get("q", "").strip()
+    if query == "":
+        return render_template("books/search.html", query="", books=[], total=0)
+
+    books_per_page = 5
+    cursor = request.args.get("cursor")
+    after_key, reverse = utilities.read_cursor(cursor)
+
+    # Results are ranked best first; only the books on this page are fetched.
+    page = services.search_books_page(
+        query, repo.repo_instance, after_key, books_per_page, reverse
+    )
+
+    book_to_show_reviews = request.args.get("view_reviews_for")
+    if book_to_show_reviews is None:
+        book_to_show_reviews = -1
+    else:
+        book_to_show_reviews = int(book_to_show_reviews)
+
+    (
+        first_page_of_books_url,
+        previous_page_of_books_url,
+        next_page_of_books_url,
+        last_page_of_books_url,
+    ) = utilities.page_urls("books_bp.search", page, q=query)
+
+    list_of_books_to_show = page.books
+
+    for book in list_of_books_to_show:
+        book["view_review_url"] = url_for(
+            "books_bp.search",
+            cursor=cursor,
+            q=query,
+            view_reviews_for=book["id"],
+        )
+        book["add_review_url"] = url_for("books_bp.review_book", book=book["id"])
+
+        # Confirm add to favourites link
+        book["add_to_favourites_url"] = url_for(
+            "books_bp.add_favourite", book=book["id"]
+        )
+
+    return render_template(
+        "books/search.html",
+        query=query,
+        total=page.total,
+        books=list_of_books_to_show,
+        first_book_page_url=first_page_of_books_url,
+        last_page_url=last_page_of_books_url,
+        next_page_url=next_page_of_books_url,
+        prev_page_url=previous_page_of_books_url,
+        show_reviews_for_book=book_to_show_reviews,
+    )
+
+
+@books_blueprint.route("/autocomplete", methods=["GET"])
+def autocomplete():
+    # JSON suggestions for the search box, e.g. /autocomplete?q=brub&limit=5.
+    prefix = request.args.get("q", "")
+    limit = request.args.get("limit", 10, type=int)
+    limit = max(1, min(limit, 50))
+    return jsonify(utilities_services.autocomplete(prefix, repo.repo_instance, limit))
+
+
 @books_blueprint.route("/review", methods=["GET", "POST"])
 @login_required
 def review_book():
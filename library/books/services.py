@@ -1,6 +1,14 @@
 from typing import Iterable
 
-from library.adapters.repository import AbstractRepository
+from urllib.parse import unquote_plus
+
+from library.adapters.repository import (
+    AbstractRepository,
+    BOOK_ORDERS,
+    BookPage,
+    BookQuery,
+    page_of_keys,
+)
 from library.domain.model import *
 
 
@@ -44,6 +52,23 @@ def get_users_favourite_books(user_name: str, repo: AbstractRepository):
     return users_favourite_books
 
 
+# Function for getting one page of a user's favourite books, keyed by position in the list
+def get_users_favourite_books_page(
+    user_name: str, repo: AbstractRepository, after_key: int = None, limit: int = 5,
+    reverse: bool = False,
+):
+    favourites = repo.get_user(user_name).favourites
+    positions, previous_key, next_key = page_of_keys(
+        range(len(favourites)), after_key, limit, reverse
+    )
+    return BookPage(
+        books_to_dict(favourites[position] for position in positions),
+        len(favourites),
+        previous_key,
+        next_key,
+    )
+
+
 # Function for adding a book to a user's favorites
 def add_book_to_favourites(book_id: int, user_name: str, repo: AbstractRepository):
 
@@ -54,16 +79,136 @@ def add_book_to_favourites(book_id: int, user_name: str, repo: AbstractRepositor
     book = repo.get_book(book_id)
 
     user.add_to_favourites(book)
+    repo.update_user(user)
+
+
+def get_books_page(
+    query: BookQuery, repo: AbstractRepository, after_key: int = None, limit: int = 5,
+    reverse: bool = False, order: str = None,
+):
+    # One page of the books matching query, as dictionaries, in the named order of BOOK_ORDERS
+    # or in book_id order if order is None or unknown. The keys of the returned BookPage are
+    # book ids to pass back as after_key to page on.
+    if order not in BOOK_ORDERS:
+        order = None
+    page = repo.get_books_page(query, after_key, limit, reverse, order)
+    return BookPage(books_to_dict(page.books), page.total, page.previous_key, page.next_key)
+
+
+def get_all_books_page(
+    repo: AbstractRepository, after_key: int = None, limit: int = 5, reverse: bool = False,
+    order: str = None,
+):
+    return get_books_page(BookQuery(), repo, after_key, limit, reverse, order)
+
+
+def get_books_page_by_publisher_name(
+    publisher_name: str, repo: AbstractRepository, after_key: int = None, limit: int = 5,
+    reverse: bool = False, order: str = None,
+):
+    query = BookQuery(publisher=Publisher(publisher_name))
+    return get_books_page(query, repo, after_key, limit, reverse, order)
+
+
+def get_books_page_by_author_name(
+    author_name: str, repo: AbstractRepository, after_key: int = None, limit: int = 5,
+    reverse: bool = False, order: str = None,
+):
+    # The books of the closest matching author, as utilities.services.get_books_by_author_name.
+    authors = repo.match_authors(unquote_plus(author_name), 1)
+    if not authors:
+        return BookPage([], 0)
+    return get_books_page(BookQuery(author=authors[0]), repo, after_key, limit, reverse, order)
+
+
+def get_books_page_by_release_year(
+    year, repo: AbstractRepository, after_key: int = None, limit: int = 5, reverse: bool = False,
+    order: str = None,
+):
+    # A year of None pages through the books whose year is unknown.
+    if not ((isinstance(year, int) and year >= 0) or year is None):
+        raise InvalidYearException
+    if year is None:
+        query = BookQuery(unknown_year=True)
+    else:
+        query = BookQuery(start_year=year, end_year=year)
+    return get_books_page(query, repo, after_key, limit, reverse, order)
 
 
 def get_books_by_author(author: Author, repo: AbstractRepository):
     return books_to_dict(repo.get_books_by_author(author))
 
 
-def get_books_by_release_year(year, repo: AbstractRepository):
+def get_books_by_release_year(year, repo: AbstractRepository, start: int = 0, stop: int = None):
+    if not ((isinstance(year, int) and year >= 0) or year is None):
+        raise InvalidYearException
+    return repo.get_book_release_year(year, start, stop)
+
+
+def get_number_of_books_by_release_year(year, repo: AbstractRepository):
     if not ((isinstance(year, int) and year >= 0) or year is None):
         raise InvalidYearException
-    return repo.get_book_release_year(year)
+    return repo.get_number_of_books_by_release_year(year)
+
+
+def query_books(
+    repo: AbstractRepository,
+    publisher_name: str = None,
+    author_id: int = None,
+    start_year: int = None,
+    end_year: int = None,
+    ebook: bool = None,
+    min_pages: int = None,
+    max_pages: int = None,
+    min_rating: float = None,
+    start: int = 0,
+    stop: int = None,
+):
+    # Filters left as None match every book. Facet counts are keyed by publisher name, author
+    # name, release year and ebook flag so they can be shown next to the results.
+    query = BookQuery(
+        publisher=None if publisher_name is None else Publisher(publisher_name),
+        author=None if author_id is None else repo.get_author_by_id(author_id),
+        start_year=start_year,
+        end_year=end_year,
+        ebook=ebook,
+        min_pages=min_pages,
+        max_pages=max_pages,
+        min_rating=min_rating,
+    )
+    if author_id is not None and query.author is None:
+        return {"books": [], "total": 0, "facets": {}}
+    result = repo.query_books(query, start, stop)
+    facets = result.facets
+    return {
+        "books": books_to_dict(result.books),
+        "total": result.total,
+        "facets": {
+            "publisher": {
+                ("N/A" if publisher is None else publisher.name): count
+                for publisher, count in facets["publisher"].items()
+            },
+            "author": {author.full_name: count for author, count in facets["author"].items()},
+            "release_year": facets["release_year"],
+            "ebook": facets["ebook"],
+        },
+    }
+
+
+def search_books(query: str, repo: AbstractRepository, start: int = 0, stop: int = None):
+    books, total = repo.search_books(query, start, stop)
+    return books_to_dict(books), total
+
+
+def search_books_page(
+    query: str, repo: AbstractRepository, after_key: int = None, limit: int = 5,
+    reverse: bool = False,
+):
+    # Results are ranked rather than in book_id order, so their keys are positions in the ranking.
+    _, total = repo.search_books(query, 0, 0)
+    positions, previous_key, next_key = page_of_keys(range(total), after_key, limit, reverse)
+    books, total = search_books(query, repo, positions.start, positions.stop)
+    return BookPage(books, total, previous_key, next_key)
 
 
 def add_review(
@@ -111,6 +111,9 @@ class Book:
         self.title = book_title
 
         self.__description = None
+        # Set instead of __description when the description is read from the data file on demand.
+        self.__description_source = None
+        self.__description_offset = None
         self.__publisher = None
         self.__authors = []
         self.__release_year = None
@@ -121,6 +124,7 @@ class Book:
         self.__hyperlink: str = None
         self.__average_rating = None
         self.__ratings_count = None
+        self.__rating_observer = None
         self.__reviews = list()
 
     @property
@@ -155,12 +159,31 @@ class Book:
 
     @property
     def description(self) -> str:
+        if self.__description is None and self.__description_source is not None:
+            return self.__description_source.read_description(self.__description_offset)
         return self.__description
 
     @description.setter
     def description(self, description: str):
         if isinstance(description, str):
             self.__description = description.strip()
+            self.__description_source = None
+            self.__description_offset = None
+
+    @property
+    def description_source(self):
+        return self.__description_source
+
+    @property
+    def description_offset(self) -> int:
+        return self.__description_offset
+
+    def load_description_from(self, source, offset: int):
+        # Defer the description to source.read_description(offset), e.g. a DescriptionFile
+        # pointing at this book's line in the books file.
+        self.__description = None
+        self.__description_source = source
+        self.__description_offset = offset
 
     @property
     def publisher(self) -> Publisher:
@@ -229,8 +252,19 @@ class Book:
         if isinstance(hyperlink, str):
             self.__hyperlink = hyperlink.strip()
 
+    def observe_rating(self, observer):
+        # After each change to the rating, observer.rating_changed(book, old_average_rating,
+        # old_ratings_count) is called; a repository uses it to keep the book in place in the
+        # orders it keeps by rating.
+        self.__rating_observer = observer
+
+    def __rating_changed(self, old_average_rating, old_ratings_count):
+        if self.__rating_observer is not None:
+            self.__rating_observer.rating_changed(self, old_average_rating, old_ratings_count)
+
     def update_average_rating(self, rating: int):
         if isinstance(rating, int):
+            old_average_rating, old_ratings_count = self.__average_rating, self.__ratings_count
             if self.__ratings_count is None:
                 self.__average_rating = 0.0
                 self.__ratings_count = 0
@@ -238,13 +272,16 @@ class Book:
                 self.ratings_count * self.average_rating + rating
             ) / (self.ratings_count + 1)
             self.__ratings_count += 1
+            self.__rating_changed(old_average_rating, old_ratings_count)
         else:
             raise ValueError("Requires integer value to update average rating")
 
     def initiliase_rating_and_count(self, avgerage_rating: float, rate: int):
         if isinstance(rate, int) and isinstance(avgerage_rating, float):
+            old_average_rating, old_ratings_count = self.__average_rating, self.__ratings_count
             self.__ratings_count = rate
             self.__average_rating = avgerage_rating
+            self.__rating_changed(old_average_rating, old_ratings_count)
         else:
             raise ValueError
 
@@ -260,6 +297,10 @@ class Book:
     def reviews(self):
         return self.__reviews
 
+    @property
+    def number_of_reviews(self) -> int:
+        return len(self.__reviews)
+
     def add_review(self, review):
         if isinstance(review, Review):
             self.__reviews.append(review)
@@ -306,6 +347,11 @@ class User:
     def password(self) -> str:
         return self.__password
 
+    @password.setter
+    def password(self, password: str):
+        if isinstance(password, str) and len(password) >= 7:
+            self.__password = password
+
     @property
     def read_books(self) -> List[Book]:
         return self.__read_books
@@ -1,11 +1,38 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, current_app, render_template, request
 
 import library.utilities.utilities as utilities
 
 
 home_blueprint = Blueprint("home_bp", __name__)
 
+LEADERBOARD_TITLES = {
+    "highest_rated": "Highest rated",
+    "most_rated": "Most rated",
+    "most_reviewed": "Most reviewed",
+}
+
 
 @home_blueprint.route("/", methods=["GET"])
 def home():
-    return render_template("home/home.html", books=utilities.get_selected_books(1))
+    # The leaderboards cover all books, or one publisher's, author's or year's books when the
+    # matching query parameter is given.
+    publisher_name = request.args.get("publisher") or None
+    author_name = request.args.get("author") or None
+    release_year = request.args.get("year", type=int)
+    leaderboards = utilities.get_leaderboards(
+        current_app.config.get("LEADERBOARD_SIZE", 5),
+        current_app.config.get("LEADERBOARD_MIN_RATINGS", 0),
+        publisher_name,
+        author_name,
+        release_year,
+    )
+    return render_template(
+        "home/home.html",
+        books=utilities.get_selected_books(1),
+        leaderboards=[
+            (LEADERBOARD_TITLES[board], books) for board, books in leaderboards.items()
+        ],
+        publisher_name=publisher_name,
+        author_name=author_name,
+        release_year=release_year,
+    )
@@ -1,7 +1,8 @@
 from typing import Iterable
+from urllib.parse import unquote_plus
 import random
 
-from library.adapters.repository import AbstractRepository
+from library.adapters.repository import AbstractRepository, LEADERBOARDS
 from library.domain.model import *
 from library.adapters.repository import AbstractRepository
 
@@ -26,13 +27,22 @@ def get_publisher_name(publisher_name: str, repo: AbstractRepository):
     return repo.get_publisher_by_name(publisher_name)
 
 
-def get_publisher_books(publisher: Publisher, repo: AbstractRepository):
-    return repo.get_books_by_publisher(publisher)
+def get_publisher_books(
+    publisher: Publisher, repo: AbstractRepository, start: int = 0, stop: int = None
+):
+    return repo.get_books_by_publisher(publisher, start, stop)
+
+
+def get_books_by_publisher_name(
+    publisher_name: str, repo: AbstractRepository, start: int = 0, stop: int = None
+):
+    publisher = get_publisher_name(publisher_name, repo)
+    return get_publisher_books(publisher, repo, start, stop)
 
 
-def get_books_by_publisher_name(publisher_name: str, repo: AbstractRepository):
+def get_number_of_books_by_publisher_name(publisher_name: str, repo: AbstractRepository):
     publisher = get_publisher_name(publisher_name, repo)
-    return get_publisher_books(publisher, repo)
+    return repo.get_number_of_books_by_publisher(publisher)
 
 
 def get_book_author(author: Author, repo: AbstractRepository):
@@ -40,19 +50,72 @@ def get_book_author(author: Author, repo: AbstractRepository):
 
 
 def get_books_by_author_name(author_name: str, repo: AbstractRepository):
-    all_authors = get_all_authors(repo)
-    for author in all_authors:
-        if author.full_name == author_name:
-            return get_book_author(author, repo)
-    return None
-
-    return get_book_author(author, repo)
+    # The name may still be URL-encoded, differ in case, accents or word order, or be
+    # misspelled; the books of the closest matching author are returned.
+    authors = get_authors_matching(author_name, repo, 1)
+    if not authors:
+        return None
+    return get_book_author(authors[0], repo)
+
+
+def get_authors_matching(author_name: str, repo: AbstractRepository, limit: int = 10):
+    return repo.match_authors(unquote_plus(author_name), limit)
+
+
+def get_leaderboards(
+    repo: AbstractRepository,
+    limit: int = 5,
+    min_ratings: int = 0,
+    publisher_name: str = None,
+    author_name: str = None,
+    release_year: int = None,
+):
+    # The top books of each of LEADERBOARDS as dictionaries, with their numbers of ratings and
+    # reviews, among all books or those of one publisher, author (the closest match to the name)
+    # or year. An author name that matches no one gives empty boards.
+    publisher = None if publisher_name is None else Publisher(publisher_name)
+    author = None
+    if author_name is not None:
+        authors = get_authors_matching(author_name, repo, 1)
+        if not authors:
+            return {board: [] for board in LEADERBOARDS}
+        author = authors[0]
+    leaderboards = dict()
+    for board in LEADERBOARDS:
+        books = repo.get_top_books(board, limit, publisher, author, release_year, min_ratings)
+        leaderboards[board] = [
+            dict(
+                book_to_dict(book),
+                ratings_count=book.ratings_count,
+                number_of_reviews=len(book.reviews),
+            )
+            for book in books
+        ]
+    return leaderboards
 
 
 def get_authors_name(name: str, repo: AbstractRepository):
     return repo.find_authors_by_name(name)
 
 
+def autocomplete(prefix: str, repo: AbstractRepository, limit: int = 10):
+    # Suggestions for a search box: titles, authors and publishers whose names have a word
+    # starting with prefix, most rated first.
+    return {
+        "titles": [
+            {"id": book.book_id, "title": book.title}
+            for book in repo.complete_titles(prefix, limit)
+        ],
+        "authors": [
+            {"id": author.unique_id, "name": author.full_name}
+            for author in repo.complete_authors(prefix, limit)
+        ],
+        "publishers": [
+            {"name": publisher.name} for publisher in repo.complete_publishers(prefix, limit)
+        ],
+    }
+
+
 def get_author_id(id: int, repo: AbstractRepository):
     return repo.get_author_by_id(id)
 
@@ -13,5 +13,66 @@ def get_selected_books(quantity=5):
     return books
 
 
+def get_leaderboards(
+    limit=5, min_ratings=0, publisher_name=None, author_name=None, release_year=None
+):
+    return services.get_leaderboards(
+        repo.repo_instance, limit, min_ratings, publisher_name, author_name, release_year
+    )
+
+
 def get_all_books():
     return repo.repo_instance.get_all_books()
+
+
+def read_cursor(cursor):
+    # Reads a cursor query parameter made by page_urls: "after:<key>" or "before:<key>" pages
+    # forwards or backwards from a key and "last" is the last page. Returns the key to page from
+    # and whether to page backwards; a missing or unreadable cursor is the first page.
+    if cursor == "last":
+        return None, True
+    direction, _, key = (cursor or "").partition(":")
+    if direction in ("after", "before") and key.lstrip("-").isdigit():
+        return int(key), direction == "before"
+    return None, False
+
+
+def page_urls(endpoint, page, **url_args):
+    # The first, previous, next and last page links for a BookPage, each None where there are no
+    # more books that way. url_args are the other query parameters of the view, such as a filter.
+    if page.previous_key is None:
+        first_page_url = previous_page_url = None
+    else:
+        first_page_url = url_for(endpoint, **url_args)
+        previous_page_url = url_for(
+            endpoint, cursor="before:%d" % page.previous_key, **url_args
+        )
+    if page.next_key is None:
+        next_page_url = last_page_url = None
+    else:
+        next_page_url = url_for(endpoint, cursor="after:%d" % page.next_key, **url_args)
+        last_page_url = url_for(endpoint, cursor="last", **url_args)
+    return first_page_url, previous_page_url, next_page_url, last_page_url
+
+
+# The orders the browse views offer, by the sort query parameter, with their link labels.
+SORT_LABELS = [
+    (None, "Catalogue order"),
+    ("title", "Title"),
+    ("release_year", "Newest"),
+    ("average_rating", "Highest rated"),
+    ("ratings_count", "Most rated"),
+]
+
+
+def sort_urls(endpoint, sort, **url_args):
+    # A link to the first page of the view in each order, marking the order shown. url_args are
+    # the other query parameters of the view, as for page_urls.
+    return [
+        {
+            "label": label,
+            "url": url_for(endpoint, sort=order, **url_args),
+            "active": order == sort or (order is None and sort not in dict(SORT_LABELS)),
+        }
+        for order, label in SORT_LABELS
+    ]
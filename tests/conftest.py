@@ -2,6 +2,7 @@ import pytest
 from library import create_app
 from library.adapters import memory_repository
 from library.adapters.memory_repository import MemoryRepository
+from library.adapters.sqlite_repository import SqliteRepository
 
 from utils import get_project_root
 
@@ -9,9 +10,13 @@ from utils import get_project_root
 # tests are written against the csv files in tests, this data path is used to override default path for testing
 TEST_DATA_PATH = get_project_root() / "tests" / "data"
 
-@pytest.fixture
-def in_memory_repo():
-    repo = MemoryRepository()
+@pytest.fixture(params=["memory", "sqlite"])
+def in_memory_repo(request, tmp_path):
+    # Tests taking this fixture run once against each repository implementation.
+    if request.param == "sqlite":
+        repo = SqliteRepository(tmp_path / "catalogue.db")
+    else:
+        repo = MemoryRepository()
     memory_repository.populate(TEST_DATA_PATH, repo)
     return repo
 
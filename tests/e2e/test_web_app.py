@@ -1,8 +1,14 @@
+import json
+import shutil
+
 import pytest
 
 from flask import session
 from werkzeug.urls import url_encode
 
+from library import create_app
+from utils import get_project_root
+
 
 def test_register(client):
     # Check that we retrieve the register page.
@@ -22,6 +28,21 @@ def test_index(client):
     assert response.status_code == 200
     assert b'This WebApp lets users interact with a collection of books.' in response.data
 
+
+def test_index_shows_leaderboards(client):
+    response = client.get('/')
+    data = response.data.decode()
+    # D.Gray-man, Vol. 16 rates higher but has too few ratings to be listed as highest rated.
+    assert "Highest rated" in data and "Most reviewed" in data
+    assert "D.Gray-man" not in data
+    assert data.index("20th Century Boys, Libro 15") < data.index("Most rated")
+
+    response = client.get('/?publisher=Avatar Press')
+    data = response.data.decode()
+    assert "War Stories, Volume 3" in data
+    assert "20th Century Boys" not in data
+
+
 @pytest.mark.parametrize(('user_name', 'password', 'message'), (
         ('', '', b'User name is required'),
         ('cj', '', b'User name is too short'),
@@ -72,21 +93,55 @@ def test_all_books(client):
     assert b"Next page" in response.data
     assert b"Previous page" in response.data
 
-    response = client.get("display_all_books?cursor=5")
+    response = client.get("display_all_books?cursor=after:12349663")
     assert b"Seiyuu-ka! 12" in response.data
 
+
+def test_all_books_pages_by_cursor(client):
+    # 21 books, five to a page: the last page holds the last five books rather than one.
+    response = client.get("/display_all_books?cursor=last")
+    assert b"Bounty Hunter 4/3" in response.data
+    assert b"War Stories, Volume 4" in response.data
+    assert b"War Stories, Volume 3" not in response.data
+    assert b"cursor=before%3A27036538" in response.data
+    assert b"cursor=after" not in response.data
+
+    response = client.get("/display_all_books?cursor=before:27036538")
+    assert b"War Stories, Volume 3" in response.data
+    assert b"War Stories, Volume 4" not in response.data
+
+    response = client.get("/display_all_books?cursor=nonsense")
+    assert b"Superman Archives, Vol. 2" in response.data
+
+
+def test_browse_by_publisher_sorted_by_rating(client):
+    response = client.get("/browse_by_publisher?by_publisher=Avatar Press&sort=average_rating")
+    assert response.status_code == 200
+    data = response.data.decode()
+    assert data.index("War Stories, Volume 4") < data.index("Crossed, Volume 15")
+    # Links keep the order, and the other orders are offered.
+    assert "sort=average_rating" in data
+    assert "sort=title" in data
+
+    response = client.get("/browse_by_publisher?by_publisher=Avatar Press&sort=nonsense")
+    data = response.data.decode()
+    assert data.index("War Stories, Volume 3") < data.index("War Stories, Volume 4")
+
+
 def test_browse_release_year(client):
     response = client.get("/browse_by_release_year?by_release_year=1887")
     assert response.status_code == 200
     assert b"Vision of Sir Launfal and Other Poems" in response.data
     assert b"1887" in response.data
 
+
 def test_browse_publisher(client):
     response = client.get("/browse_by_publisher?by_publisher=Marvel")
     assert response.status_code == 200
     assert b"The Thing: Idol of Millions" in response.data
     assert b"Marvel" in response.data
 
+
 def test_browse_author(client):
     response = client.get("/browse_by_author?by_author=Maki+Minami")
     assert response.status_code == 200
@@ -103,3 +158,97 @@ def test_books_with_review(client):
     assert b'I wanna go to the moon' in response.data
 
 
+def test_profile_startup_command():
+    app = create_app({'TESTING': True, 'TEST_DATA_PATH': get_project_root() / 'tests' / 'data'})
+    result = app.test_cli_runner().invoke(args=['profile-startup', '--json', '--no-memory'])
+    assert result.exit_code == 0
+    report = json.loads(result.output)
+    assert [stage['stage'] for stage in report['stages']][-1] == 'load_reviews'
+    assert report['stages'][-1]['records'] == 4
+
+
+def test_browse_release_years(client):
+    response = client.get("/browse_by_release_year")
+    assert response.status_code == 200
+    assert b"1887" in response.data
+    assert b"Unknown" in response.data
+
+    response = client.get("/browse_by_release_year?by_release_year=Unknown")
+    assert response.status_code == 200
+    assert b"The Switchblade Mamma" in response.data
+
+    response = client.get("/browse_by_release_year?by_release_year=2016")
+    assert response.status_code == 200
+    assert b"by_release_year=2016" in response.data
+    assert b"by_author=" not in response.data
+
+
+def test_search(client):
+    response = client.get("/search")
+    assert response.status_code == 200
+
+    response = client.get('/search?q="sir launfal"')
+    assert response.status_code == 200
+    assert b"1 result for" in response.data
+    assert b"Vision of Sir Launfal and Other Poems" in response.data
+
+    response = client.get("/search?q=tintin")
+    assert b"0 results for" in response.data
+
+
+def test_autocomplete(client):
+    response = client.get("/autocomplete?q=war&limit=1")
+    assert response.status_code == 200
+    assert response.get_json()["titles"] == [{"id": 27036536, "title": "War Stories, Volume 3"}]
+
+    response = client.get("/autocomplete?q=naoki")
+    assert response.get_json()["authors"] == [{"id": 294649, "name": "Naoki Urasawa"}]
+
+
+def test_sqlite_repository_is_loaded_once(tmp_path):
+    config = {
+        'TESTING': True,
+        'TEST_DATA_PATH': get_project_root() / 'tests' / 'data',
+        'WTF_CSRF_ENABLED': False,
+        'REPOSITORY': 'sqlite',
+        'SQLITE_DATABASE_PATH': str(tmp_path / 'catalogue.db'),
+    }
+    client = create_app(config).test_client()
+    client.post(
+        '/authentication/register',
+        data={'user_name': 'gmichael', 'password': 'CarelessWhisper1984'}
+    )
+    response = client.get('/search?q="sir launfal"')
+    assert b"1 result for" in response.data
+
+    # A second start reuses the database, including the user registered above.
+    client = create_app(config).test_client()
+    response = client.post(
+        'authentication/login',
+        data={'user_name': 'gmichael', 'password': 'CarelessWhisper1984'}
+    )
+    assert response.headers['Location'] == 'http://localhost/'
+
+
+def test_sqlite_repository_loads_lines_appended_while_stopped(tmp_path):
+    data_path = tmp_path / 'data'
+    shutil.copytree(get_project_root() / 'tests' / 'data', data_path)
+    config = {
+        'TESTING': True,
+        'TEST_DATA_PATH': data_path,
+        'WTF_CSRF_ENABLED': False,
+        'REPOSITORY': 'sqlite',
+        'SQLITE_DATABASE_PATH': str(tmp_path / 'catalogue.db'),
+    }
+    create_app(config)
+
+    with open(data_path / 'reviews.csv', 'a') as reviews_file:
+        reviews_file.write('\n5,2,707611,"Written while the app was down",2021-10-01 10:00:00\n')
+    client = create_app(config).test_client()
+    response = client.get('/display_all_books?cursor=0&view_reviews_for=707611')
+    assert b'Written while the app was down' in response.data
+
+    # The next start resumes after the line, rather than loading it again.
+    client = create_app(config).test_client()
+    response = client.get('/display_all_books?cursor=0&view_reviews_for=707611')
+    assert response.data.count(b'Written while the app was down') == 1
@@ -0,0 +1,81 @@
+import pytest
+
+from utils import get_project_root
+from library.adapters import memory_repository
+from library.adapters.caching_repository import CachingRepository
+from library.adapters.memory_repository import MemoryRepository
+from library.adapters.repository import BookQuery
+from library.books import services as b_services
+from library.domain.model import Publisher, Author, Book, User
+
+TEST_DATA_PATH = get_project_root() / "tests" / "data"
+
+
+@pytest.fixture
+def caching_repo(in_memory_repo):
+    return CachingRepository(in_memory_repo, max_size=4)
+
+
+def test_caching_repository_remembers_read_queries(caching_repo):
+    avatar = Publisher("Avatar Press")
+    books = caching_repo.get_books_by_publisher(avatar, 0, 2)
+    assert caching_repo.get_books_by_publisher(avatar, 0, 2) is books
+    assert caching_repo.get_books_by_publisher(avatar, 0, 3) == books + [
+        caching_repo.repository.get_book(27036538)
+    ]
+
+    # Queries with the same filters share an entry.
+    page = caching_repo.get_books_page(BookQuery(start_year=2016, end_year=2016), None, 2)
+    assert caching_repo.get_books_page(BookQuery(start_year=2016, end_year=2016), None, 2) is page
+
+    info = caching_repo.cache_info()
+    assert (info.hits, info.misses, info.evictions, info.size) == (2, 3, 0, 3)
+
+
+def test_caching_repository_writes_invalidate_cached_results(caching_repo):
+    number_of_books = len(caching_repo.get_all_books())
+    version = caching_repo.version
+
+    book = Book(1, "Tintin in Tibet")
+    book.publisher = Publisher("Casterman")
+    book.add_author(Author(42, "Herge"))
+    caching_repo.add_book(book)
+    assert caching_repo.version == version + 1
+    assert len(caching_repo.get_all_books()) == number_of_books + 1
+    assert caching_repo.search_books("tintin") == ([book], 1)
+
+    caching_repo.add_user(User("dave", "123456789"))
+    b_services.add_review(1, "Great mountains", "dave", caching_repo)
+    assert caching_repo.version == version + 3
+    assert len(caching_repo.get_book(1).reviews) == 1
+
+    # Users are changed in place, so they are never served from the cache.
+    assert caching_repo.get_user("dave") is caching_repo.repository.get_user("dave")
+    assert caching_repo.cache_info().hits == 0
+
+
+def test_caching_repository_evicts_least_recently_used_results(caching_repo):
+    for year in (2012, 2013, 2014, 2015, 2016):
+        caching_repo.get_number_of_books_by_release_year(year)
+    caching_repo.get_number_of_books_by_release_year(2016)
+    caching_repo.get_number_of_books_by_release_year(2012)
+    info = caching_repo.cache_info()
+    assert (info.hits, info.misses, info.evictions, info.size) == (1, 6, 2, 4)
+
+
+def test_caching_repository_passes_other_methods_through():
+    repo = MemoryRepository(columnar=True)
+    memory_repository.populate(TEST_DATA_PATH, repo)
+    caching_repo = CachingRepository(repo)
+    assert caching_repo.columnar
+    assert caching_repo.get_number_of_book() == repo.get_number_of_book()
+
+
+def test_caching_repository_sees_ratings_changed_in_place(caching_repo):
+    page = caching_repo.get_books_page(BookQuery(), None, 1, order="ratings_count")
+    book = caching_repo.get_book(707611)
+    assert page.books != [book]
+
+    book.initiliase_rating_and_count(4.0, 1000000)
+    page = caching_repo.get_books_page(BookQuery(), None, 1, order="ratings_count")
+    assert page.books == [book]
@@ -5,7 +5,7 @@ from utils import get_project_root
 from datetime import datetime
 
 from library.domain.model import Publisher, Author, Book, Review, User, BooksInventory
-from library.adapters.jsondatareader import BooksJSONReader
+from library.adapters.jsondatareader import BooksJSONReader, split_on_lines
 
 
 class TestPublisher:
@@ -512,6 +512,76 @@ class TestBooksJSONReader:
         dataset_of_books = read_books_and_authors
         assert dataset_of_books[17].title == "續．星守犬"
 
+    def test_iter_books_streams_the_same_books(self, read_books_and_authors):
+        root_folder = get_project_root()
+        data_folder = root_folder / "library" / "adapters" / "data"
+        reader = BooksJSONReader(
+            str(data_folder / "comic_books_excerpt.json"),
+            str(data_folder / "book_authors_excerpt.json"),
+        )
+        books = reader.iter_books()
+        assert next(books) == read_books_and_authors[0]
+        assert list(books) == read_books_and_authors[1:]
+        assert reader.dataset_of_books == []
+
+    def test_read_books_in_parallel_keeps_file_order(self, read_books_and_authors):
+        data_folder = get_project_root() / "library" / "adapters" / "data"
+        reader = BooksJSONReader(
+            str(data_folder / "comic_books_excerpt.json"),
+            str(data_folder / "book_authors_excerpt.json"),
+        )
+        reader.read_json_files(workers=2)
+        assert reader.dataset_of_books == read_books_and_authors
+        for parallel_book, book in zip(reader.dataset_of_books, read_books_and_authors):
+            assert parallel_book.authors == book.authors
+            assert parallel_book.description == book.description
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_read_books_with_lazy_descriptions(self, read_books_and_authors, workers):
+        data_folder = get_project_root() / "library" / "adapters" / "data"
+        reader = BooksJSONReader(
+            str(data_folder / "comic_books_excerpt.json"),
+            str(data_folder / "book_authors_excerpt.json"),
+            lazy_descriptions=True,
+        )
+        reader.read_json_files(workers)
+        for lazy_book, book in zip(reader.dataset_of_books, read_books_and_authors):
+            assert lazy_book.description_source is reader.description_file
+            assert lazy_book.description == book.description
+
+        lazy_book = reader.dataset_of_books[0]
+        lazy_book.description = "Replaced"
+        assert lazy_book.description == "Replaced"
+        assert lazy_book.description_source is None
+
+    def test_split_on_lines(self, tmp_path):
+        data_file = tmp_path / "lines.json"
+        data_file.write_bytes(b"aaaa\nbb\ncccccc\nd\n")
+        chunks = split_on_lines(str(data_file), 3)
+        assert chunks[0][0] == 0
+        assert chunks[-1][1] == data_file.stat().st_size
+        contents = data_file.read_bytes()
+        for start, end in chunks:
+            assert start == 0 or contents[start - 1:start] == b"\n"
+        assert b"".join(contents[start:end] for start, end in chunks) == contents
+
+    def test_read_books_reports_unresolved_authors(self, tmp_path):
+        books_file = tmp_path / "books.json"
+        authors_file = tmp_path / "authors.json"
+        books_file.write_text(
+            '{"book_id": "1", "title": "Orphan", "publisher": "", "publication_year": "", '
+            '"is_ebook": "false", "description": "", "num_pages": "", "url": "", "image_url": "", '
+            '"ratings_count": "", "average_rating": "", '
+            '"authors": [{"author_id": "7", "role": ""}, {"author_id": "8", "role": ""}]}\n',
+            encoding="UTF-8",
+        )
+        authors_file.write_text('{"author_id": "7", "name": "Known Author"}\n', encoding="UTF-8")
+        reader = BooksJSONReader(str(books_file), str(authors_file))
+        reader.read_json_files()
+        book = reader.dataset_of_books[0]
+        assert book.authors == [Author(7, "Known Author")]
+        assert reader.unresolved_author_ids == {8}
+
 
 class TestBooksInventory:
     def test_construction_and_find(self):
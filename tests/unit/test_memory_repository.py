@@ -1,11 +1,33 @@
 from pathlib import Path
+import bz2
+import gzip
+import lzma
+import pickle
+import shutil
+import threading
+import time
 import pytest
 from datetime import date, datetime
 from library.books import services as b_services
 from utils import get_project_root
 from library.authentication import services as auth_services
-from library.domain.model import Publisher, Author, Book, Review, User, BooksInventory
-from library.adapters.repository import RepositoryException
+from library.domain.model import Publisher, Author, Book, Review, User, BooksInventory, make_review
+from library.adapters import memory_repository
+from library.adapters.memory_repository import MemoryRepository
+from library.adapters.repository import (
+    BOOK_ORDERS,
+    BookQuery,
+    LEADERBOARDS,
+    RepositoryException,
+)
+from library.adapters.datafiles import data_file_sizes
+from library.adapters.columnar import ColumnarBookStore
+from library.adapters.delta import DATA_FILE_NAMES, DeltaIngester
+from library.adapters.indexes import Leaderboard, PrefixIndex
+from library.adapters.profiling import StartupProfiler
+from library.adapters.search import SearchIndex
+from library.adapters.snapshot import populate_from_snapshot, read_snapshot, source_fingerprint
+from werkzeug.security import generate_password_hash
 
 #add_user
 def test_repository_can_add_a_user(in_memory_repo):
@@ -24,6 +46,39 @@ def test_repository_does_not_retrieve_a_non_existent_user(in_memory_repo):
     user = in_memory_repo.get_user('laqueshalmao')
     assert user is None
 
+def test_repository_retrieves_a_user_by_normalized_name(in_memory_repo):
+    assert in_memory_repo.get_user('  Kanye ') is in_memory_repo.get_user('kanye')
+    assert in_memory_repo.get_user(None) is None
+
+
+def test_repository_does_not_add_a_user_twice(in_memory_repo):
+    with pytest.raises(RepositoryException):
+        in_memory_repo.add_user(User('KANYE', '123456789'))
+    assert in_memory_repo.get_user('kanye') == User('kanye', 'imisstheoldkanye432')
+
+
+def test_repository_registers_each_user_name_once_under_concurrency(in_memory_repo):
+    results = []
+
+    def register():
+        try:
+            auth_services.add_user('racer', 'abcd1A23', in_memory_repo)
+            results.append('added')
+        except auth_services.NameNotUniqueException:
+            results.append('taken')
+
+    threads = [threading.Thread(target=register) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == ['added'] + ['taken'] * 7
+
+    restored_repo = pickle.loads(pickle.dumps(in_memory_repo))
+    assert restored_repo.get_user('racer') is not None
+    with pytest.raises(RepositoryException):
+        restored_repo.add_user(User('racer', '123456789'))
+
 #get_number_of_book
 def test_repository_can_retrieve_book_count(in_memory_repo):
     book_count = in_memory_repo.get_number_of_book()
@@ -55,6 +110,21 @@ def test_repository_can_retrieve_a_book(in_memory_repo):
     for book in in_memory_repo.get_all_books():
         assert book == in_memory_repo.get_book(book.book_id)
 
+#get_books
+def test_repository_gets_books_authors_and_users_in_batches(in_memory_repo):
+    book_ids = [27036539, 1, 707611, 27036539]
+    assert in_memory_repo.get_books(book_ids) == [
+        in_memory_repo.get_book(27036539), in_memory_repo.get_book(707611),
+        in_memory_repo.get_book(27036539),
+    ]
+    assert in_memory_repo.get_books([]) == []
+
+    authors = in_memory_repo.get_authors([14965, -1, 37450])
+    assert [author.full_name for author in authors] == ["Garth Ennis", "Ed Brubaker"]
+
+    users = in_memory_repo.get_users(["KANYE", "nobody", "thor"])
+    assert users == [in_memory_repo.get_user("kanye"), in_memory_repo.get_user("thor")]
+
 #get_publisher
 def test_repository_can_retrieve_a_publisher(in_memory_repo):
     publishr = in_memory_repo.get_publishers()
@@ -98,6 +168,8 @@ def test_repository_does_not_retrieve_a_non_existent_book_release_year(in_memory
 
 
 #get_book_by_author
+# The order of get_all_authors is unspecified; this one is MemoryRepository's set order.
+@pytest.mark.parametrize("in_memory_repo", ["memory"], indirect=True)
 def test_repository_can_retrieve_book_by_author(in_memory_repo):
     book_author = in_memory_repo.get_all_authors()
     assert book_author[0].full_name == "Asma"
@@ -137,5 +209,710 @@ def test_repository_does_not_retrieve_nonexistent_without_book(in_memory_repo):
         in_memory_repo.add_review(review)
 
 
-
-
+def test_repository_snapshot_is_reused_until_data_changes(tmp_path):
+    data_path = tmp_path / "data"
+    shutil.copytree(get_project_root() / "tests" / "data", data_path)
+    snapshot_path = tmp_path / "catalogue.snapshot"
+
+    repo = populate_from_snapshot(data_path, snapshot_path)
+    assert snapshot_path.exists()
+    assert repo.get_number_of_book() == 21
+
+    cached_repo = read_snapshot(snapshot_path, source_fingerprint(data_path))
+    assert cached_repo is not None
+    assert cached_repo.get_number_of_book() == 21
+    assert cached_repo.get_user('thor') == repo.get_user('thor')
+    assert len(cached_repo.get_book(707611).reviews) == 4
+
+    with open(data_path / "reviews.csv", "a") as reviews_file:
+        reviews_file.write('\n5,2,707611,"Snapshot this",2021-10-01 10:00:00')
+    assert read_snapshot(snapshot_path, source_fingerprint(data_path)) is None
+
+    repo = populate_from_snapshot(data_path, snapshot_path)
+    assert len(repo.get_book(707611).reviews) == 5
+    assert read_snapshot(snapshot_path, source_fingerprint(data_path)) is not None
+
+
+def test_repository_snapshot_stores_no_plaintext_passwords(tmp_path):
+    data_path = get_project_root() / "tests" / "data"
+    snapshot_path = tmp_path / "catalogue.snapshot"
+    populate_from_snapshot(data_path, snapshot_path, password_hashing="lazy")
+    assert b"plain$$" not in snapshot_path.read_bytes()
+    assert b"Aa1234567" not in snapshot_path.read_bytes()
+
+    repo = read_snapshot(snapshot_path, source_fingerprint(data_path), password_hashing="lazy")
+    assert repo.get_user("thor").password.startswith("pbkdf2:sha256")
+    auth_services.authenticate_user("thor", "Aa1234567", repo)
+
+
+def test_columnar_repository_matches_object_repository(in_memory_repo):
+    columnar_repo = MemoryRepository(columnar=True)
+    memory_repository.populate(get_project_root() / "tests" / "data", columnar_repo)
+
+    assert columnar_repo.get_number_of_book() == in_memory_repo.get_number_of_book()
+    for view, book in zip(columnar_repo.get_all_books(), in_memory_repo.get_all_books()):
+        assert view == book and book == view
+        assert isinstance(view, Book)
+        assert view.title == book.title
+        assert view.description == book.description
+        assert view.publisher == book.publisher
+        assert view.authors == book.authors
+        assert view.release_year == book.release_year
+        assert view.ebook == book.ebook
+        assert view.num_pages == book.num_pages
+        assert view.hyperlink == book.hyperlink
+        assert view.image_hyperlink == book.image_hyperlink
+        assert view.average_rating == book.average_rating
+        assert view.ratings_count == book.ratings_count
+        assert len(view.reviews) == len(book.reviews)
+
+    assert columnar_repo.get_book_release_year(2012) == in_memory_repo.get_book_release_year(2012)
+    assert columnar_repo.get_book_release_year(None) == in_memory_repo.get_book_release_year(None)
+    dargaud = in_memory_repo.get_publisher_by_name("Dargaud")
+    assert columnar_repo.get_books_by_publisher(dargaud) == in_memory_repo.get_books_by_publisher(dargaud)
+
+
+def test_columnar_book_views_write_through():
+    columnar_repo = MemoryRepository(columnar=True)
+    book = Book(3, "Tintin")
+    book.publisher = Publisher("Casterman")
+    columnar_repo.add_book(book)
+    columnar_repo.add_book(Book(1, "Asterix"))
+
+    assert [view.book_id for view in columnar_repo.get_all_books()] == [1, 3]
+
+    view = columnar_repo.get_book(3)
+    view.update_average_rating(4)
+    view.update_average_rating(5)
+    view.add_author(Author(42, "Herge"))
+    view.release_year = 1930
+
+    again = columnar_repo.get_book(3)
+    assert again.average_rating == 4.5
+    assert again.ratings_count == 2
+    assert again.authors == [Author(42, "Herge")]
+    assert again.authors[0].full_name == "Herge"
+    assert again.release_year == 1930
+    assert again.publisher == Publisher("Casterman")
+    assert columnar_repo.get_book(2) is None
+
+
+def test_columnar_store_keeps_reviews_and_reuses_string_space():
+    columnar_repo = MemoryRepository(columnar=True)
+    columnar_repo.add_book(Book(3, "Tintin"))
+    view = columnar_repo.get_book(3)
+    assert columnar_repo.get_top_books("most_reviewed") == []
+    assert view.reviews == () and view.number_of_reviews == 0
+    review = make_review("Mille sabords", User("haddock", "12345678"), view, datetime(1941, 1, 1))
+    columnar_repo.add_review(review)
+    assert columnar_repo.get_book(3).reviews == [review]
+    assert columnar_repo.get_top_books("most_reviewed") == [view]
+
+    store = ColumnarBookStore()
+    store.add(Book(3, "Tintin"))
+    size = store.heap_size
+    store.set_string(3, "title", "Tint")
+    assert store.heap_size == size
+    for number in range(100):
+        store.set_string(3, "hyperlink", "https://example.com/tintin/%d" % number)
+    assert store.heap_size < size + 3 * len("https://example.com/tintin/99")
+    assert store.get_string(3, "title") == "Tint"
+    assert store.get_string(3, "hyperlink") == "https://example.com/tintin/99"
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_repository_with_lazy_descriptions(in_memory_repo, columnar):
+    lazy_repo = MemoryRepository(columnar)
+    memory_repository.populate(get_project_root() / "tests" / "data", lazy_repo, lazy_descriptions=True)
+    for lazy_book, book in zip(lazy_repo.get_all_books(), in_memory_repo.get_all_books()):
+        assert lazy_book.description == book.description
+
+    # The description source survives pickling, as used by catalogue snapshots.
+    restored_repo = pickle.loads(pickle.dumps(lazy_repo))
+    assert restored_repo.get_book(707611).description == in_memory_repo.get_book(707611).description
+
+
+@pytest.mark.parametrize("extension, opener", [(".gz", gzip.open), (".bz2", bz2.open), (".xz", lzma.open)])
+def test_repository_reads_compressed_data_files(in_memory_repo, tmp_path, extension, opener):
+    for data_file in (get_project_root() / "tests" / "data").iterdir():
+        with opener(tmp_path / (data_file.name + extension), "wb") as compressed_file:
+            compressed_file.write(data_file.read_bytes())
+
+    compressed_repo = MemoryRepository()
+    memory_repository.populate(tmp_path, compressed_repo, workers=2, lazy_descriptions=True)
+    assert compressed_repo.get_all_books() == in_memory_repo.get_all_books()
+    assert compressed_repo.get_book(707611).description == in_memory_repo.get_book(707611).description
+    assert len(compressed_repo.get_book(707611).reviews) == 4
+    assert compressed_repo.get_user("thor") == in_memory_repo.get_user("thor")
+
+
+def test_delta_ingester_applies_appended_lines(tmp_path):
+    data_path = tmp_path / "data"
+    shutil.copytree(get_project_root() / "tests" / "data", data_path)
+    repo = MemoryRepository()
+    memory_repository.populate(data_path, repo)
+    ingester = DeltaIngester(data_path, repo)
+    assert not ingester.pending()
+    assert ingester.apply() == {"authors": 0, "books": 0, "users": 0, "reviews": 0}
+
+    with open(data_path / "book_authors_excerpt.json", "a") as authors_file:
+        authors_file.write('\n{"author_id": "99999999", "name": "New Author"}\n')
+    with open(data_path / "comic_books_excerpt.json", "a") as books_file:
+        books_file.write(
+            '\n{"book_id": "1", "title": "Fresh Off The Press", "publisher": "Brand New Press", '
+            '"publication_year": "2021", "is_ebook": "true", "description": "New.", "num_pages": "", '
+            '"url": "", "image_url": "", "ratings_count": "", "average_rating": "", '
+            '"authors": [{"author_id": "99999999", "role": ""}]}\n'
+        )
+    with open(data_path / "users.csv", "a") as users_file:
+        users_file.write('\n6,newreader,Password123\n')
+    with open(data_path / "reviews.csv", "a") as reviews_file:
+        # The second review is still being written, so it waits for its newline.
+        reviews_file.write('\n5,6,1,"Straight from the delta",2021-10-01 10:00:00\n6,6,1,"Half')
+    assert ingester.pending()
+
+    assert ingester.apply() == {"authors": 1, "books": 1, "users": 1, "reviews": 1}
+    book = repo.get_book(1)
+    assert book.title == "Fresh Off The Press"
+    assert repo.get_number_of_book() == 22
+    assert repo.get_publisher_by_name("Brand New Press") is not None
+    assert repo.get_author_by_id(99999999) == Author(99999999, "New Author")
+    assert Author(99999999, "New Author") in repo.get_all_authors()
+    assert repo.get_books_by_author(Author(99999999, "New Author")) == [book]
+    assert repo.get_user("newreader") is not None
+    assert [review.review_text for review in book.reviews] == ["Straight from the delta"]
+
+    with open(data_path / "reviews.csv", "a") as reviews_file:
+        reviews_file.write(' written",2021-10-02 10:00:00\n')
+    assert ingester.apply()["reviews"] == 1
+    assert book.reviews[-1].review_text == "Half written"
+    assert not ingester.pending()
+
+
+def test_delta_ingester_skips_bad_lines_and_follows_populated_sizes(tmp_path):
+    data_path = tmp_path / "data"
+    shutil.copytree(get_project_root() / "tests" / "data", data_path)
+    sizes = data_file_sizes(data_path, DATA_FILE_NAMES)
+    with open(data_path / "reviews.csv", "a") as reviews_file:
+        # Appended while the repository is being populated, after the sizes were taken.
+        reviews_file.write('\n5,1,707611,"Appended during startup",2021-10-01 10:00:00\n')
+    repo = MemoryRepository()
+    memory_repository.populate(data_path, repo, sizes=sizes)
+    assert len(repo.get_book(707611).reviews) == 4
+
+    ingester = DeltaIngester(data_path, repo, offsets=sizes)
+    with open(data_path / "reviews.csv", "a") as reviews_file:
+        reviews_file.write('6,99,707611,"By an unknown user",2021-10-02 10:00:00\n')
+        reviews_file.write('7,1,707611,"Not a date",yesterday\n')
+        reviews_file.write('8,2,707611,"After the bad lines",2021-10-03 10:00:00\n')
+    with open(data_path / "book_authors_excerpt.json", "a") as authors_file:
+        authors_file.write('\n{"author_id": \n{"author_id": "99999999", "name": "New Author"}\n')
+    assert ingester.apply() == {"authors": 1, "books": 0, "users": 0, "reviews": 2}
+    assert [review.review_text for review in repo.get_book(707611).reviews][4:] == [
+        "Appended during startup",
+        "After the bad lines",
+    ]
+    assert not ingester.pending()
+
+
+@pytest.mark.parametrize("password_hashing, workers", [("lazy", 1), ("eager", 1), ("parallel", 2)])
+def test_repository_hashes_seeded_passwords(tmp_path, password_hashing, workers):
+    data_path = tmp_path / "data"
+    shutil.copytree(get_project_root() / "tests" / "data", data_path)
+    pre_hashed = generate_password_hash("Prehashed123")
+    with open(data_path / "users.csv", "a") as users_file:
+        users_file.write("\n6,hashed,{}\n".format(pre_hashed))
+
+    repo = MemoryRepository()
+    memory_repository.populate(data_path, repo, workers, password_hashing=password_hashing)
+    assert repo.get_user("hashed").password == pre_hashed
+    assert repo.get_user("thor").password.startswith(
+        "plain$$" if password_hashing == "lazy" else "pbkdf2:sha256"
+    )
+
+    auth_services.authenticate_user("thor", "Aa1234567", repo)
+    auth_services.authenticate_user("hashed", "Prehashed123", repo)
+    assert repo.get_user("thor").password.startswith("pbkdf2:sha256")
+    assert repo.get_user("hashed").password == pre_hashed
+
+
+def test_populate_reports_each_stage_to_a_profiler():
+    profiler = StartupProfiler()
+    memory_repository.populate(get_project_root() / "tests" / "data", MemoryRepository(), profiler=profiler)
+    records = {stage.name: stage.records for stage in profiler.stages}
+    assert records == {
+        "read_authors": 916, "parse_books": 21, "build_books": 21, "add_books": 21,
+        "load_users": 5, "load_publishers": 13, "load_authors": 32, "load_reviews": 4,
+    }
+    assert all(stage.wall_seconds >= 0 for stage in profiler.stages)
+    # Parsing and building are streamed into add_books, which reports the memory of all three.
+    memory = {stage.name: stage.peak_memory_delta for stage in profiler.stages}
+    assert memory["parse_books"] is None and memory["build_books"] is None
+    assert memory["add_books"] > 0 and memory["load_users"] > 0
+    assert profiler.as_dict()["stages"][0]["stage"] == "read_authors"
+
+
+def test_profiler_charges_streamed_stages_their_own_time():
+    def slow(items, seconds):
+        for item in items:
+            time.sleep(seconds)
+            yield item
+
+    profiler = StartupProfiler(trace_memory=False)
+    with profiler.stage("consume") as stage:
+        produced = profiler.stream("produce", slow(range(5), 0.01))
+        stage.records = len(list(profiler.stream("transform", slow(produced, 0.02))))
+    wall = {stage.name: stage.wall_seconds for stage in profiler.stages}
+    assert [stage.records for stage in profiler.stages] == [5, 5, 5]
+    assert wall["produce"] >= 0.05 and wall["transform"] >= 0.1
+    assert wall["consume"] < wall["produce"] < wall["transform"]
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_repository_bulk_load_keeps_books_sorted(in_memory_repo, columnar):
+    books = list(in_memory_repo.get_all_books())
+    shuffled = books[::2][::-1] + books[1::2]
+    repo = MemoryRepository(columnar)
+    repo.load_books(shuffled[:10])
+    repo.add_book(shuffled[10])
+    repo.load_books(shuffled[11:])
+
+    assert [book.book_id for book in repo.get_all_books()] == [book.book_id for book in books]
+    for book in books:
+        loaded = repo.get_book(book.book_id)
+        assert loaded == book
+        assert loaded.title == book.title
+        assert loaded.authors == book.authors
+        assert loaded.average_rating == book.average_rating
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_repository_indexes_books_by_author(columnar):
+    herge = Author(42, "Herge")
+    repo = MemoryRepository(columnar)
+    books = []
+    for book_id in (7, 3, 5):
+        book = Book(book_id, "Tintin %d" % book_id)
+        book.add_author(herge)
+        books.append(book)
+    repo.load_books(books[:2])
+    assert repo.get_books_by_author(herge) is None
+
+    repo.load_authors()
+    repo.add_book(books[2])
+    other = Book(4, "Asterix")
+    other.add_author(Author(43, "Goscinny"))
+    repo.add_book(other)
+    assert [book.book_id for book in repo.get_books_by_author(herge)] == [3, 5, 7]
+
+    repo.load_authors()
+    assert [book.book_id for book in repo.get_books_by_author(herge)] == [3, 5, 7]
+    assert repo.get_books_by_author(Author(43, "Goscinny")) == [other]
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_repository_indexes_books_by_publisher(in_memory_repo, columnar):
+    repo = MemoryRepository(columnar)
+    memory_repository.populate(get_project_root() / "tests" / "data", repo)
+    for publisher in in_memory_repo.get_publishers():
+        expected = [book for book in in_memory_repo.get_all_books() if book.publisher == publisher]
+        assert repo.get_books_by_publisher(publisher) == expected
+        assert repo.get_number_of_books_by_publisher(publisher) == len(expected)
+        assert repo.get_books_by_publisher(publisher, 1, 2) == expected[1:2]
+
+    new_book = Book(1, "Fresh Off The Press")
+    new_book.publisher = Publisher("Aardvark Press")
+    repo.add_book(new_book)
+    repo.add_publishers({new_book.publisher, Publisher("Dargaud")})
+    assert repo.get_publishers()[0] == Publisher("Aardvark Press")
+    assert repo.get_publishers() == sorted(repo.get_publishers())
+    assert repo.get_publisher_by_name("Aardvark Press") is new_book.publisher
+    assert repo.get_books_by_publisher(new_book.publisher) == [new_book]
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_repository_indexes_books_by_release_year(in_memory_repo, columnar):
+    repo = MemoryRepository(columnar)
+    memory_repository.populate(get_project_root() / "tests" / "data", repo)
+    all_books = in_memory_repo.get_all_books()
+    years = sorted(set(book.release_year for book in all_books if book.release_year is not None))
+    assert repo.get_all_release_years() == years
+    unknown = [book for book in all_books if book.release_year is None]
+    assert repo.get_book_release_year(None) == unknown
+    assert repo.get_number_of_books_by_release_year(None) == len(unknown)
+
+    between = repo.get_books_between_years(2012, 2016)
+    assert between == sorted(
+        (book for book in all_books if book.release_year is not None and 2012 <= book.release_year <= 2016),
+        key=lambda book: (book.release_year, book.book_id),
+    )
+    assert repo.get_books_between_years() == repo.get_books_between_years(years[0], years[-1])
+    assert repo.get_books_between_years(3000) == []
+
+    new_book = Book(1, "Fresh Off The Press")
+    new_book.release_year = 1066
+    repo.add_book(new_book)
+    assert repo.get_all_release_years()[0] == 1066
+    assert repo.get_books_between_years(None, 1066) == [new_book]
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_repository_answers_faceted_queries(in_memory_repo, columnar):
+    repo = MemoryRepository(columnar)
+    memory_repository.populate(get_project_root() / "tests" / "data", repo)
+    all_books = in_memory_repo.get_all_books()
+    dargaud = Publisher("Dargaud")
+
+    def between(value, low, high):
+        return value is not None and (low is None or value >= low) and (high is None or value <= high)
+
+    queries = [
+        (BookQuery(), lambda book: True),
+        (BookQuery(publisher=dargaud), lambda book: book.publisher == dargaud),
+        (BookQuery(start_year=2006, end_year=2013, ebook=False),
+         lambda book: between(book.release_year, 2006, 2013) and book.ebook is False),
+        (BookQuery(min_pages=50, max_pages=200, min_rating=3.5),
+         lambda book: between(book.num_pages, 50, 200) and between(book.average_rating, 3.5, None)),
+        (BookQuery(author=Author(37450, "Ed Brubaker"), end_year=2020),
+         lambda book: Author(37450, "Ed Brubaker") in book.authors and between(book.release_year, None, 2020)),
+    ]
+    for query, predicate in queries:
+        expected = [book for book in all_books if predicate(book)]
+        result = repo.query_books(query)
+        assert result.books == expected
+        assert result.total == len(expected)
+        assert sum(result.facets["release_year"].values()) == len(expected)
+        assert sum(result.facets["ebook"].values()) == len(expected)
+        for publisher, count in result.facets["publisher"].items():
+            assert count == sum(1 for book in expected if book.publisher == publisher)
+        assert repo.query_books(query, 1, 3).books == expected[1:3]
+
+
+def test_query_books_service_reports_facets_by_name(in_memory_repo):
+    result = b_services.query_books(in_memory_repo, publisher_name="Dargaud")
+    assert result["total"] == len(result["books"]) > 0
+    assert result["facets"]["publisher"] == {"Dargaud": result["total"]}
+    assert b_services.query_books(in_memory_repo, author_id=-5)["total"] == 0
+
+
+def test_repository_pages_through_books_by_key(in_memory_repo):
+    all_books = in_memory_repo.get_all_books()
+    queries = [
+        (BookQuery(), lambda book: True),
+        (BookQuery(publisher=Publisher("Avatar Press")),
+         lambda book: book.publisher == Publisher("Avatar Press")),
+        (BookQuery(start_year=2016, end_year=2016), lambda book: book.release_year == 2016),
+        (BookQuery(unknown_year=True), lambda book: book.release_year is None),
+        (BookQuery(start_year=2006, end_year=2013, ebook=False),
+         lambda book: book.release_year is not None and 2006 <= book.release_year <= 2013
+         and book.ebook is False),
+    ]
+    for query, predicate in queries:
+        expected = [book.book_id for book in all_books if predicate(book)]
+        assert len(expected) > 1
+
+        # Following next_key from the first page visits every match once, in order.
+        seen = []
+        page = in_memory_repo.get_books_page(query, None, 2)
+        assert page.previous_key is None
+        while True:
+            assert page.total == len(expected)
+            seen += [book.book_id for book in page.books]
+            if page.next_key is None:
+                break
+            page = in_memory_repo.get_books_page(query, page.next_key, 2)
+        assert seen == expected
+
+        last = in_memory_repo.get_books_page(query, None, 2, reverse=True)
+        assert [book.book_id for book in last.books] == expected[-2:]
+        assert last.next_key is None
+        assert last.previous_key == (expected[-2] if len(expected) > 2 else None)
+        previous = in_memory_repo.get_books_page(query, expected[-1], 3, reverse=True)
+        assert [book.book_id for book in previous.books] == expected[-4:-1]
+
+
+def books_in_order(books, order):
+    attribute, descending = BOOK_ORDERS[order]
+
+    def key(book):
+        value = getattr(book, attribute)
+        return ((0,) if value is None else (1, value)), book.book_id
+    return [book.book_id for book in sorted(books, key=key, reverse=descending)]
+
+
+def test_repository_pages_through_books_in_each_order(in_memory_repo):
+    all_books = in_memory_repo.get_all_books()
+    avatar = Publisher("Avatar Press")
+    queries = [
+        (BookQuery(), lambda book: True),
+        (BookQuery(publisher=avatar), lambda book: book.publisher == avatar),
+        (BookQuery(unknown_year=True), lambda book: book.release_year is None),
+        (BookQuery(start_year=2006, end_year=2016), lambda book: book.release_year is not None
+         and 2006 <= book.release_year <= 2016),
+    ]
+    for order in BOOK_ORDERS:
+        for query, predicate in queries:
+            expected = books_in_order([book for book in all_books if predicate(book)], order)
+
+            seen = []
+            page = in_memory_repo.get_books_page(query, None, 2, order=order)
+            assert page.previous_key is None
+            while True:
+                assert page.total == len(expected)
+                seen += [book.book_id for book in page.books]
+                if page.next_key is None:
+                    break
+                page = in_memory_repo.get_books_page(query, page.next_key, 2, order=order)
+            assert seen == expected
+
+            last = in_memory_repo.get_books_page(query, None, 2, reverse=True, order=order)
+            assert [book.book_id for book in last.books] == expected[-2:]
+            assert last.next_key is None
+            previous = in_memory_repo.get_books_page(
+                query, expected[-1], 3, reverse=True, order=order
+            )
+            assert [book.book_id for book in previous.books] == expected[-4:-1]
+            assert previous.next_key == expected[-2]
+
+
+def test_repository_moves_books_whose_rating_changes(in_memory_repo):
+    columnar_repo = MemoryRepository(columnar=True)
+    memory_repository.populate(get_project_root() / "tests" / "data", columnar_repo)
+    for repo in (in_memory_repo, columnar_repo):
+        lowest = books_in_order(repo.get_all_books(), "ratings_count")[-1]
+        book = repo.get_book(lowest)
+        book.initiliase_rating_and_count(5.0, 1000000)
+        book.update_average_rating(5)
+        assert repo.rating_changes == 2
+
+        for order in ("average_rating", "ratings_count"):
+            assert [book.book_id for book in repo.get_books_page(
+                BookQuery(), None, 1, order=order
+            ).books] == [lowest]
+        assert [book.book_id for book in repo.query_books(BookQuery(min_rating=5.0)).books] == [
+            lowest
+        ]
+
+
+def top_book_ids(books, board, min_ratings, limit):
+    def key(book):
+        if board == "highest_rated":
+            if book.average_rating is None or book.ratings_count < min_ratings:
+                return None
+            return -book.average_rating, -book.ratings_count, book.book_id
+        score = book.ratings_count if board == "most_rated" else len(book.reviews)
+        return (-score, book.book_id) if score else None
+    ranked = sorted((key(book), book.book_id) for book in books if key(book) is not None)
+    return [book_id for _, book_id in ranked[:limit]]
+
+
+def test_repository_gives_the_top_books_of_each_leaderboard(in_memory_repo):
+    all_books = in_memory_repo.get_all_books()
+    avatar, ennis = Publisher("Avatar Press"), Author(14965, "Garth Ennis")
+    scopes = [
+        ({}, lambda book: True),
+        ({"publisher": avatar}, lambda book: book.publisher == avatar),
+        ({"author": ennis}, lambda book: ennis in book.authors),
+        ({"release_year": 2012}, lambda book: book.release_year == 2012),
+    ]
+
+    def check():
+        for board in LEADERBOARDS:
+            for scope, predicate in scopes:
+                books = in_memory_repo.get_top_books(board, 3, min_ratings=40, **scope)
+                assert [book.book_id for book in books] == top_book_ids(
+                    [book for book in all_books if predicate(book)], board, 40, 3
+                )
+
+    check()
+    assert [book.book_id for book in in_memory_repo.get_top_books("highest_rated", 2)] == [
+        18955715, 13340336
+    ]
+
+    # Boards follow changes to ratings and reviews once they have been read.
+    in_memory_repo.get_book(27036537).initiliase_rating_and_count(4.9, 500)
+    in_memory_repo.get_book(12349665).update_average_rating(1)
+    b_services.add_review(27036538, "Grim", "thor", in_memory_repo)
+    b_services.add_review(27036538, "Grimmer", "kanye", in_memory_repo)
+    all_books = in_memory_repo.get_all_books()
+    check()
+    assert in_memory_repo.get_top_books("most_reviewed", 1, publisher=avatar)[0].book_id == 27036538
+
+
+def test_leaderboard_keeps_its_top_books_as_scores_change():
+    scores = {book_id: book_id % 7 for book_id in range(20)}
+
+    def expected(limit):
+        return sorted(scores, key=lambda book_id: (-scores[book_id], book_id))[:limit]
+
+    leaderboard = Leaderboard((((-score,), book_id) for book_id, score in scores.items()), 2)
+    assert leaderboard.top(2) == expected(2)
+    for book_id, score in ((13, 9), (6, 0), (0, 8), (13, 1), (0, 0), (2, 7)):
+        scores[book_id] = score
+        leaderboard.update(book_id, (-score,))
+        if leaderboard.needs_rebuild:
+            leaderboard = Leaderboard(
+                (((-score,), book_id) for book_id, score in scores.items()), 2
+            )
+        assert leaderboard.top(2) == expected(2)
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_repository_searches_titles_descriptions_and_authors(columnar):
+    repo = MemoryRepository(columnar)
+    memory_repository.populate(get_project_root() / "tests" / "data", repo)
+
+    books, total = repo.search_books("war")
+    assert total == 3
+    # Both volumes of War Stories outrank a book that mentions war only in its description.
+    assert [book.book_id for book in books][2] == 35452242
+    assert repo.search_books("war", 1, 2) == (books[1:2], 3)
+
+    assert [book.book_id for book in repo.search_books("SIR launfal")[0]] == [16037549]
+    assert repo.search_books('"sir launfal"')[1] == 1
+    assert repo.search_books('"launfal sir"')[1] == 0
+    # Pairs with a stop word are not indexed, so those phrases are checked against the text.
+    assert repo.search_books('"vision of sir"')[1] == 1
+    assert repo.search_books('"sir of vision"')[1] == 0
+    assert sorted(book.book_id for book in repo.search_books("ennis aira")[0]) == [27036536, 27036539]
+    assert repo.search_books("tintin") == ([], 0)
+    assert repo.search_books("the") == ([], 0)
+
+    new_book = Book(1, "Tintin in Tibet")
+    new_book.add_author(Author(42, "Herge"))
+    repo.add_book(new_book)
+    assert repo.search_books("tintin herge") == ([new_book], 1)
+
+
+def test_search_cache_is_shared_safely_between_threads(in_memory_repo):
+    index = SearchIndex()
+    for book in in_memory_repo.get_all_books():
+        index.add(book)
+    index.CACHE_SIZE = 2
+    queries = ["war", "sir launfal", "ennis", "stories", '"war stories"', "aira"]
+    errors = []
+
+    def search():
+        try:
+            for number in range(300):
+                index.search(queries[number % len(queries)], in_memory_repo.get_book)
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=search) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert index.search("war", in_memory_repo.get_book)[1] == 3
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_repository_completes_titles_authors_and_publishers(columnar):
+    repo = MemoryRepository(columnar)
+    memory_repository.populate(get_project_root() / "tests" / "data", repo)
+
+    # Any word of a name may match, and more rated books come first.
+    assert [book.book_id for book in repo.complete_titles("w")] == [
+        23272155, 30735315, 13571772, 27036536, 27036539
+    ]
+    assert [book.book_id for book in repo.complete_titles("War st", 1)] == [27036536]
+    assert [book.book_id for book in repo.complete_titles("VIVA")] == [13340336]
+    assert repo.complete_authors("e") == [Author(14965, "Garth Ennis"), Author(37450, "Ed Brubaker")]
+    assert repo.complete_publishers("d", 2) == [
+        Publisher("Dynamite Entertainment"), Publisher("DC Comics")
+    ]
+    assert repo.complete_publishers("n/a") == []
+    assert repo.complete_titles("") == []
+    assert repo.find_authors_by_name("ed bru") == [Author(37450, "Ed Brubaker")]
+
+    new_book = Book(1, "Thérèse Raquin")
+    new_book.add_author(Author(42, "Émile Zola"))
+    repo.add_book(new_book)
+    assert repo.complete_titles("therese") == [new_book]
+    assert repo.complete_authors("EMILE") == [Author(42, "Émile Zola")]
+
+
+def test_prefix_index_keeps_short_prefix_rankings_up_to_date():
+    index = PrefixIndex()
+    weights = {key: key % 7 for key in range(100)}
+    index.extend((key, "name %d" % key, weight) for key, weight in weights.items())
+    for key in range(100, 120):
+        weights[key] = 3
+        index.add(key, "name %d" % key, 3)
+    weights[5] += 10
+    index.add(5, "ignored", 10)
+
+    def expected(prefix):
+        keys = [key for key in weights if str(key).startswith(prefix) or "name".startswith(prefix)]
+        return sorted(keys, key=lambda key: (-weights[key], "name %d" % key))
+
+    # Short prefixes are answered from the maintained lists, longer ones by scanning.
+    assert index.complete("n", 12) == expected("n")[:12]
+    assert index.complete("name", 12) == expected("name")[:12]
+    assert index.complete("nam", None) == expected("nam")
+    assert index.complete("11", 3) == expected("11")[:3]
+    assert index.complete("5", 3) == [5, 55, 54]
+
+
+def test_prefix_index_cache_is_shared_safely_between_threads():
+    index = PrefixIndex()
+    index.CACHE_SIZE = 2
+    index.extend((key, "name %d" % key, key % 7) for key in range(100))
+    prefixes = ["name 1", "name 2", "name 3", "name 4", "name 5"]
+    errors = []
+
+    def complete():
+        try:
+            for number in range(300):
+                index.complete(prefixes[number % len(prefixes)], 3)
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=complete) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert pickle.loads(pickle.dumps(index)).complete("name 5", 1) == index.complete("name 5", 1)
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_repository_matches_author_names(in_memory_repo, columnar):
+    repo = MemoryRepository(columnar)
+    memory_repository.populate(get_project_root() / "tests" / "data", repo)
+
+    ennis = Author(14965, "Garth Ennis")
+    assert repo.match_authors("GARTH ENNIS") == [ennis]
+    assert repo.match_authors("Ennis, Garth", 1) == [ennis]
+    assert repo.match_authors("Garth Enis", 1) == [ennis]
+    assert repo.match_authors("Urasawa Naoki") == [Author(294649, "Naoki Urasawa")]
+    # Repeated spaces and accents do not matter; "Takashi   Murakami" is stored as written.
+    assert repo.match_authors("Takashí Murakami", 1) == [Author(6869276, "Takashi   Murakami")]
+    assert repo.match_authors("Zzyzx") == []
+
+    new_book = Book(1, "Thérèse Raquin")
+    new_book.add_author(Author(42, "Émile Zola"))
+    repo.add_book(new_book)
+    assert repo.match_authors("emile zolla") == [Author(42, "Émile Zola")]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_populate_warns_about_authors_missing_from_the_authors_file(tmp_path, caplog, workers):
+    data_path = tmp_path / "data"
+    shutil.copytree(get_project_root() / "tests" / "data", data_path)
+    with open(data_path / "comic_books_excerpt.json", "a") as books_file:
+        books_file.write(
+            '\n{"book_id": "1", "title": "Nameless", "publisher": "N/A", "publication_year": "", '
+            '"is_ebook": "false", "description": "", "num_pages": "", "url": "", "image_url": "", '
+            '"ratings_count": "", "average_rating": "", '
+            '"authors": [{"author_id": "99999998", "role": ""}, {"author_id": "14965", "role": ""}]}\n'
+        )
+    repo = MemoryRepository()
+    memory_repository.populate(data_path, repo, workers)
+    assert repo.get_book(1).authors == [Author(14965, "Garth Ennis")]
+    warnings = [record.getMessage() for record in caplog.records if record.levelname == "WARNING"]
+    assert len(warnings) == 1
+    assert warnings[0].startswith("1 author ids in") and warnings[0].endswith("e.g. 99999998")
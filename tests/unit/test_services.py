@@ -134,6 +134,24 @@ def test_can_get_books_author(in_memory_repo):
         assert book["id"] in book_id_list
 
 
+def test_can_get_books_by_author_name(in_memory_repo):
+    books = utility_services.get_books_by_author_name("Garth Ennis", in_memory_repo)
+    assert [book.book_id for book in books] == [27036536, 27036539]
+    for name in ("garth  ennis", "Ennis, Garth", "Garth%20Ennis", "Garth+Ennis", "Garth Enis"):
+        books = utility_services.get_books_by_author_name(name, in_memory_repo)
+        assert [book.book_id for book in books] == [27036536, 27036539]
+    assert utility_services.get_books_by_author_name("Zzyzx", in_memory_repo) is None
+
+
+def test_can_autocomplete(in_memory_repo):
+    suggestions = utility_services.autocomplete("ed", in_memory_repo, 3)
+    assert suggestions["titles"] == []
+    assert suggestions["authors"] == [{"id": 37450, "name": "Ed Brubaker"}]
+    assert suggestions["publishers"] == []
+    suggestions = utility_services.autocomplete("avatar", in_memory_repo)
+    assert suggestions["publishers"] == [{"name": "Avatar Press"}]
+
+
 # get_release year
 def test_can_get_books_release_year(in_memory_repo):
     books = book_services.get_books_by_release_year(2012, in_memory_repo)
@@ -145,6 +163,25 @@ def test_can_get_books_release_year(in_memory_repo):
         book_services.get_books_by_release_year(-1, in_memory_repo)
 
 
+def test_can_page_through_books(in_memory_repo):
+    page = book_services.get_books_page_by_release_year(None, in_memory_repo, None, 3)
+    assert (len(page.books), page.total, page.previous_key) == (3, 4, None)
+    rest = book_services.get_books_page_by_release_year(None, in_memory_repo, page.next_key, 3)
+    assert (len(rest.books), rest.next_key) == (1, None)
+    assert rest.previous_key == rest.books[0]["id"]
+    with pytest.raises(InvalidYearException):
+        book_services.get_books_page_by_release_year(-1, in_memory_repo)
+
+    page = book_services.get_books_page_by_author_name("garth enis", in_memory_repo, None, 1)
+    assert page.total == 2
+    assert book_services.get_books_page_by_author_name("Zzyzx", in_memory_repo).total == 0
+
+    # Search results are ranked, so they are paged by position in the ranking.
+    books, total = book_services.search_books("war", in_memory_repo)
+    page = book_services.search_books_page("war", in_memory_repo, None, 2, reverse=True)
+    assert (page.books, page.total, page.previous_key, page.next_key) == (books[1:], 3, 1, None)
+
+
 # get_book
 def test_can_get_book(in_memory_repo):
     book = in_memory_repo.get_book(17405342)
@@ -0,0 +1,127 @@
+import threading
+
+import pytest
+
+from utils import get_project_root
+from library.adapters import memory_repository
+from library.adapters.memory_repository import MemoryRepository
+from library.adapters.repository import BookQuery
+from library.adapters.sqlite_repository import SqliteRepository
+from library.authentication import services as auth_services
+from library.books import services as b_services
+from library.domain.model import Publisher, Author, Book
+
+TEST_DATA_PATH = get_project_root() / "tests" / "data"
+
+
+@pytest.fixture
+def memory_repo():
+    repo = MemoryRepository()
+    memory_repository.populate(TEST_DATA_PATH, repo)
+    return repo
+
+
+@pytest.fixture
+def sqlite_repo(tmp_path):
+    repo = SqliteRepository(tmp_path / "catalogue.db")
+    memory_repository.populate(TEST_DATA_PATH, repo)
+    return repo
+
+
+def book_ids(books):
+    return [book.book_id for book in books]
+
+
+def test_sqlite_repository_keeps_its_contents_between_connections(sqlite_repo, tmp_path):
+    book = Book(1, "Tintin in Tibet")
+    book.add_author(Author(42, "Herge"))
+    sqlite_repo.add_book(book)
+    user = sqlite_repo.get_user("thor")
+    user.add_to_favourites(sqlite_repo.get_book(707611))
+    sqlite_repo.update_user(user)
+    del book, user
+
+    reopened = SqliteRepository(tmp_path / "catalogue.db")
+    assert reopened.get_number_of_books() == 22
+    assert reopened.get_book(1).authors == [Author(42, "Herge")]
+    assert book_ids(reopened.get_user("thor").favourites) == [707611]
+    assert len(reopened.get_book(707611).reviews) == 4
+
+
+def test_sqlite_repository_stores_no_plaintext_passwords(sqlite_repo, tmp_path):
+    # The fixture populates with lazy hashing, which defers hashing in memory only.
+    reopened = SqliteRepository(tmp_path / "catalogue.db")
+    assert reopened.get_user("thor").password.startswith("pbkdf2:sha256")
+    assert b"Aa1234567" not in (tmp_path / "catalogue.db").read_bytes()
+    auth_services.authenticate_user("thor", "Aa1234567", reopened)
+
+
+def test_sqlite_repository_gets_users_with_their_favourites(sqlite_repo, tmp_path):
+    for user_name, favourite_ids in (("thor", [707611, 27036539]), ("kanye", [27036539])):
+        user = sqlite_repo.get_user(user_name)
+        for book_id in favourite_ids:
+            user.add_to_favourites(sqlite_repo.get_book(book_id))
+        sqlite_repo.update_user(user)
+
+    reopened = SqliteRepository(tmp_path / "catalogue.db")
+    thor, kanye = reopened.get_users(["thor", "nobody", "kanye"])
+    assert book_ids(thor.favourites) == [707611, 27036539]
+    # Both users share the one Book object for the book they have in common.
+    assert kanye.favourites[0] is thor.favourites[1]
+    assert reopened.get_users(["thor"])[0] is thor
+
+
+def test_sqlite_repository_reads_books_as_they_were_stored(sqlite_repo, memory_repo):
+    for expected in memory_repo.get_all_books():
+        book = sqlite_repo.get_book(expected.book_id)
+        assert b_services.book_to_dict(book) == b_services.book_to_dict(expected)
+        assert (book.ebook, book.num_pages, book.ratings_count) == (
+            expected.ebook, expected.num_pages, expected.ratings_count
+        )
+
+
+def test_sqlite_repository_answers_queries_like_memory_repository(sqlite_repo, memory_repo):
+    avatar = Publisher("Avatar Press")
+    assert book_ids(sqlite_repo.get_books_by_publisher(avatar, 1, 3)) == book_ids(
+        memory_repo.get_books_by_publisher(avatar, 1, 3)
+    )
+    assert sqlite_repo.get_all_release_years() == memory_repo.get_all_release_years()
+    assert book_ids(sqlite_repo.get_books_between_years(2012, 2016)) == book_ids(
+        memory_repo.get_books_between_years(2012, 2016)
+    )
+
+    query = BookQuery(publisher=Publisher("Avatar Press"), min_pages=100)
+    expected = memory_repo.query_books(query, 0, 2)
+    result = sqlite_repo.query_books(query, 0, 2)
+    assert (book_ids(result.books), result.total) == (book_ids(expected.books), expected.total)
+    assert result.facets == expected.facets
+
+    for text in ("war", '"sir launfal"', "ennis aira", "the"):
+        books, total = sqlite_repo.search_books(text)
+        expected_books, expected_total = memory_repo.search_books(text)
+        assert (sorted(book_ids(books)), total) == (sorted(book_ids(expected_books)), expected_total)
+
+    assert book_ids(sqlite_repo.complete_titles("w")) == book_ids(memory_repo.complete_titles("w"))
+    assert sqlite_repo.complete_authors("e") == memory_repo.complete_authors("e")
+    assert sqlite_repo.complete_publishers("d") == memory_repo.complete_publishers("d")
+    for name in ("Ennis, Garth", "Garth Enis", "Zzyzx"):
+        assert sqlite_repo.match_authors(name) == memory_repo.match_authors(name)
+
+
+def test_sqlite_repository_hands_out_one_object_per_row_under_concurrency(sqlite_repo, tmp_path):
+    reopened = SqliteRepository(tmp_path / "catalogue.db")
+    barrier = threading.Barrier(8)
+    results = []
+
+    def read():
+        barrier.wait()
+        results.append((reopened.get_book(707611), reopened.get_user("thor")))
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(id(book) for book, _ in results)) == 1
+    assert len(set(id(user) for _, user in results)) == 1
+    assert results[0][0] is reopened.get_book(707611)